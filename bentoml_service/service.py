@@ -1,20 +1,83 @@
 """
 BentoML service for MobileNetV2 image classification.
+
+Images whose upload bytes were seen before are answered from a content-hash
+prediction cache (`common.cache`, enabled with `CACHE_MAX_ENTRIES`) instead of
+being decoded and inferred. BentoML forms the batch before `predict` runs, so
+cache hits still ride along in a batch but skip all of its work.
+
+`predict_tensor` takes already-decoded frames as an uploaded `.npy` file or raw
+uint8 `(N, 224, 224, 3)` bytes and skips decoding. BentoML only accepts files
+through its multipart/JSON serdes, so each request uploads one such file
+(field `tensors`); a raw file's N is inferred from its size.
+
+`predict_bulk` takes a tar archive or NDJSON file (field `archive`) of many
+images and streams NDJSON results back in input order as full batches of
+`BENTOML_MAX_BATCH_SIZE` complete (see `common.bulk`). Each batch is sent to
+the batchable `predict` through the service's self-proxy (`self.to_async`), so
+bulk images share the adaptive batcher and its latency budget with `/predict`
+traffic. BentoML spools the upload to a temporary file before the API runs,
+so the archive is read from disk incrementally rather than as the request
+arrives.
+
+Stage histograms, batch sizes and in-flight gauges (see `common.metrics`)
+are recorded in the default Prometheus registry, which BentoML already serves
+at `/metrics`. Images are decoded lazily, so `decode` covers decoding and
+resizing in `preprocess_batch`. BentoML forms batches and serializes
+responses itself, so `queue_wait` and `serialize` are not observed here; its
+own `bentoml_service_request_duration_seconds` covers the whole request.
+
+`POST /admin/profile` (guarded by the `ADMIN_TOKEN` value in the
+`X-Admin-Token` header) samples the worker that receives it for a few
+seconds under live load (see `common.profiling`).
+
+Each worker sizes its TensorFlow/OpenMP/ONNX Runtime thread pools from the
+container's CPU quota before loading the model (see `common.runtime`) and
+prints the effective settings.
+
+After loading, each worker warms the model up at every batch size up to
+`BENTOML_MAX_BATCH_SIZE` on a background thread (see `common.warmup`).
+BentoML's `/readyz` answers 503 until it has finished (`__is_ready__`), and
+`POST /ready` reports its duration.
 """
 
 from __future__ import annotations
 
+import asyncio
+import io
+import json
+import os
+import threading
 import typing as t
+from http import HTTPStatus
 from pathlib import Path
 
-import numpy as np
 import bentoml
-from bentoml.exceptions import InvalidArgument
+from bentoml.exceptions import BentoMLException, InvalidArgument
+import numpy as np
 from PIL import Image
 
+from common.bulk import decode_images, iter_bulk_items, merge_results, stream_predictions
+from common.cache import PredictionCache, content_key, encoded_bytes
+from common.inference import load_engine, power_of_two_buckets
+from common.metrics import service_metrics
+from common.postprocessing import Postprocessor
+from common.profiling import ADMIN_TOKEN_HEADER, capture_profile, check_admin
+from common.preprocessing import decode_tensor, preprocess_batch
+from common.runtime import configure_threads
+from common.warmup import Warmup
+
 # Get the directory where this service file is located
 SERVICE_DIR = Path(__file__).parent
 
+# Model file; the extension (.keras, .tflite, .onnx) selects the inference backend.
+# A bare file name is looked up next to service.py and in ../model/.
+MODEL_PATH = os.getenv("MODEL_PATH", "mobilenet_v2.keras")
+
+# Adaptive batching bounds of `predict`
+MAX_BATCH_SIZE = int(os.getenv("BENTOML_MAX_BATCH_SIZE", "8"))
+MAX_LATENCY_MS = int(os.getenv("BENTOML_MAX_LATENCY_MS", "60000"))
+
 # Load ImageNet labels - look in same directory as service.py or in ../model/
 LABELS_PATH = SERVICE_DIR / "imagenet_labels.txt"
 if not LABELS_PATH.exists():
@@ -26,6 +89,17 @@ if LABELS_PATH.exists():
 else:
     IMAGENET_LABELS = [f"class_{i}" for i in range(1001)]
 
+POSTPROCESSOR = Postprocessor(IMAGENET_LABELS)
+METRICS = service_metrics("bentoml")
+
+
+class Forbidden(BentoMLException):
+    error_code = HTTPStatus.FORBIDDEN
+
+
+class Conflict(BentoMLException):
+    error_code = HTTPStatus.CONFLICT
+
 
 runtime_image = bentoml.images.PythonImage(
     python_version="3.11"
@@ -41,61 +115,189 @@ class MobileNetV2Classifier:
     """BentoML service for MobileNetV2 image classification."""
 
     def __init__(self):
-        import tensorflow as tf
-
-        # Look for model in local dir or ../model/
-        model_path = SERVICE_DIR / "mobilenet_v2.keras"
+        threads = configure_threads()
+        print(f"Thread settings: {threads.describe()}")
+        # Look for model as given, in local dir, or in ../model/
+        model_path = Path(MODEL_PATH)
+        if not model_path.exists():
+            model_path = SERVICE_DIR / model_path.name
         if not model_path.exists():
-            model_path = SERVICE_DIR.parent / "model" / "mobilenet_v2.keras"
+            model_path = SERVICE_DIR.parent / "model" / model_path.name
             
-        self.model = tf.keras.models.load_model(str(model_path))
-        print(f"Model loaded from {model_path}")
+        self.engine = load_engine(
+            str(model_path), buckets=power_of_two_buckets(MAX_BATCH_SIZE), num_threads=threads.intra_op
+        )
+        print(f"Model loaded from {model_path} ({self.engine.backend} backend)")
+        self.cache = PredictionCache.from_env()
+        # /healthz answers meanwhile; /readyz waits for __is_ready__
+        self.warmup = Warmup.from_env()
+        threading.Thread(target=self._warm_up, name="warmup").start()
+
+    def _warm_up(self) -> None:
+        try:
+            self.warmup.run(self.engine, POSTPROCESSOR.to_dicts)
+        except Exception as exc:
+            print(f"Warmup failed; /readyz stays unavailable: {exc}")
+            return
+        METRICS.observe_warmup(self.warmup.duration_s)
+        print(f"Warmup finished in {self.warmup.duration_s:.2f}s (batch sizes {list(self.engine.buckets)})")
+
+    def __is_ready__(self) -> bool:
+        return self.warmup.ready
 
     @bentoml.api(
         batchable=True,
         batch_dim=0,
-        max_batch_size=8,
-        max_latency_ms=60000, # default 60000
+        max_batch_size=MAX_BATCH_SIZE,
+        max_latency_ms=MAX_LATENCY_MS, # default 60000
     )
     def predict(self, files: list[Image.Image]) -> list[dict[str, t.Any]]:
         """Predict image class from a batch of images.
         """
+        with METRICS.in_flight("predict"):
+            return self._predict_cached(files)
+
+    def _predict_cached(self, files: list[Image.Image]) -> list[dict[str, t.Any]]:
+        if not self.cache.enabled:
+            return self._infer(files)
+
+        # Only images missing from the cache are decoded and inferred
+        keys = [content_key(encoded_bytes(image)) for image in files]
+        results: list[t.Any] = []
+        for key in keys:
+            cached = self.cache.get(key)
+            results.append(json.loads(cached) if cached is not None else None)
+        misses = [i for i, result in enumerate(results) if result is None]
+        if misses:
+            computed = self._infer([files[i] for i in misses])
+            for i, result in zip(misses, computed):
+                self.cache.put(keys[i], json.dumps(result).encode())
+                results[i] = result
+        return results
+
+    @bentoml.api(
+        batchable=True,
+        batch_dim=0,
+        max_batch_size=MAX_BATCH_SIZE,
+        max_latency_ms=MAX_LATENCY_MS,
+    )
+    def predict_tensor(self, tensors: list[Path]) -> list[list[dict[str, t.Any]]]:
+        """Predict classes for uploaded uint8 `(N, 224, 224, 3)` tensors (raw or `.npy`).
+
+        One result list per uploaded tensor, with one entry per frame.
+        """
+        with METRICS.in_flight("predict_tensor"):
+            with METRICS.time("upload_read"):
+                payloads = [path.read_bytes() for path in tensors]
+            try:
+                with METRICS.time("decode"):
+                    arrays = [decode_tensor(payload) for payload in payloads]
+            except ValueError as e:
+                raise InvalidArgument(str(e)) from e
+            frames = [frame for array in arrays for frame in array]
+            results = self._infer(frames)
+
+        # Re-group per uploaded tensor
+        grouped, start = [], 0
+        for array in arrays:
+            grouped.append(results[start : start + len(array)])
+            start += len(array)
+        return grouped
+
+    @bentoml.api
+    async def predict_bulk(self, archive: Path) -> t.AsyncGenerator[str, None]:
+        """Predict classes for every image in a tar or NDJSON file, one NDJSON line each."""
+        # The spooled upload may not keep its file name, so the format is sniffed
+        with METRICS.in_flight("predict_bulk"):
+            items = iter_bulk_items(_read_chunks(archive))
+            async for lines in stream_predictions(items, self._predict_bulk_images, batch_size=MAX_BATCH_SIZE):
+                yield lines.decode()
+
+    async def _predict_bulk_images(self, images: list[bytes]) -> list[t.Union[bytes, Exception]]:
+        # Decoded here, so one broken image cannot fail a batch it shares with other requests
+        decoded = await asyncio.to_thread(decode_images, images)
+        frames = [_frame_image(image) for image in decoded if not isinstance(image, Exception)]
+        results = await self._predict_batched(frames) if frames else []
+        return merge_results(decoded, (json.dumps(result).encode() for result in results))
+
+    async def _predict_batched(self, files: list[Image.Image]) -> list[dict[str, t.Any]]:
+        # `to_async` is BentoML's self-proxy, only set up when the service runs in a server;
+        # called directly (tests) there is no batcher and `predict` runs as a plain method
+        to_async = getattr(self, "to_async", None)
+        if to_async is None:
+            return await asyncio.to_thread(self.predict, files)
+        return await to_async.predict(files=files)
+
+    def _infer(self, files: t.Sequence[t.Union[Image.Image, np.ndarray]]) -> list[dict[str, t.Any]]:
+        METRICS.observe_batch(len(files))
         # Preprocess batch
-        # Resize and normalize
-        processed_images = []
-        for img in files:
-            img = img.convert("RGB").resize((224, 224))
-            img_array = np.array(img, dtype=np.float32) / 255.0
-            processed_images.append(img_array)
-        
-        tensor = np.stack(processed_images)
+        # Resize and normalize straight into the reused batch tensor,
+        # padded to the engine's bucket size
+        with METRICS.time("decode"):
+            tensor = preprocess_batch(files, pad_to=self.engine.bucket_size(len(files)))
         
         # Inference
-        preds = self.model.predict(tensor, verbose=0)
-
-        # Postprocess
-        batch_results = []
-        for pred in preds:
-            top_indices = np.argsort(pred)[-5:][::-1]
-            results = []
-            for idx in top_indices:
-                results.append(
-                    {
-                        "class_id": int(idx),
-                        "class_name": IMAGENET_LABELS[idx] if idx < len(IMAGENET_LABELS) else f"class_{idx}",
-                        "confidence": float(pred[idx]),
-                    }
-                )
-            
-            batch_results.append({
-                "predictions": results,
-                "top_prediction": results[0]["class_name"],
-                "confidence": results[0]["confidence"],
-            })
+        with METRICS.time("inference"):
+            preds = self.engine.predict(tensor, len(files))
+
+        # Postprocess: batch-level top-k with precomputed labels
+        with METRICS.time("postprocess"):
+            batch_results = POSTPROCESSOR.to_dicts(preds)
 
         return batch_results
 
     @bentoml.api
     def health(self) -> dict[str, str]:
         """Health check endpoint."""
-        return {"status": "healthy", "service": "bentoml-mobilenetv2"}
\ No newline at end of file
+        return {"status": "healthy", "service": "bentoml-mobilenetv2"}
+
+    @bentoml.api
+    def ready(self) -> dict[str, t.Any]:
+        """Warmup status of this worker."""
+        return {"service": "bentoml-mobilenetv2", **self.warmup.status()}
+
+    @bentoml.api
+    def cache_stats(self) -> dict[str, t.Any]:
+        """Prediction cache counters."""
+        return self.cache.stats()
+
+    @bentoml.api(route="/admin/profile")
+    async def admin_profile(
+        self,
+        ctx: bentoml.Context,
+        seconds: float = 10.0,
+        top: int = 20,
+        idle: bool = False,
+        tf_trace: bool = False,
+    ) -> dict[str, t.Any]:
+        """Sample this worker's stacks under live load (admin only)."""
+        try:
+            check_admin(ctx.request.headers.get(ADMIN_TOKEN_HEADER))
+            return await capture_profile(seconds, "bentoml", top=top, idle=idle, tf_trace=tf_trace)
+        except PermissionError as e:
+            raise Forbidden(str(e)) from e
+        except ValueError as e:
+            raise InvalidArgument(str(e)) from e
+        except RuntimeError as e:
+            raise Conflict(str(e)) from e
+
+
+def _frame_image(frame: np.ndarray) -> Image.Image:
+    """A decoded `(224, 224, 3)` frame as an uncompressed BMP image for `predict`.
+
+    The self-proxy uploads images as files; BMP costs a copy to write and read
+    back, and is already at the input size, so `preprocess_batch` skips resizing.
+    """
+    buffer = io.BytesIO()
+    Image.fromarray(frame).save(buffer, format="BMP")
+    buffer.seek(0)
+    image = Image.open(buffer)
+    # The proxy uploads the file from its current position, past the parsed header
+    buffer.seek(0)
+    return image
+
+
+async def _read_chunks(path: Path, chunk_size: int = 64 * 1024) -> t.AsyncIterator[bytes]:
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            yield chunk
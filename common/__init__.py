@@ -0,0 +1,5 @@
+"""Code shared by the BentoML, FastAPI and Ray Serve services.
+
+Modules here must only depend on numpy and Pillow at import time so that each
+service image can copy the package without pulling in the others' frameworks.
+"""
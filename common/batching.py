@@ -0,0 +1,149 @@
+"""SLO-driven controller for dynamic batching parameters.
+
+Fixed batching settings are a compromise: at low request rates every
+millisecond of batch wait is pure added latency, while at high rates a small
+maximum batch size leaves throughput on the table. `AdaptiveBatchController`
+tunes both at runtime against a target p95 latency, using the latencies and
+per-batch inference times it is fed plus the current queue depth:
+
+* Full batches with requests still queued (backlog) double the batch size,
+  as long as the predicted inference time of the larger batch plus the wait
+  window stays within the target.
+* A p95 above target first halves the wait window, then the batch size
+  (unless there is a backlog, where smaller batches only cut throughput).
+* Batches that are mostly empty halve the wait window: waiting does not
+  collect more requests.
+* Full batches with a p95 well under target double the wait window.
+
+Each change is passed to an `apply(batch_size, wait_s)` callback and recorded
+as a decision, so the current settings and their history can be exposed.
+"""
+
+from __future__ import annotations
+
+import collections
+import threading
+import time
+import typing as t
+
+import numpy as np
+
+
+class AdaptiveBatchController:
+    """Adjust max batch size and batch wait timeout to meet a p95 target."""
+
+    def __init__(
+        self,
+        target_p95_s: float,
+        batch_size: int = 8,
+        wait_s: float = 0.01,
+        min_batch_size: int = 1,
+        max_batch_size: int = 32,
+        min_wait_s: float = 0.0005,
+        max_wait_s: float = 0.05,
+        interval_s: float = 2.0,
+        min_samples: int = 20,
+        window: int = 500,
+        apply: t.Optional[t.Callable[[int, float], None]] = None,
+        clock: t.Callable[[], float] = time.monotonic,
+    ):
+        if target_p95_s <= 0:
+            raise ValueError("target_p95_s must be > 0")
+        if not 1 <= min_batch_size <= max_batch_size:
+            raise ValueError("Need 1 <= min_batch_size <= max_batch_size")
+        self.target_p95_s = target_p95_s
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max_batch_size
+        self.min_wait_s = max(min_wait_s, 0.0)
+        self.max_wait_s = max(max_wait_s, self.min_wait_s)
+        self.batch_size = min(max(batch_size, min_batch_size), max_batch_size)
+        self.wait_s = min(max(wait_s, self.min_wait_s), self.max_wait_s)
+        self.interval_s = interval_s
+        self.min_samples = min_samples
+        self.apply = apply
+        self.clock = clock
+        self._latencies: collections.deque[float] = collections.deque(maxlen=window)
+        self._batches: collections.deque[tuple[int, float]] = collections.deque(maxlen=window)
+        self.decisions: collections.deque[dict[str, t.Any]] = collections.deque(maxlen=50)
+        self._last_adjusted = clock()
+        self._lock = threading.Lock()
+
+    def record_latency(self, latency_s: float) -> None:
+        """Record the batching-stage latency (queue wait + inference) of one request."""
+        self._latencies.append(latency_s)
+
+    def record_batch(self, size: int, inference_s: float) -> None:
+        """Record the size and inference time of one executed batch."""
+        self._batches.append((size, inference_s))
+
+    def _per_image_s(self) -> float:
+        images = sum(size for size, _ in self._batches)
+        return sum(seconds for _, seconds in self._batches) / images if images else 0.0
+
+    def maybe_adjust(self, queue_depth: int) -> t.Optional[dict[str, t.Any]]:
+        """Re-evaluate the settings if `interval_s` has passed since the last decision.
+
+        `queue_depth` is the number of images waiting for a batch. Returns the
+        decision when the settings changed, otherwise `None`.
+        """
+        with self._lock:
+            now = self.clock()
+            if now - self._last_adjusted < self.interval_s or len(self._latencies) < self.min_samples:
+                return None
+            self._last_adjusted = now
+            p95 = float(np.percentile(self._latencies, 95))
+            fill = float(np.mean([size for size, _ in self._batches])) / self.batch_size if self._batches else 0.0
+            per_image_s = self._per_image_s()
+            batch_size, wait_s, reason = self.batch_size, self.wait_s, None
+
+            grown = min(batch_size * 2, self.max_batch_size)
+            if (
+                queue_depth >= batch_size
+                and grown > batch_size
+                and wait_s + per_image_s * grown <= self.target_p95_s
+            ):
+                batch_size, reason = grown, "backlog: larger batches fit the target"
+            elif p95 > self.target_p95_s:
+                if wait_s > self.min_wait_s:
+                    wait_s, reason = max(wait_s / 2, self.min_wait_s), "p95 over target: shorter wait"
+                elif batch_size > self.min_batch_size and queue_depth < batch_size:
+                    # Under backlog smaller batches would only cut throughput
+                    batch_size, reason = max(batch_size // 2, self.min_batch_size), "p95 over target: smaller batches"
+            elif fill < 0.5 and wait_s > self.min_wait_s:
+                wait_s, reason = max(wait_s / 2, self.min_wait_s), "underfilled batches: shorter wait"
+            elif fill >= 0.9 and p95 < self.target_p95_s / 2 and wait_s < self.max_wait_s:
+                wait_s, reason = min(wait_s * 2, self.max_wait_s), "full batches with headroom: longer wait"
+
+            if reason is None:
+                return None
+            self.batch_size, self.wait_s = batch_size, wait_s
+            decision = {
+                "time": time.time(),
+                "reason": reason,
+                "batch_size": batch_size,
+                "wait_s": wait_s,
+                "p95_ms": p95 * 1000,
+                "batch_fill": fill,
+                "queue_depth": queue_depth,
+                "per_image_ms": per_image_s * 1000,
+            }
+            self.decisions.append(decision)
+            # Judge the new settings on fresh measurements only
+            self._latencies.clear()
+            self._batches.clear()
+        if self.apply is not None:
+            self.apply(batch_size, wait_s)
+        return decision
+
+    def snapshot(self) -> dict[str, t.Any]:
+        """Current settings, bounds and recent decisions."""
+        return {
+            "target_p95_ms": self.target_p95_s * 1000,
+            "batch_size": self.batch_size,
+            "wait_s": self.wait_s,
+            "bounds": {
+                "batch_size": [self.min_batch_size, self.max_batch_size],
+                "wait_s": [self.min_wait_s, self.max_wait_s],
+            },
+            "decisions": list(self.decisions),
+        }
@@ -0,0 +1,299 @@
+"""Streaming bulk prediction shared by all three services.
+
+A bulk request body is a tar archive of image files or NDJSON lines of the
+form `{"id": "...", "image": "<base64>"}`. It is parsed incrementally as
+chunks arrive, grouped into full batches and answered as NDJSON, one line per
+image in input order:
+
+    {"id": "cat.jpg", "result": {"predictions": [...], ...}}
+    {"id": "broken.jpg", "error": "Invalid image data: ..."}
+
+Only a bounded number of batches is in flight at a time, so neither the
+archive nor the results have to fit in memory. Services plug in their own
+`predict(images)` coroutine, which returns one serialized JSON result (or an
+exception) per encoded image.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import binascii
+import collections
+import functools
+import json
+import typing as t
+
+import numpy as np
+
+from common.preprocessing import load_image
+
+TAR_BLOCK = 512
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/json-lines")
+
+BulkItem = t.Tuple[str, t.Union[bytes, Exception]]
+PredictFn = t.Callable[[t.List[bytes]], t.Awaitable[t.Sequence[t.Union[bytes, Exception]]]]
+
+
+def bulk_format(content_type: t.Optional[str] = None, filename: t.Optional[str] = None) -> str:
+    """Return `"ndjson"` or `"tar"` (the default) for a request's content type or file name."""
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type in NDJSON_TYPES or (filename or "").lower().endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    return "tar"
+
+
+class TarStreamParser:
+    """Incremental tar reader: `feed` bytes, get back the regular files completed so far.
+
+    Handles ustar prefixes, GNU long names and pax `path` records; other
+    entries (directories, links) are skipped. Only the current member is
+    buffered.
+    """
+
+    def __init__(self) -> None:
+        self._buffer = bytearray()
+        self._member: t.Optional[t.Tuple[str, int, bytes]] = None
+        self._long_name: t.Optional[str] = None
+        self.finished = False
+
+    @staticmethod
+    def _parse_header(header: bytes) -> t.Tuple[str, int, bytes]:
+        name = header[0:100].split(b"\0", 1)[0].decode("utf-8", "replace")
+        if header[257:262] == b"ustar":
+            prefix = header[345:500].split(b"\0", 1)[0].decode("utf-8", "replace")
+            if prefix:
+                name = f"{prefix}/{name}"
+        size_field = header[124:136]
+        if size_field[0] & 0x80:
+            # GNU base-256 encoding for members over 8 GiB
+            size = int.from_bytes(size_field[1:], "big")
+        else:
+            try:
+                size = int(size_field.split(b"\0", 1)[0].strip() or b"0", 8)
+            except ValueError:
+                raise ValueError("Invalid tar header") from None
+        return name, size, header[156:157]
+
+    def feed(self, chunk: bytes) -> t.List[t.Tuple[str, bytes]]:
+        if self.finished:
+            return []
+        self._buffer += chunk
+        members = []
+        while True:
+            if self._member is None:
+                if len(self._buffer) < TAR_BLOCK:
+                    break
+                header = bytes(self._buffer[:TAR_BLOCK])
+                del self._buffer[:TAR_BLOCK]
+                if not header.strip(b"\0"):
+                    # End-of-archive marker; trailing padding is ignored
+                    self.finished = True
+                    self._buffer.clear()
+                    break
+                self._member = self._parse_header(header)
+
+            name, size, typeflag = self._member
+            padded = -(-size // TAR_BLOCK) * TAR_BLOCK
+            if len(self._buffer) < padded:
+                break
+            data = bytes(self._buffer[:size])
+            del self._buffer[:padded]
+            self._member = None
+
+            if typeflag == b"L":
+                self._long_name = data.rstrip(b"\0").decode("utf-8", "replace")
+            elif typeflag in (b"x", b"g"):
+                self._long_name = self._pax_path(data) or self._long_name
+            else:
+                if typeflag in (b"0", b"\0", b"7"):
+                    members.append((self._long_name or name, data))
+                self._long_name = None
+        return members
+
+    @staticmethod
+    def _pax_path(data: bytes) -> t.Optional[str]:
+        # Records are "<length> <key>=<value>\n"
+        for record in data.decode("utf-8", "replace").split("\n"):
+            _, _, field = record.partition(" ")
+            key, _, value = field.partition("=")
+            if key == "path":
+                return value
+        return None
+
+
+class NdjsonStreamParser:
+    """Incremental NDJSON reader yielding `(id, image bytes or error)` per line."""
+
+    def __init__(self) -> None:
+        self._buffer = bytearray()
+        # Leading bytes of the buffer already searched for a newline
+        self._scanned = 0
+        self._index = 0
+
+    def feed(self, chunk: bytes, final: bool = False) -> t.List[BulkItem]:
+        # Only new bytes are searched, so a long line arriving in many chunks costs linear time
+        self._buffer += chunk
+        items = []
+        start = 0
+        while (end := self._buffer.find(b"\n", max(start, self._scanned))) >= 0:
+            if self._buffer[start:end].strip():
+                items.append(self._parse(bytes(self._buffer[start:end])))
+            start = end + 1
+        del self._buffer[:start]
+        self._scanned = len(self._buffer)
+        if final:
+            if self._buffer.strip():
+                items.append(self._parse(bytes(self._buffer)))
+            self._buffer, self._scanned = bytearray(), 0
+        return items
+
+    def _parse(self, line: bytes) -> BulkItem:
+        item_id = str(self._index)
+        self._index += 1
+        try:
+            record = json.loads(line)
+            item_id = str(record.get("id", item_id))
+            return item_id, base64.b64decode(record["image"], validate=True)
+        except (ValueError, KeyError, TypeError, AttributeError, binascii.Error) as e:
+            return item_id, ValueError(f"Invalid NDJSON record: {e}")
+
+
+async def iter_bulk_items(chunks: t.AsyncIterable[bytes], fmt: t.Optional[str] = None) -> t.AsyncIterator[BulkItem]:
+    """Parse a streamed bulk body into `(id, image bytes or error)` items as bytes arrive.
+
+    Without `fmt` the format is sniffed from the first chunk: NDJSON starts
+    with `{`, anything else is read as tar.
+    """
+    stream = chunks.__aiter__()
+    first = b""
+    while not first:
+        try:
+            first = await stream.__anext__()
+        except StopAsyncIteration:
+            return
+    if fmt is None:
+        fmt = "ndjson" if first.lstrip()[:1] == b"{" else "tar"
+
+    async def rest() -> t.AsyncIterator[bytes]:
+        yield first
+        async for chunk in stream:
+            yield chunk
+
+    if fmt == "ndjson":
+        parser = NdjsonStreamParser()
+        async for chunk in rest():
+            for item in parser.feed(chunk):
+                yield item
+        for item in parser.feed(b"", final=True):
+            yield item
+        return
+
+    tar = TarStreamParser()
+    async for chunk in rest():
+        try:
+            members = tar.feed(chunk)
+        except ValueError as e:
+            yield "archive", e
+            return
+        for name, data in members:
+            yield name, data
+        if tar.finished:
+            return
+
+
+def decode_images(images: t.Sequence[bytes]) -> t.List[t.Union[np.ndarray, Exception]]:
+    """Decode each encoded image, keeping per-image errors instead of failing the batch."""
+    decoded: t.List[t.Union[np.ndarray, Exception]] = []
+    for data in images:
+        try:
+            decoded.append(load_image(data))
+        except ValueError as e:
+            decoded.append(e)
+    return decoded
+
+
+def merge_results(decoded: t.Sequence[t.Any], results: t.Iterable[t.Any]) -> t.List[t.Any]:
+    """Put `results` (one per successfully decoded item) back next to the decode errors."""
+    remaining = iter(results)
+    return [item if isinstance(item, Exception) else next(remaining) for item in decoded]
+
+
+def render_line(item_id: str, result: t.Union[bytes, Exception]) -> bytes:
+    """One NDJSON output line; `result` is serialized prediction JSON or the item's error."""
+    if isinstance(result, Exception):
+        return b'{"id":%s,"error":%s}\n' % (json.dumps(item_id).encode(), json.dumps(str(result)).encode())
+    return b'{"id":%s,"result":%s}\n' % (json.dumps(item_id).encode(), result)
+
+
+async def stream_predictions(
+    items: t.AsyncIterable[BulkItem],
+    predict: PredictFn,
+    batch_size: int,
+    max_in_flight: int = 2,
+) -> t.AsyncIterator[bytes]:
+    """Run `predict` over full batches of `items` and yield NDJSON lines in input order.
+
+    Up to `max_in_flight` batches are predicted concurrently while the next
+    one is being parsed. Items that failed to parse, and whole batches whose
+    `predict` call raised, are reported as error lines.
+    """
+    pending: collections.deque = collections.deque()
+
+    def schedule(batch: t.List[BulkItem]) -> None:
+        images = [data for _, data in batch if not isinstance(data, Exception)]
+        task = asyncio.ensure_future(predict(images)) if images else None
+        pending.append((batch, task))
+
+    async def drain_oldest() -> bytes:
+        batch, task = pending.popleft()
+        results: t.Iterator[t.Union[bytes, Exception]] = iter(())
+        if task is not None:
+            try:
+                results = iter(await task)
+            except Exception as e:
+                results = iter([e] * len(batch))
+        return b"".join(
+            render_line(item_id, data if isinstance(data, Exception) else next(results))
+            for item_id, data in batch
+        )
+
+    batch: t.List[BulkItem] = []
+    try:
+        async for item in items:
+            batch.append(item)
+            if len(batch) >= batch_size:
+                schedule(batch)
+                batch = []
+                while len(pending) > max_in_flight:
+                    yield await drain_oldest()
+        if batch:
+            schedule(batch)
+        while pending:
+            yield await drain_oldest()
+    finally:
+        # Client went away: do not leave orphaned predictions running
+        for _, task in pending:
+            if task is not None:
+                task.cancel()
+
+
+@functools.lru_cache(maxsize=None)
+def _duplex_response_class() -> type:
+    from starlette.responses import StreamingResponse
+
+    class DuplexStreamingResponse(StreamingResponse):
+        async def __call__(self, scope, receive, send) -> None:
+            await self.stream_response(send)
+
+    return DuplexStreamingResponse
+
+
+def ndjson_response(lines: t.AsyncIterable[bytes]) -> t.Any:
+    """Starlette response streaming NDJSON `lines` while the request body is still being read.
+
+    Below ASGI spec 2.4 (uvicorn) `StreamingResponse` watches `receive` for
+    client disconnects and would swallow the body chunks the bulk parser is
+    waiting for, so this response leaves `receive` to the request.
+    """
+    return _duplex_response_class()(lines, media_type="application/x-ndjson")
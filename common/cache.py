@@ -0,0 +1,127 @@
+"""Content-addressed prediction cache shared by all three services.
+
+Responses are keyed by a BLAKE2b digest of the uploaded image bytes, so
+retries, thumbnails and popular images skip decoding and inference entirely.
+The cache is an LRU bounded by both entry count and total value bytes, with
+an optional TTL, and keeps hit/miss/eviction counters.
+
+Configured through environment variables shared by all services:
+
+* `CACHE_MAX_ENTRIES`: maximum number of cached responses (0 disables the
+  cache, the default, so load tests measure inference unless asked not to).
+* `CACHE_MAX_BYTES`: maximum total size of cached values (default 64 MiB).
+* `CACHE_TTL_S`: seconds before an entry expires (0 = never, the default).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import time
+import typing as t
+from collections import OrderedDict
+
+from PIL import Image
+
+
+def content_key(data: bytes) -> str:
+    """Return the cache key for an uploaded payload."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def encoded_bytes(image: t.Union[bytes, Image.Image]) -> bytes:
+    """Return the original encoded bytes of an upload, for keying.
+
+    Lazily-opened PIL images (as BentoML passes them) still hold the upload's
+    file object, which is read without disturbing the decoder. Images that
+    were created in memory fall back to their raw pixel data.
+    """
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return bytes(image)
+    fp = getattr(image, "fp", None)
+    if fp is not None:
+        position = fp.tell()
+        try:
+            fp.seek(0)
+            return fp.read()
+        finally:
+            fp.seek(position)
+    return image.tobytes()
+
+
+class PredictionCache:
+    """Thread-safe LRU of serialized predictions bounded by entries and bytes."""
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024, ttl_s: float = 0.0):
+        self.max_entries = max(max_entries, 0)
+        self.max_bytes = max(max_bytes, 0)
+        self.ttl_s = max(ttl_s, 0.0)
+        self._entries: OrderedDict[str, tuple[bytes, float]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls) -> "PredictionCache":
+        return cls(
+            max_entries=int(os.getenv("CACHE_MAX_ENTRIES", "0")),
+            max_bytes=int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+            ttl_s=float(os.getenv("CACHE_TTL_S", "0")),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> t.Optional[bytes]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_s and time.monotonic() - entry[1] > self.ttl_s:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: str, value: bytes) -> None:
+        if not self.enabled or len(value) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic())
+            self._bytes += len(value)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        value, _ = self._entries.pop(key)
+        self._bytes -= len(value)
+
+    def stats(self) -> dict[str, t.Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_s": self.ttl_s,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,241 @@
+"""Compiled, shape-bucketed inference shared by all three services.
+
+`model.predict` builds a data adapter and callback list on every call, which
+costs milliseconds per call at the small batch sizes we serve. Instead each
+backend runs fixed-shape batches: batches are zero-padded up to the nearest
+bucket size (1, 2, 4, 8, ...) so a new shape never triggers a retrace or a
+tensor reallocation, and batches larger than the biggest bucket are run in
+chunks.
+
+Three backends are available, chosen from the model file extension by
+`load_engine`:
+
+* `.keras` / `.h5` -> `KerasEngine`: a `tf.function` with one concrete
+  function per bucket.
+* `.tflite` -> `TFLiteEngine`: one interpreter per bucket, using
+  `tflite_runtime` when installed and `tf.lite` otherwise.
+* `.onnx` -> `OnnxEngine`: an ONNX Runtime CPU session.
+
+Framework imports happen inside the engines, so services running the TFLite
+or ONNX backend never import full TensorFlow unless it is the fallback.
+"""
+
+from __future__ import annotations
+
+import bisect
+import os
+import threading
+import typing as t
+
+import numpy as np
+
+DEFAULT_BUCKETS = (1, 2, 4, 8)
+
+
+def power_of_two_buckets(max_batch_size: int) -> tuple[int, ...]:
+    """Return `(1, 2, 4, ...)` up to the first power of two >= `max_batch_size`."""
+    buckets = [1]
+    while buckets[-1] < max_batch_size:
+        buckets.append(buckets[-1] * 2)
+    return tuple(buckets)
+
+
+class InferenceEngine:
+    """Base class: pads batches to a bucket size and chunks oversized ones.
+
+    Subclasses implement `_infer`, which is only ever called with a float32
+    batch whose first dimension is one of `buckets`.
+    """
+
+    backend = "base"
+
+    def __init__(self, buckets: t.Sequence[int] = DEFAULT_BUCKETS, input_shape: tuple[int, ...] = (224, 224, 3)):
+        if not buckets or min(buckets) < 1:
+            raise ValueError("buckets must be a non-empty sequence of positive sizes")
+        self.buckets = tuple(sorted(set(buckets)))
+        self.input_shape = tuple(input_shape)
+
+    @property
+    def max_bucket(self) -> int:
+        return self.buckets[-1]
+
+    def bucket_size(self, n: int) -> int:
+        """Return the bucket a batch of `n` items is padded to (capped at the largest)."""
+        i = bisect.bisect_left(self.buckets, n)
+        return self.buckets[i] if i < len(self.buckets) else self.max_bucket
+
+    def _infer(self, batch: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def _run_bucket(self, batch: np.ndarray, count: int) -> np.ndarray:
+        bucket = self.bucket_size(count)
+        if batch.shape[0] != bucket:
+            padded = np.zeros((bucket,) + self.input_shape, dtype=np.float32)
+            padded[:count] = batch[:count]
+            batch = padded
+        return self._infer(batch)[:count]
+
+    def predict(self, batch: np.ndarray, count: t.Optional[int] = None) -> np.ndarray:
+        """Return model outputs for the first `count` rows of `batch`.
+
+        `batch` may already be padded to `bucket_size(count)` (e.g. by
+        `preprocess_batch(..., pad_to=...)`), in which case no copy is made.
+        `count` defaults to `len(batch)`.
+        """
+        count = len(batch) if count is None else count
+        if count <= self.max_bucket:
+            return self._run_bucket(batch, count)
+        chunks = []
+        for start in range(0, count, self.max_bucket):
+            chunk = batch[start : min(start + self.max_bucket, count)]
+            chunks.append(self._run_bucket(chunk, len(chunk)))
+        return np.concatenate(chunks, axis=0)
+
+
+class KerasEngine(InferenceEngine):
+    """Run a Keras model through per-bucket concrete `tf.function`s.
+
+    Concrete functions are traced lazily, once per bucket, and can be called
+    from several threads.
+    """
+
+    backend = "keras"
+
+    def __init__(
+        self,
+        model: t.Any,
+        buckets: t.Sequence[int] = DEFAULT_BUCKETS,
+        input_shape: tuple[int, ...] = (224, 224, 3),
+    ):
+        import tensorflow as tf
+
+        super().__init__(buckets, input_shape)
+        self.model = model
+        self._function = tf.function(lambda x: model(x, training=False))
+        self._concrete: dict[int, t.Callable] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_path(cls, model_path: str, buckets: t.Sequence[int] = DEFAULT_BUCKETS) -> "KerasEngine":
+        import tensorflow as tf
+
+        return cls(tf.keras.models.load_model(model_path), buckets=buckets)
+
+    def _get_function(self, bucket: int) -> t.Callable:
+        fn = self._concrete.get(bucket)
+        if fn is None:
+            import tensorflow as tf
+
+            with self._lock:
+                fn = self._concrete.get(bucket)
+                if fn is None:
+                    spec = tf.TensorSpec((bucket,) + self.input_shape, tf.float32)
+                    fn = self._concrete[bucket] = self._function.get_concrete_function(spec)
+        return fn
+
+    def _infer(self, batch: np.ndarray) -> np.ndarray:
+        return self._get_function(batch.shape[0])(batch).numpy()
+
+
+def _tflite_interpreter_class() -> type:
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        import tensorflow as tf
+
+        Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+class TFLiteEngine(InferenceEngine):
+    """Run a `.tflite` model with one pre-allocated interpreter per bucket.
+
+    Interpreters are not thread-safe, so each one is guarded by a lock. They
+    load the model from `model_path`, which TFLite memory-maps: its weights
+    stay in the page cache, shared by every interpreter and worker process,
+    instead of being copied into each one.
+    """
+
+    backend = "tflite"
+
+    def __init__(
+        self,
+        model_path: str,
+        buckets: t.Sequence[int] = DEFAULT_BUCKETS,
+        num_threads: t.Optional[int] = None,
+    ):
+        self._model_path = model_path
+        self._interpreter_class = _tflite_interpreter_class()
+        self._num_threads = num_threads
+        probe = self._interpreter_class(model_path=model_path)
+        input_shape = tuple(int(d) for d in probe.get_input_details()[0]["shape"][1:])
+        super().__init__(buckets, input_shape)
+        self._interpreters: dict[int, tuple[t.Any, threading.Lock]] = {}
+        self._lock = threading.Lock()
+
+    def _get_interpreter(self, bucket: int) -> tuple[t.Any, threading.Lock]:
+        entry = self._interpreters.get(bucket)
+        if entry is None:
+            with self._lock:
+                entry = self._interpreters.get(bucket)
+                if entry is None:
+                    interpreter = self._interpreter_class(
+                        model_path=self._model_path, num_threads=self._num_threads
+                    )
+                    input_index = interpreter.get_input_details()[0]["index"]
+                    interpreter.resize_tensor_input(input_index, [bucket, *self.input_shape])
+                    interpreter.allocate_tensors()
+                    entry = self._interpreters[bucket] = (interpreter, threading.Lock())
+        return entry
+
+    def _infer(self, batch: np.ndarray) -> np.ndarray:
+        interpreter, lock = self._get_interpreter(batch.shape[0])
+        with lock:
+            interpreter.set_tensor(interpreter.get_input_details()[0]["index"], batch)
+            interpreter.invoke()
+            return interpreter.get_tensor(interpreter.get_output_details()[0]["index"]).copy()
+
+
+class OnnxEngine(InferenceEngine):
+    """Run an `.onnx` model with an ONNX Runtime CPU session (thread-safe)."""
+
+    backend = "onnx"
+
+    def __init__(
+        self,
+        model_path: str,
+        buckets: t.Sequence[int] = DEFAULT_BUCKETS,
+        num_threads: t.Optional[int] = None,
+    ):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self._session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        model_input = self._session.get_inputs()[0]
+        self._input_name = model_input.name
+        super().__init__(buckets, tuple(int(d) for d in model_input.shape[1:]))
+
+    def _infer(self, batch: np.ndarray) -> np.ndarray:
+        return self._session.run(None, {self._input_name: batch})[0]
+
+
+def load_engine(
+    model_path: str,
+    buckets: t.Sequence[int] = DEFAULT_BUCKETS,
+    num_threads: t.Optional[int] = None,
+) -> InferenceEngine:
+    """Load `model_path` with the backend matching its extension.
+
+    `num_threads` sizes the TFLite and ONNX Runtime thread pools; TensorFlow
+    reads its own from `TF_NUM_INTRAOP_THREADS` (see `common.runtime`).
+    """
+    extension = os.path.splitext(str(model_path))[1].lower()
+    if extension == ".tflite":
+        return TFLiteEngine(str(model_path), buckets=buckets, num_threads=num_threads)
+    if extension == ".onnx":
+        return OnnxEngine(str(model_path), buckets=buckets, num_threads=num_threads)
+    if extension in (".keras", ".h5"):
+        return KerasEngine.from_path(str(model_path), buckets=buckets)
+    raise ValueError(f"Unsupported model format '{extension}' for {model_path}; expected .keras, .h5, .tflite or .onnx")
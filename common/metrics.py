@@ -0,0 +1,173 @@
+"""Server-side Prometheus metrics shared by the three services.
+
+Client-side latency alone cannot tell batching delay from slow decoding or a
+slow model. Each service records, in the process's default
+`prometheus_client` registry:
+
+* `mobilenet_stage_duration_seconds{service, stage}`: a histogram per request
+  stage:
+
+  - `upload_read`: reading the uploaded body
+  - `decode`: decode and resize to 224x224, or validate an uploaded tensor
+  - `queue_wait`: waiting for a batch to form and an inference worker
+  - `inference`: normalizing the batch into the input tensor and the model call
+  - `postprocess`: top-k and rendering each prediction
+  - `serialize`: building the response body
+
+* `mobilenet_batch_size{service}`: images per inference call
+* `mobilenet_requests_in_flight{service, endpoint}`: requests being handled
+* `mobilenet_images_pending{service}`: images queued for or in inference
+* `mobilenet_warmup_duration_seconds{service}`: how long the startup warmup
+  took (see `common.warmup`)
+
+Which stages a service can observe depends on where it runs them (BentoML,
+for instance, forms batches and serializes responses itself). FastAPI and
+Ray Serve serve the registry at `/metrics` with `metrics_response`; BentoML
+already exposes the default registry at its own `/metrics`.
+
+`prometheus_client` is imported when metrics are first created, keeping this
+package importable with numpy and Pillow only.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import os
+import time
+import typing as t
+
+STAGES = ("upload_read", "decode", "queue_wait", "inference", "postprocess", "serialize")
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+_METRICS: dict[str, "ServiceMetrics"] = {}
+
+
+def _collectors(registry: t.Any) -> dict[str, t.Any]:
+    """The metric families, registered once per registry and shared by all services.
+
+    Metrics can only be registered once per registry, and the services label
+    one set of families (several of them load in one process under the tests).
+    """
+    import prometheus_client
+
+    collectors = getattr(registry, "_mobilenet_metrics", None)
+    if collectors is None:
+        collectors = {
+            "stage_seconds": prometheus_client.Histogram(
+                "mobilenet_stage_duration_seconds",
+                "Time spent in each request stage",
+                ["service", "stage"],
+                buckets=LATENCY_BUCKETS,
+                registry=registry,
+            ),
+            "batch_size": prometheus_client.Histogram(
+                "mobilenet_batch_size",
+                "Images per inference call",
+                ["service"],
+                buckets=BATCH_SIZE_BUCKETS,
+                registry=registry,
+            ),
+            "in_flight": prometheus_client.Gauge(
+                "mobilenet_requests_in_flight",
+                "Requests currently being handled",
+                ["service", "endpoint"],
+                multiprocess_mode="livesum",
+                registry=registry,
+            ),
+            "pending": prometheus_client.Gauge(
+                "mobilenet_images_pending",
+                "Images queued for or in inference",
+                ["service"],
+                multiprocess_mode="livesum",
+                registry=registry,
+            ),
+            "warmup": prometheus_client.Gauge(
+                "mobilenet_warmup_duration_seconds",
+                "Duration of the startup warmup",
+                ["service"],
+                multiprocess_mode="max",
+                registry=registry,
+            ),
+        }
+        registry._mobilenet_metrics = collectors
+    return collectors
+
+
+class ServiceMetrics:
+    """Stage histograms, batch sizes and in-flight gauges of one service."""
+
+    def __init__(self, service: str, registry: t.Any = None):
+        import prometheus_client
+
+        self.service = service
+        collectors = _collectors(prometheus_client.REGISTRY if registry is None else registry)
+        self._in_flight = collectors["in_flight"]
+        # Resolve label children once; observing is then a lock and an add
+        self._stages = {stage: collectors["stage_seconds"].labels(service, stage) for stage in STAGES}
+        self._batch = collectors["batch_size"].labels(service)
+        self.pending = collectors["pending"].labels(service)
+        self._warmup = collectors["warmup"].labels(service)
+
+    def observe(self, stage: str, seconds: float) -> None:
+        self._stages[stage].observe(seconds)
+
+    @contextlib.contextmanager
+    def time(self, stage: str) -> t.Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._stages[stage].observe(time.perf_counter() - started)
+
+    def observe_batch(self, size: int) -> None:
+        self._batch.observe(size)
+
+    def observe_warmup(self, seconds: float) -> None:
+        self._warmup.set(seconds)
+
+    @contextlib.contextmanager
+    def in_flight(self, endpoint: str) -> t.Iterator[None]:
+        gauge = self._in_flight.labels(self.service, endpoint)
+        gauge.inc()
+        try:
+            yield
+        finally:
+            gauge.dec()
+
+    async def in_flight_stream(self, endpoint: str, items: t.AsyncIterable[t.Any]) -> t.AsyncIterator[t.Any]:
+        """Pass `items` through, counting the request as in flight until the stream ends.
+
+        For streamed responses, whose handler returns before the body is produced.
+        """
+        with self.in_flight(endpoint):
+            async for item in items:
+                yield item
+
+
+def service_metrics(service: str) -> ServiceMetrics:
+    """The process-wide metrics of `service`, created on first use.
+
+    Modules that are imported more than once (as the tests do) share the
+    same instance.
+    """
+    if service not in _METRICS:
+        _METRICS[service] = ServiceMetrics(service)
+    return _METRICS[service]
+
+
+def metrics_response() -> tuple[bytes, str]:
+    """Body and content type of a `/metrics` scrape of the default registry.
+
+    With `PROMETHEUS_MULTIPROC_DIR` set (several worker processes), the
+    values of all workers are aggregated instead.
+    """
+    import prometheus_client
+
+    registry = prometheus_client.REGISTRY
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return prometheus_client.generate_latest(registry), prometheus_client.CONTENT_TYPE_LATEST
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# source: common/mobilenet.proto
+# Protobuf Python Version: 4.25.1
+"""Generated protocol buffer code."""
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import symbol_database as _symbol_database
+from google.protobuf.internal import builder as _builder
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x16\x63ommon/mobilenet.proto\x12\tmobilenet\" \n\x0ePredictRequest\x12\x0e\n\x06images\x18\x01 \x03(\x0c\"F\n\nPrediction\x12\x10\n\x08\x63lass_id\x18\x01 \x01(\x05\x12\x12\n\nclass_name\x18\x02 \x01(\t\x12\x12\n\nconfidence\x18\x03 \x01(\x02\"t\n\x0bImageResult\x12*\n\x0bpredictions\x18\x01 \x03(\x0b\x32\x15.mobilenet.Prediction\x12\x16\n\x0etop_prediction\x18\x02 \x01(\t\x12\x12\n\nconfidence\x18\x03 \x01(\x02\x12\r\n\x05\x65rror\x18\x04 \x01(\t\":\n\x0fPredictResponse\x12\'\n\x07results\x18\x01 \x03(\x0b\x32\x16.mobilenet.ImageResult2\x9e\x01\n\x10MobileNetService\x12@\n\x07Predict\x12\x19.mobilenet.PredictRequest\x1a\x1a.mobilenet.PredictResponse\x12H\n\rPredictStream\x12\x19.mobilenet.PredictRequest\x1a\x1a.mobilenet.PredictResponse0\x01\x62\x06proto3')
+
+_globals = globals()
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'common.mobilenet_pb2', _globals)
+if _descriptor._USE_C_DESCRIPTORS == False:
+  DESCRIPTOR._options = None
+  _globals['_PREDICTREQUEST']._serialized_start=37
+  _globals['_PREDICTREQUEST']._serialized_end=69
+  _globals['_PREDICTION']._serialized_start=71
+  _globals['_PREDICTION']._serialized_end=141
+  _globals['_IMAGERESULT']._serialized_start=143
+  _globals['_IMAGERESULT']._serialized_end=259
+  _globals['_PREDICTRESPONSE']._serialized_start=261
+  _globals['_PREDICTRESPONSE']._serialized_end=319
+  _globals['_MOBILENETSERVICE']._serialized_start=322
+  _globals['_MOBILENETSERVICE']._serialized_end=480
+# @@protoc_insertion_point(module_scope)
@@ -0,0 +1,102 @@
+# Generated by the gRPC Python protocol compiler plugin. DO NOT EDIT!
+"""Client and server classes corresponding to protobuf-defined services."""
+import grpc
+
+from common import mobilenet_pb2 as common_dot_mobilenet__pb2
+
+
+class MobileNetServiceStub(object):
+    """Missing associated documentation comment in .proto file."""
+
+    def __init__(self, channel):
+        """Constructor.
+
+        Args:
+            channel: A grpc.Channel.
+        """
+        self.Predict = channel.unary_unary(
+                '/mobilenet.MobileNetService/Predict',
+                request_serializer=common_dot_mobilenet__pb2.PredictRequest.SerializeToString,
+                response_deserializer=common_dot_mobilenet__pb2.PredictResponse.FromString,
+                )
+        self.PredictStream = channel.unary_stream(
+                '/mobilenet.MobileNetService/PredictStream',
+                request_serializer=common_dot_mobilenet__pb2.PredictRequest.SerializeToString,
+                response_deserializer=common_dot_mobilenet__pb2.PredictResponse.FromString,
+                )
+
+
+class MobileNetServiceServicer(object):
+    """Missing associated documentation comment in .proto file."""
+
+    def Predict(self, request, context):
+        """Classify encoded images (JPEG, PNG, ...); one result per image, in order.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def PredictStream(self, request, context):
+        """Classify many encoded images, streaming one response per batch in input
+        order. Undecodable images get an `error` instead of failing the call.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+
+def add_MobileNetServiceServicer_to_server(servicer, server):
+    rpc_method_handlers = {
+            'Predict': grpc.unary_unary_rpc_method_handler(
+                    servicer.Predict,
+                    request_deserializer=common_dot_mobilenet__pb2.PredictRequest.FromString,
+                    response_serializer=common_dot_mobilenet__pb2.PredictResponse.SerializeToString,
+            ),
+            'PredictStream': grpc.unary_stream_rpc_method_handler(
+                    servicer.PredictStream,
+                    request_deserializer=common_dot_mobilenet__pb2.PredictRequest.FromString,
+                    response_serializer=common_dot_mobilenet__pb2.PredictResponse.SerializeToString,
+            ),
+    }
+    generic_handler = grpc.method_handlers_generic_handler(
+            'mobilenet.MobileNetService', rpc_method_handlers)
+    server.add_generic_rpc_handlers((generic_handler,))
+
+
+ # This class is part of an EXPERIMENTAL API.
+class MobileNetService(object):
+    """Missing associated documentation comment in .proto file."""
+
+    @staticmethod
+    def Predict(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/mobilenet.MobileNetService/Predict',
+            common_dot_mobilenet__pb2.PredictRequest.SerializeToString,
+            common_dot_mobilenet__pb2.PredictResponse.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def PredictStream(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(request, target, '/mobilenet.MobileNetService/PredictStream',
+            common_dot_mobilenet__pb2.PredictRequest.SerializeToString,
+            common_dot_mobilenet__pb2.PredictResponse.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
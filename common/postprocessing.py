@@ -0,0 +1,87 @@
+"""Batch-level top-k postprocessing shared by all three services.
+
+The whole `(N, num_classes)` output is reduced with one `argpartition` and
+labels come from a precomputed table, so there is no per-image `argsort` or
+per-index label lookup. `to_json` renders each image's response straight
+from pre-escaped label fragments, skipping `json.dumps` and Pydantic
+validation on the hot path. The JSON is identical in shape to the
+`PredictResponse` model:
+
+    {"predictions": [{"class_id": ..., "class_name": ..., "confidence": ...}, ...],
+     "top_prediction": ..., "confidence": ...}
+"""
+
+from __future__ import annotations
+
+import json
+import typing as t
+
+import numpy as np
+
+
+class Postprocessor:
+    """Turn model outputs into top-k predictions for a fixed label set."""
+
+    def __init__(self, labels: t.Sequence[str], top_k: int = 5):
+        self.top_k = top_k
+        self._labels = list(labels)
+        self._label_json: list[str] = []
+        self._item_prefix: list[str] = []
+        self._ensure_classes(len(self._labels))
+
+    def _ensure_classes(self, num_classes: int) -> None:
+        # Outputs may have more classes than labels; those get `class_<id>`
+        while len(self._labels) < num_classes:
+            self._labels.append(f"class_{len(self._labels)}")
+        for idx in range(len(self._label_json), len(self._labels)):
+            label_json = json.dumps(self._labels[idx])
+            self._label_json.append(label_json)
+            self._item_prefix.append(f'{{"class_id":{idx},"class_name":{label_json},"confidence":')
+
+    def top_k_indices(self, preds: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Return `(indices, scores)`, each `(N, k)`, sorted by descending score."""
+        k = min(self.top_k, preds.shape[1])
+        self._ensure_classes(preds.shape[1])
+        candidates = np.argpartition(preds, -k, axis=1)[:, -k:]
+        candidate_scores = np.take_along_axis(preds, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1)
+        return np.take_along_axis(candidates, order, axis=1), np.take_along_axis(candidate_scores, order, axis=1)
+
+    def to_dicts(self, preds: np.ndarray) -> list[dict[str, t.Any]]:
+        """Return one response dict per image."""
+        indices, scores = self.top_k_indices(preds)
+        labels = self._labels
+        results = []
+        for row_indices, row_scores in zip(indices.tolist(), scores.tolist()):
+            predictions = [
+                {"class_id": idx, "class_name": labels[idx], "confidence": score}
+                for idx, score in zip(row_indices, row_scores)
+            ]
+            results.append(
+                {
+                    "predictions": predictions,
+                    "top_prediction": predictions[0]["class_name"],
+                    "confidence": predictions[0]["confidence"],
+                }
+            )
+        return results
+
+    def to_json(self, preds: np.ndarray) -> list[bytes]:
+        """Return one serialized JSON response object per image."""
+        indices, scores = self.top_k_indices(preds)
+        prefixes = self._item_prefix
+        results = []
+        for row_indices, row_scores in zip(indices.tolist(), scores.tolist()):
+            items = ",".join(prefixes[idx] + repr(score) + "}" for idx, score in zip(row_indices, row_scores))
+            top = row_indices[0]
+            body = (
+                f'{{"predictions":[{items}],"top_prediction":{self._label_json[top]},'
+                f'"confidence":{row_scores[0]!r}}}'
+            )
+            results.append(body.encode())
+        return results
+
+
+def json_array(items: t.Iterable[bytes]) -> bytes:
+    """Join serialized JSON values into a JSON array."""
+    return b"[" + b",".join(items) + b"]"
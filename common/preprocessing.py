@@ -0,0 +1,164 @@
+"""Image preprocessing shared by all three services.
+
+Images are decoded to RGB, resized to 224x224 and normalised to float32 in
+`[0, 1]`. Two things keep this cheap on small CPU budgets:
+
+* JPEGs are opened in draft mode, so libjpeg's DCT scaling decodes large
+  inputs directly at 1/2, 1/4 or 1/8 resolution instead of full size.
+* Batches are written straight into a reused, preallocated
+  `(N, 224, 224, 3)` float32 buffer instead of allocating one array per
+  image and concatenating them.
+
+Clients that already hold decoded frames can skip decoding entirely:
+`decode_tensor` wraps a raw uint8 or `.npy` payload as a `(N, 224, 224, 3)`
+array without copying it.
+"""
+
+from __future__ import annotations
+
+import io
+import threading
+import typing as t
+
+import numpy as np
+from PIL import Image
+
+INPUT_SIZE = (224, 224)
+# Shape of a raw tensor payload, e.g. "4,224,224,3"; `.npy` payloads carry their own
+TENSOR_SHAPE_HEADER = "X-Tensor-Shape"
+NPY_MAGIC = b"\x93NUMPY"
+
+ImageInput = t.Union[bytes, Image.Image, np.ndarray]
+
+
+def load_image(image: t.Union[bytes, Image.Image], size: tuple[int, int] = INPUT_SIZE) -> np.ndarray:
+    """Decode and resize an image, returning a `(H, W, 3)` uint8 array.
+
+    Accepts encoded bytes or a (possibly not yet loaded) PIL image. Raises
+    `ValueError` if the data cannot be decoded.
+    """
+    try:
+        if not isinstance(image, Image.Image):
+            image = Image.open(io.BytesIO(image))
+        if image.format == "JPEG":
+            # Let the decoder downscale by a power of two while staying >= size;
+            # a no-op for small or already-loaded images
+            image.draft("RGB", size)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        if image.size != size:
+            image = image.resize(size)
+        return np.asarray(image, dtype=np.uint8)
+    except Exception as e:
+        raise ValueError(f"Invalid image data: {e}") from e
+
+
+class BatchBuffer:
+    """Preallocated float32 input tensor reused across batches.
+
+    `fill` returns a view into the buffer, which is overwritten by the next
+    call. A buffer is therefore not thread-safe; use `preprocess_batch` for a
+    per-thread instance.
+    """
+
+    def __init__(self, capacity: int = 8, size: tuple[int, int] = INPUT_SIZE):
+        self.size = size
+        self._data = np.empty((max(capacity, 1), size[1], size[0], 3), dtype=np.float32)
+
+    @property
+    def capacity(self) -> int:
+        return self._data.shape[0]
+
+    def _reserve(self, n: int) -> None:
+        if n > self.capacity:
+            capacity = self.capacity
+            while capacity < n:
+                capacity *= 2
+            self._data = np.empty((capacity,) + self._data.shape[1:], dtype=np.float32)
+
+    def fill(self, images: t.Sequence[ImageInput], pad_to: int = 0) -> np.ndarray:
+        """Decode `images` into the buffer and return the `(N, H, W, 3)` view.
+
+        Items may be encoded bytes, PIL images, or uint8 arrays already at
+        the target size (as produced by `load_image`). If `pad_to` exceeds
+        the number of images, the view is extended to `pad_to` rows and the
+        extra rows are zeroed.
+        """
+        n = len(images)
+        rows = max(n, pad_to)
+        self._reserve(rows)
+        batch = self._data[:rows]
+        for i, image in enumerate(images):
+            pixels = image if isinstance(image, np.ndarray) else load_image(image, self.size)
+            np.divide(pixels, np.float32(255.0), out=batch[i], dtype=np.float32)
+        batch[n:] = 0.0
+        return batch
+
+
+_local = threading.local()
+
+
+def preprocess_batch(images: t.Sequence[ImageInput], pad_to: int = 0) -> np.ndarray:
+    """Preprocess `images` into this thread's reusable `BatchBuffer`.
+
+    The returned array is only valid until the next call on the same thread.
+    """
+    buffer = getattr(_local, "buffer", None)
+    if buffer is None:
+        buffer = _local.buffer = BatchBuffer()
+    return buffer.fill(images, pad_to=pad_to)
+
+
+def preprocess_image(image: t.Union[bytes, Image.Image]) -> np.ndarray:
+    """Preprocess a single image into a freshly allocated `(1, 224, 224, 3)` tensor."""
+    return BatchBuffer(capacity=1).fill([image])
+
+
+def parse_shape(value: str) -> tuple[int, ...]:
+    """Parse a shape header such as `"4,224,224,3"` or `"(4, 224, 224, 3)"`."""
+    try:
+        return tuple(int(dim) for dim in value.strip("()[] ").split(",") if dim.strip())
+    except ValueError:
+        raise ValueError(f"Invalid tensor shape '{value}'") from None
+
+
+def decode_tensor(
+    data: bytes, shape: t.Optional[t.Sequence[int]] = None, size: tuple[int, int] = INPUT_SIZE
+) -> np.ndarray:
+    """Wrap a uint8 `(N, H, W, 3)` payload as an array without copying it.
+
+    `data` is either an `.npy` file or raw C-ordered uint8 pixels. For raw
+    payloads `shape` is validated if given, otherwise N is inferred from the
+    length. A single `(H, W, 3)` image is promoted to a batch of one. The
+    returned array is read-only and shares memory with `data`. Raises
+    `ValueError` if the payload is not a uint8 batch of `size` images.
+    """
+    expected = (size[1], size[0], 3)
+    if data[:len(NPY_MAGIC)] == NPY_MAGIC:
+        header = io.BytesIO(data)
+        version = np.lib.format.read_magic(header)
+        read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+        try:
+            npy_shape, fortran_order, dtype = read_header(header)
+        except ValueError as e:
+            raise ValueError(f"Invalid .npy header: {e}") from e
+        if fortran_order:
+            raise ValueError("Fortran-ordered .npy payloads are not supported")
+        if dtype != np.uint8:
+            raise ValueError(f"Expected uint8 tensor, got {dtype}")
+        shape = npy_shape
+        offset = header.tell()
+    else:
+        offset = 0
+        if shape is None:
+            shape = (-1,) + expected
+
+    try:
+        tensor = np.frombuffer(data, dtype=np.uint8, offset=offset).reshape(shape)
+    except ValueError as e:
+        raise ValueError(f"Payload of {len(data) - offset} bytes does not match shape {tuple(shape)}") from e
+    if tensor.shape == expected:
+        tensor = tensor[np.newaxis]
+    if tensor.ndim != 4 or tensor.shape[1:] != expected or tensor.shape[0] < 1:
+        raise ValueError(f"Expected a (N, {expected[0]}, {expected[1]}, 3) uint8 tensor, got {tensor.shape}")
+    return tensor
@@ -0,0 +1,227 @@
+"""On-demand sampling profiles of a running service.
+
+`capture_profile` samples the Python stack of every thread of the process
+(`sys._current_frames`) for a bounded time and aggregates identical stacks.
+The result carries:
+
+* `top`: the hottest functions by self and total samples
+* `folded`: collapsed stacks (`a;b;c count`), the input of `flamegraph.pl`
+* `speedscope`: a sampled profile for https://www.speedscope.app
+
+Threads parked in a wait (idle executor workers, the event loop's `select`)
+are left out unless `idle=True`, so the samples show where CPU time goes.
+Native code shows up as the Python frame that called it, e.g. the model call
+in `InferenceEngine.predict`. With `tf_trace=True` and TensorFlow loaded
+(the Keras backend), a TensorFlow profiler trace of the same window, with
+op-level timings for TensorBoard, is written under `PROFILE_DIR`.
+
+Profiling is an admin operation: services only run it for requests carrying
+the `ADMIN_TOKEN` environment variable's value in the `X-Admin-Token` header
+(`check_admin`), and it is disabled while `ADMIN_TOKEN` is unset. One
+profile runs at a time per process.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import hmac
+import os
+import sys
+import threading
+import time
+import typing as t
+
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+MAX_PROFILE_SECONDS = 120.0
+DEFAULT_INTERVAL_S = 0.005
+# Where TensorFlow profiler traces are written on the service's host
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/profiles")
+
+# (file name, function) of Python frames that are blocked waiting, not working
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+    ("selectors.py", "select"),
+    # uvloop waits in C under the Python frame that started the loop
+    ("runners.py", "run"),
+    ("socket.py", "accept"),
+    ("socket.py", "readinto"),
+}
+
+_capture_lock = threading.Lock()
+
+Frame = tuple[str, str, int]  # (function, file, first line)
+
+
+def check_admin(token: t.Optional[str]) -> None:
+    """Raise `PermissionError` unless `token` matches the `ADMIN_TOKEN` environment variable."""
+    expected = os.getenv("ADMIN_TOKEN", "")
+    if not expected:
+        raise PermissionError("Admin endpoints are disabled; set ADMIN_TOKEN to enable them")
+    if not token or not hmac.compare_digest(token.encode(), expected.encode()):
+        raise PermissionError(f"Missing or invalid {ADMIN_TOKEN_HEADER} header")
+
+
+def _frame_key(frame: t.Any) -> Frame:
+    code = frame.f_code
+    return (getattr(code, "co_qualname", code.co_name), code.co_filename, code.co_firstlineno)
+
+
+def _is_idle(leaf: Frame) -> bool:
+    return (os.path.basename(leaf[1]), leaf[0].rsplit(".", 1)[-1]) in IDLE_FRAMES
+
+
+class SamplingProfiler:
+    """Samples all thread stacks of this process every `interval_s` on a background thread."""
+
+    def __init__(self, interval_s: float = DEFAULT_INTERVAL_S, idle: bool = False):
+        self.interval_s = interval_s
+        self.idle = idle
+        self.stacks: collections.Counter[tuple[Frame, ...]] = collections.Counter()
+        self.samples = 0
+        self.duration_s = 0.0
+        self._stop = threading.Event()
+        self._thread: t.Optional[threading.Thread] = None
+        self._started = 0.0
+
+    def start(self) -> None:
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> "SamplingProfiler":
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration_s = time.perf_counter() - self._started
+        return self
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval_s):
+            self.samples += 1
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_key(frame))
+                    frame = frame.f_back
+                if stack and (self.idle or not _is_idle(stack[0])):
+                    # Root first, as flame graphs draw them
+                    self.stacks[tuple(reversed(stack))] += 1
+
+    def top(self, n: int = 20) -> list[dict[str, t.Any]]:
+        """The `n` functions with the most samples on top of the stack (self) or anywhere in it (total)."""
+        self_counts: collections.Counter[Frame] = collections.Counter()
+        total_counts: collections.Counter[Frame] = collections.Counter()
+        for stack, count in self.stacks.items():
+            self_counts[stack[-1]] += count
+            for frame in set(stack):
+                total_counts[frame] += count
+        stacked = sum(self.stacks.values()) or 1
+        ranked = sorted(total_counts, key=lambda f: (self_counts[f], total_counts[f]), reverse=True)
+        return [
+            {
+                "function": frame[0],
+                "file": frame[1],
+                "line": frame[2],
+                "self_samples": self_counts[frame],
+                "self_pct": round(100 * self_counts[frame] / stacked, 2),
+                "total_samples": total_counts[frame],
+                "total_pct": round(100 * total_counts[frame] / stacked, 2),
+            }
+            for frame in ranked[:n]
+        ]
+
+    def folded(self) -> str:
+        """Collapsed stacks, one `root;...;leaf count` line each."""
+        lines = []
+        for stack, count in self.stacks.most_common():
+            names = ";".join(f"{name} ({os.path.basename(file)}:{line})" for name, file, line in stack)
+            lines.append(f"{names} {count}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def speedscope(self, name: str) -> dict[str, t.Any]:
+        """The samples as a speedscope sampled profile, weighted in seconds."""
+        frames: dict[Frame, int] = {}
+        samples, weights = [], []
+        for stack, count in self.stacks.most_common():
+            samples.append([frames.setdefault(frame, len(frames)) for frame in stack])
+            weights.append(count * self.interval_s)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "mobilenet-benchmark sampling profiler",
+            "shared": {"frames": [{"name": n, "file": f, "line": line} for n, f, line in frames]},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": name,
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": sum(weights),
+                    "samples": samples,
+                    "weights": weights,
+                }
+            ],
+        }
+
+
+def _start_tf_trace(logdir: str) -> bool:
+    # Only profile TensorFlow if the service already loaded it (Keras backend)
+    tf = sys.modules.get("tensorflow")
+    if tf is None:
+        return False
+    tf.profiler.experimental.start(logdir)
+    return True
+
+
+async def capture_profile(
+    seconds: float,
+    name: str,
+    top: int = 20,
+    interval_s: float = DEFAULT_INTERVAL_S,
+    idle: bool = False,
+    tf_trace: bool = False,
+) -> dict[str, t.Any]:
+    """Profile this process for `seconds` while it keeps serving.
+
+    Raises `ValueError` for a duration outside `(0, MAX_PROFILE_SECONDS]` and
+    `RuntimeError` if a profile is already running.
+    """
+    if not 0 < seconds <= MAX_PROFILE_SECONDS:
+        raise ValueError(f"seconds must be in (0, {MAX_PROFILE_SECONDS:g}]")
+    if not _capture_lock.acquire(blocking=False):
+        raise RuntimeError("A profile is already being captured")
+    try:
+        profiler = SamplingProfiler(interval_s, idle=idle)
+        tf_traced = False
+        if tf_trace:
+            logdir = os.path.join(PROFILE_DIR, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}")
+            tf_traced = _start_tf_trace(logdir)
+        profiler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.stop()
+            if tf_traced:
+                sys.modules["tensorflow"].profiler.experimental.stop()
+    finally:
+        _capture_lock.release()
+
+    return {
+        "name": name,
+        "pid": os.getpid(),
+        "duration_s": round(profiler.duration_s, 3),
+        "interval_s": interval_s,
+        "samples": profiler.samples,
+        "stacks": sum(profiler.stacks.values()),
+        "top": profiler.top(top),
+        "folded": profiler.folded(),
+        "speedscope": profiler.speedscope(name),
+        "tf_trace_dir": logdir if tf_traced else None,
+    }
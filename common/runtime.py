@@ -0,0 +1,136 @@
+"""CPU thread configuration shared by the three services.
+
+TensorFlow's intra-/inter-op pools, OpenMP/oneDNN, BLAS and ONNX Runtime
+size themselves from the host's core count. A pod limited to `cpu: 1000m`
+on a 16-core node would then run 16 compute threads against a one-core CFS
+quota and spend most of each period throttled. `configure_threads` sizes
+them all from the CPUs the process may actually use:
+
+1. `CPU_LIMIT`, if set
+2. otherwise the cgroup CPU quota (`cpu.max` on cgroup v2,
+   `cpu.cfs_quota_us / cpu.cfs_period_us` on v1) and the CPU affinity mask,
+   whichever is smaller
+3. capped by the caller's own share (`cpus`), e.g. a Ray actor's `num_cpus`
+
+From that it derives the thread counts. Each one can still be pinned
+explicitly with its usual variable, which always wins:
+
+* `TF_NUM_INTRAOP_THREADS` and `OMP_NUM_THREADS` / `MKL_NUM_THREADS` /
+  `OPENBLAS_NUM_THREADS`: whole CPUs, at least 1. The same count is used for
+  ONNX Runtime and TFLite sessions (`ThreadSettings.intra_op`).
+* `TF_NUM_INTEROP_THREADS`: 1, or 2 above 2 CPUs
+* `DECODE_THREADS`: concurrent image decodes, one per CPU. Pillow has no
+  pool of its own, so services bound their decode executors with it.
+
+The counts are exported as environment variables, which TensorFlow, OpenMP
+and BLAS read when they initialize. Call this before the first model is
+loaded. If TensorFlow is already imported, its threading config is also set
+directly.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import math
+import os
+import sys
+import typing as t
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+OMP_VARIABLES = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+
+@dataclasses.dataclass(frozen=True)
+class ThreadSettings:
+    cpus: float
+    source: str
+    intra_op: int
+    inter_op: int
+    omp: int
+    decode: int
+
+    def describe(self) -> str:
+        return (
+            f"cpus={self.cpus:g} ({self.source}), intra_op={self.intra_op}, inter_op={self.inter_op}, "
+            f"omp={self.omp}, decode={self.decode}"
+        )
+
+
+def _read(path: str) -> t.Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cgroup_cpu_limit(root: str = CGROUP_ROOT) -> t.Optional[float]:
+    """The CFS quota of this process's cgroup in CPUs, or None without a limit."""
+    cpu_max = _read(os.path.join(root, "cpu.max"))
+    if cpu_max is not None:
+        quota, _, period = cpu_max.partition(" ")
+        if quota != "max" and period:
+            return int(quota) / int(period)
+        return None
+    for directory in ("cpu", "cpu,cpuacct"):
+        quota = _read(os.path.join(root, directory, "cpu.cfs_quota_us"))
+        period = _read(os.path.join(root, directory, "cpu.cfs_period_us"))
+        if quota is not None and period is not None:
+            return int(quota) / int(period) if int(quota) > 0 else None
+    return None
+
+
+def available_cpus(cpus: t.Optional[float] = None, root: str = CGROUP_ROOT) -> tuple[float, str]:
+    """CPUs this process may use and where that number came from."""
+    if os.getenv("CPU_LIMIT"):
+        detected, source = float(os.environ["CPU_LIMIT"]), "CPU_LIMIT"
+    else:
+        try:
+            detected, source = float(len(os.sched_getaffinity(0))), "affinity"
+        except AttributeError:  # macOS
+            detected, source = float(os.cpu_count() or 1), "cpu_count"
+        quota = cgroup_cpu_limit(root)
+        if quota is not None and quota < detected:
+            detected, source = quota, "cgroup quota"
+    if cpus is not None and cpus < detected:
+        detected, source = cpus, "requested share"
+    return detected, source
+
+
+def _env_int(name: str) -> t.Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
+def thread_settings(cpus: t.Optional[float] = None, root: str = CGROUP_ROOT) -> ThreadSettings:
+    """Thread counts for the available CPUs, with explicit variables taking precedence."""
+    available, source = available_cpus(cpus, root)
+    # Whole CPUs only: a fractional quota still runs one thread at a time
+    whole = max(1, math.floor(available))
+    intra_op = _env_int("TF_NUM_INTRAOP_THREADS") or whole
+    return ThreadSettings(
+        cpus=available,
+        source=source,
+        intra_op=intra_op,
+        inter_op=_env_int("TF_NUM_INTEROP_THREADS") or (2 if whole > 2 else 1),
+        omp=_env_int("OMP_NUM_THREADS") or intra_op,
+        decode=_env_int("DECODE_THREADS") or whole,
+    )
+
+
+def configure_threads(cpus: t.Optional[float] = None) -> ThreadSettings:
+    """Export the thread counts of `thread_settings` for TensorFlow, OpenMP and BLAS."""
+    settings = thread_settings(cpus)
+    os.environ["TF_NUM_INTRAOP_THREADS"] = str(settings.intra_op)
+    os.environ["TF_NUM_INTEROP_THREADS"] = str(settings.inter_op)
+    for name in OMP_VARIABLES:
+        os.environ.setdefault(name, str(settings.omp))
+    tf = sys.modules.get("tensorflow")
+    if tf is not None:
+        try:
+            tf.config.threading.set_intra_op_parallelism_threads(settings.intra_op)
+            tf.config.threading.set_inter_op_parallelism_threads(settings.inter_op)
+        except RuntimeError:
+            # The runtime is already initialized; its pools can no longer change
+            pass
+    return settings
@@ -0,0 +1,80 @@
+"""Startup warmup and readiness shared by all three services.
+
+The first call at each batch shape pays for tracing the compiled function
+(Keras), allocating an interpreter (TFLite) and oneDNN/XNNPACK kernel
+selection. Without a warmup, those costs land in the latency tail of the
+first real requests, after every scale-up and rolling deploy.
+
+`Warmup.run` pushes synthetic frames through the same steps as a request
+batch (`preprocess_batch`, `InferenceEngine.predict` and postprocessing) at
+every bucket size of the engine. Batches are always padded to a bucket, so
+this covers every batch size the batcher can produce. The services report
+readiness (`ready`) only once it has finished, and its duration in
+`status()`.
+
+Configured through an environment variable shared by all services:
+
+* `WARMUP_ROUNDS`: calls per bucket size (default 2; 0 skips the warmup and
+  reports ready as soon as the model is loaded).
+"""
+
+from __future__ import annotations
+
+import os
+import time
+import typing as t
+
+import numpy as np
+
+from common.preprocessing import preprocess_batch
+
+
+class Warmup:
+    """Warms an inference engine up once and records how long it took."""
+
+    def __init__(self, rounds: int = 2):
+        self.rounds = rounds
+        self.ready = False
+        self.duration_s: t.Optional[float] = None
+        self.error: t.Optional[str] = None
+        # Bucket size -> milliseconds of each warmup call, first (coldest) first
+        self.timings_ms: dict[int, list[float]] = {}
+
+    @classmethod
+    def from_env(cls) -> "Warmup":
+        return cls(rounds=int(os.getenv("WARMUP_ROUNDS", "2")))
+
+    def run(self, engine: t.Any, postprocess: t.Optional[t.Callable[[np.ndarray], t.Any]] = None) -> "Warmup":
+        """Run `rounds` synthetic batches per bucket size of `engine`, then mark ready.
+
+        Failures are recorded in `error` and re-raised; the service then never
+        reports ready.
+        """
+        started = time.perf_counter()
+        rng = np.random.default_rng(0)
+        try:
+            for bucket in engine.buckets if self.rounds > 0 else ():
+                frames = list(rng.integers(0, 256, size=(bucket, *engine.input_shape), dtype=np.uint8))
+                timings = self.timings_ms[bucket] = []
+                for _ in range(self.rounds):
+                    call_started = time.perf_counter()
+                    preds = engine.predict(preprocess_batch(frames, pad_to=bucket), bucket)
+                    if postprocess is not None:
+                        postprocess(preds)
+                    timings.append(round((time.perf_counter() - call_started) * 1000, 2))
+        except Exception as exc:
+            self.error = f"{type(exc).__name__}: {exc}"
+            raise
+        self.duration_s = time.perf_counter() - started
+        self.ready = True
+        return self
+
+    def status(self) -> dict[str, t.Any]:
+        return {
+            "ready": self.ready,
+            "warmup_s": None if self.duration_s is None else round(self.duration_s, 3),
+            "rounds": self.rounds,
+            "batch_sizes": sorted(self.timings_ms),
+            "first_call_ms": {str(bucket): timings[0] for bucket, timings in self.timings_ms.items() if timings},
+            "error": self.error,
+        }
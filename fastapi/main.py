@@ -1,24 +1,101 @@
 """Minimal FastAPI app used by smoke tests.
 
-Exposes `/health` and `/predict` endpoints. Loads a Keras model from
-`MODEL_PATH` and labels from `LABELS_PATH` environment variables.
+Exposes `/health` and `/predict` endpoints. Loads a model from `MODEL_PATH`
+(`.keras`, `.tflite` or `.onnx`, see `common.inference.load_engine`) and
+labels from `LABELS_PATH` environment variables.
+
+Concurrent `/predict` calls are grouped by an asyncio micro-batcher into a
+single compiled inference call, configured through `MAX_BATCH_SIZE` and
+`BATCH_WAIT_TIMEOUT_S`. Setting `MAX_BATCH_SIZE=1` restores the original
+one-request-per-inference behaviour.
+
+Decoding and inference run off the event loop: batches execute on a pool of
+`INFERENCE_WORKERS` threads and at most `INFERENCE_QUEUE_DEPTH` requests may
+wait for them. Each `/predict` response carries a `Server-Timing` header that
+separates queue wait from compute time.
+
+Repeated uploads can be answered from a content-hash prediction cache before
+decoding (see `common.cache`; enabled with `CACHE_MAX_ENTRIES`), whose
+counters are served at `/cache_stats`.
+
+`/predict_tensor` accepts already-decoded frames as a raw uint8
+`(N, 224, 224, 3)` body (shape in the `X-Tensor-Shape` header, optional) or
+an `.npy` file, and feeds them to the batcher without decoding or copying.
+
+`/predict_bulk` takes a streamed tar archive or NDJSON body of many images,
+decodes it as bytes arrive and submits full batches, streaming NDJSON results
+back in input order (see `common.bulk`).
+
+`/metrics` serves Prometheus histograms of each request stage (upload read,
+decode, queue wait, inference, postprocess, serialization), the inference
+batch size and in-flight gauges (see `common.metrics`).
+
+`POST /admin/profile` samples the process's Python stacks (and optionally
+TensorFlow ops) for a few seconds under live load and returns a top-N
+summary, collapsed stacks and a speedscope profile (see `common.profiling`).
+It requires the `ADMIN_TOKEN` value in the `X-Admin-Token` header.
+
+TensorFlow, OpenMP and ONNX Runtime/TFLite thread pools are sized from the
+container's CPU quota at import (see `common.runtime`), and at most
+`DECODE_THREADS` uploads are decoded at once; the effective settings are
+logged at startup.
+
+After loading, the model is warmed up at every batch size the batcher can
+produce (see `common.warmup`). `/health` reports whether the model loaded;
+`/ready` answers 200 only once the warmup has finished, with its duration,
+and 503 before.
+
+The container starts the app through `serve.py`, which can fork several
+workers that share the preloaded app and framework (`WEB_CONCURRENCY`).
+With `SHARED_INFERENCE=1` the workers load no model: they decode uploads into
+shared memory and a single inference process batches the frames of all
+workers (see `shared_inference.py`).
 """
 
 from __future__ import annotations
 
-import io
+import asyncio
+import logging
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, Union
 from contextlib import asynccontextmanager
 
+import anyio
 import numpy as np
-from fastapi import FastAPI, HTTPException, UploadFile, File
-from PIL import Image
+from fastapi import FastAPI, Header, HTTPException, Request, Response, UploadFile, File
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from common.bulk import bulk_format, decode_images, iter_bulk_items, merge_results, ndjson_response, stream_predictions
+from common.cache import PredictionCache, content_key
+from common.inference import InferenceEngine, load_engine, power_of_two_buckets
+from common.metrics import metrics_response, service_metrics
+from common.postprocessing import Postprocessor, json_array
+from common.profiling import capture_profile, check_admin
+from common.preprocessing import TENSOR_SHAPE_HEADER, decode_tensor, load_image, parse_shape, preprocess_batch
+from common.runtime import configure_threads
+from common.warmup import Warmup
+
+# Size TensorFlow/OpenMP thread pools from the CPU quota before a model loads
+THREAD_SETTINGS = configure_threads()
+logger = logging.getLogger("uvicorn.error")
 
 # Prefer environment variables set by tests or Dockerfile
 MODEL_PATH = os.getenv("MODEL_PATH", "model/mobilenet_v2.keras")
 LABELS_PATH = os.getenv("LABELS_PATH", "imagenet_labels.txt")
+# Batching knobs, named after Ray Serve's `@serve.batch` parameters
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "8"))
+BATCH_WAIT_TIMEOUT_S = float(os.getenv("BATCH_WAIT_TIMEOUT_S", "0.01"))
+# Inference executor: worker threads sharing the model, and how many requests
+# may wait for them before new ones are rejected with 503 (0 = unbounded)
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "1"))
+INFERENCE_QUEUE_DEPTH = int(os.getenv("INFERENCE_QUEUE_DEPTH", "64"))
+# Set by serve.py in each worker when a separate inference process holds the
+# model (`SHARED_INFERENCE=1`, a `shared_inference.InferenceClient`)
+INFERENCE_CLIENT: Optional[Any] = None
 
 # Load labels
 labels_file = Path(LABELS_PATH)
@@ -29,68 +106,443 @@ else:
     IMAGENET_LABELS = [f"class_{i}" for i in range(1001)]
 
 
-def preprocess_image(image_data: bytes) -> np.ndarray:
-    image = Image.open(io.BytesIO(image_data)).convert("RGB")
-    image = image.resize((224, 224))
-    image_array = np.array(image, dtype=np.float32) / 255.0
-    return np.expand_dims(image_array, axis=0)
+POSTPROCESSOR = Postprocessor(IMAGENET_LABELS)
+PREDICTION_CACHE = PredictionCache.from_env()
+METRICS = service_metrics("fastapi")
+
+
+class QueueFullError(RuntimeError):
+    """Raised by `MicroBatcher.submit` when the pending queue is at capacity."""
+
+
+class MicroBatcher:
+    """Collect concurrent submissions and hand them to `handler` as one batch.
+
+    A batch is dispatched as soon as `max_batch_size` items are queued or
+    `batch_wait_timeout_s` has elapsed since the first item arrived, whichever
+    comes first. `handler` receives the list of items and must return one
+    result per item, in order. At most `max_concurrent_batches` handler calls
+    run at once; while they are busy new items keep queueing (up to
+    `max_queue_size`, 0 means unbounded) and form the next batch.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[List[Any]], Union[List[Any], Awaitable[List[Any]]]],
+        max_batch_size: int = 8,
+        batch_wait_timeout_s: float = 0.01,
+        max_queue_size: int = 0,
+        max_concurrent_batches: int = 1,
+    ) -> None:
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be >= 1")
+        if max_concurrent_batches < 1:
+            raise ValueError("max_concurrent_batches must be >= 1")
+        self.handler = handler
+        self.max_batch_size = max_batch_size
+        self.batch_wait_timeout_s = max(batch_wait_timeout_s, 0.0)
+        self.max_queue_size = max(max_queue_size, 0)
+        self.max_concurrent_batches = max_concurrent_batches
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._inflight: set = set()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def start(self) -> None:
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        # Let batches that already reached the handler finish
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+        # Fail anything still waiting so callers are not left hanging
+        while self._queue is not None and not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Batcher stopped"))
+
+    async def submit(self, item: Any) -> Any:
+        if self._queue is None:
+            raise RuntimeError("Batcher not started")
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((item, future))
+        except asyncio.QueueFull:
+            raise QueueFullError(f"Inference queue is full ({self.max_queue_size} pending)") from None
+        return await future
+
+    async def _collect(self) -> List[Any]:
+        assert self._queue is not None
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.batch_wait_timeout_s
+        while len(batch) < self.max_batch_size:
+            # Drain whatever is already queued without yielding
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        slots = asyncio.Semaphore(self.max_concurrent_batches)
+        while True:
+            await slots.acquire()
+            try:
+                batch = await self._collect()
+            except BaseException:
+                slots.release()
+                raise
+            task = asyncio.create_task(self._dispatch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+            task.add_done_callback(lambda _: slots.release())
+
+    async def _dispatch(self, batch: List[Any]) -> None:
+        # Skip items whose callers gave up (were cancelled) while they were queued
+        batch = [(item, future) for item, future in batch if not future.done()]
+        if not batch:
+            return
+        items = [item for item, _ in batch]
+        futures = [future for _, future in batch]
+        try:
+            results = self.handler(items)
+            if asyncio.iscoroutine(results):
+                results = await results
+            if len(results) != len(items):
+                raise RuntimeError(f"Batch handler returned {len(results)} results for {len(items)} items")
+        except Exception as exc:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for future, result in zip(futures, results):
+            if not future.done():
+                future.set_result(result)
+
+
+def run_batch(engine: InferenceEngine, images: List[np.ndarray]) -> List[Tuple[bytes, float, float]]:
+    """Run one stacked inference over decoded `(224, 224, 3)` uint8 images.
+
+    Executed on an inference worker thread. Each result is returned together
+    with the `perf_counter` timestamps at which the batch started and finished
+    computing, so callers can split queue wait from compute time.
+    """
+    started = time.perf_counter()
+    METRICS.observe_batch(len(images))
+    # Normalise into this worker thread's preallocated batch tensor, padded
+    # to the engine's bucket size so the compiled function is never retraced
+    batch = preprocess_batch(images, pad_to=engine.bucket_size(len(images)))
+    preds = engine.predict(batch, len(images))
+    inferred = time.perf_counter()
+    # Serialized JSON per image, rendered without building intermediate dicts
+    results = POSTPROCESSOR.to_json(preds)
+    finished = time.perf_counter()
+    METRICS.observe("inference", inferred - started)
+    METRICS.observe("postprocess", finished - inferred)
+    return [(result, started, finished) for result in results]
+
+
+def warm_up(engine: InferenceEngine, warmup: Warmup) -> None:
+    """Warm `engine` up; runs on an inference worker so its batch buffer is allocated too."""
+    try:
+        warmup.run(engine, POSTPROCESSOR.to_json)
+    except Exception:
+        logger.exception("Warmup failed; /ready stays unavailable")
+        return
+    METRICS.observe_warmup(warmup.duration_s)
+    logger.info(f"Warmup finished in {warmup.duration_s:.2f}s (batch sizes {list(engine.buckets)})")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifespan context: load model on startup and clear on shutdown."""
-    # Load model into app.state so it's accessible in request handlers
-    try:
-        import tensorflow as tf
+    if INFERENCE_CLIENT is not None:
+        # The inference process loads, warms up and batches; this worker only decodes
+        app.state.decode_limiter = anyio.CapacityLimiter(THREAD_SETTINGS.decode)
+        INFERENCE_CLIENT.start()
+        try:
+            yield
+        finally:
+            INFERENCE_CLIENT.stop()
+        return
 
-        model_path = Path(MODEL_PATH)
-        app.state.model = tf.keras.models.load_model(str(model_path))
+    # Load the inference engine into app.state so it's accessible in request
+    # handlers; the backend (Keras, TFLite or ONNX) follows MODEL_PATH's extension
+    logger.info(f"Thread settings: {THREAD_SETTINGS.describe()}")
+    try:
+        app.state.engine = load_engine(
+            MODEL_PATH, buckets=power_of_two_buckets(MAX_BATCH_SIZE), num_threads=THREAD_SETTINGS.intra_op
+        )
         app.state._model_load_exception = None
     except Exception as exc:  # pragma: no cover - environment dependent
-        app.state.model = None
+        app.state.engine = None
         app.state._model_load_exception = exc
+
+    # Inference runs on dedicated threads so the event loop only handles I/O;
+    # TensorFlow releases the GIL while computing.
+    app.state.executor = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="inference")
+    # Decodes share the CPUs with inference; more concurrent decodes than CPUs only adds contention
+    app.state.decode_limiter = anyio.CapacityLimiter(THREAD_SETTINGS.decode)
+    loop = asyncio.get_running_loop()
+
+    async def handle_batch(images: List[np.ndarray]) -> List[Tuple[bytes, float, float]]:
+        return await loop.run_in_executor(app.state.executor, run_batch, app.state.engine, images)
+
+    app.state.batcher = MicroBatcher(
+        handle_batch,
+        max_batch_size=MAX_BATCH_SIZE,
+        batch_wait_timeout_s=BATCH_WAIT_TIMEOUT_S,
+        max_queue_size=INFERENCE_QUEUE_DEPTH,
+        max_concurrent_batches=INFERENCE_WORKERS,
+    )
+    app.state.batcher.start()
+    # Warm up in the background so /health answers meanwhile; /ready waits for it
+    app.state.warmup = Warmup.from_env()
+    if app.state.engine is not None:
+        loop.run_in_executor(app.state.executor, warm_up, app.state.engine, app.state.warmup)
     try:
         yield
     finally:
-        if hasattr(app.state, "model"):
-            app.state.model = None
+        await app.state.batcher.stop()
+        app.state.executor.shutdown(wait=True)
+        app.state.engine = None
 
 
 app = FastAPI(lifespan=lifespan)
 
 
+def model_error() -> Optional[str]:
+    """Why requests cannot be served, or None once a model is available."""
+    if INFERENCE_CLIENT is not None:
+        return INFERENCE_CLIENT.model_error
+    if getattr(app.state, "engine", None) is None:
+        return f"Model not loaded: {getattr(app.state, '_model_load_exception', None)}"
+    return None
+
+
+async def submit(image: np.ndarray) -> Tuple[bytes, float, float]:
+    """Submit one decoded image to the micro-batcher, counting it as pending until it is answered."""
+    if INFERENCE_CLIENT is not None and not INFERENCE_CLIENT.free_slots:
+        raise QueueFullError(f"Inference queue is full ({INFERENCE_CLIENT.capacity} pending)")
+    # inc/dec rather than a callback gauge, which multiprocess metrics cannot export
+    METRICS.pending.inc()
+    try:
+        if INFERENCE_CLIENT is not None:
+            return await INFERENCE_CLIENT.submit(image)
+        return await app.state.batcher.submit(image)
+    finally:
+        METRICS.pending.dec()
+
+
+def free_capacity() -> Optional[int]:
+    """How many more frames can be submitted right now without a `QueueFullError` (None: unbounded)."""
+    if INFERENCE_CLIENT is not None:
+        return INFERENCE_CLIENT.free_slots
+    batcher: MicroBatcher = app.state.batcher
+    return batcher.max_queue_size - batcher.queue_depth if batcher.max_queue_size else None
+
+
+async def submit_all(images: Sequence[np.ndarray]) -> List[Tuple[bytes, float, float]]:
+    """Submit frames that belong to one request: all of them are answered, or none.
+
+    Raises `QueueFullError` up front if the queue cannot take every frame. If
+    one is rejected anyway, the frames already queued are cancelled, so they
+    are not inferred for a request that has failed.
+    """
+    free = free_capacity()
+    if free is not None and len(images) > free:
+        raise QueueFullError(f"Inference queue cannot take {len(images)} frames ({free} free)")
+    tasks = [asyncio.ensure_future(submit(image)) for image in images]
+    try:
+        return list(await asyncio.gather(*tasks))
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+
+async def run_decode(func: Callable[..., Any], *args: Any) -> Any:
+    """Run a CPU-bound decode on a worker thread, at most `THREAD_SETTINGS.decode` at a time."""
+    return await anyio.to_thread.run_sync(func, *args, limiter=app.state.decode_limiter)
+
+
 @app.get("/health")
 def health() -> Dict[str, str]:
+    error = model_error()
+    if error is not None:
+        raise HTTPException(status_code=503, detail=error)
     return {"status": "healthy", "service": "fastapi-mobilenetv2"}
 
 
-@app.post("/predict")
-async def predict(file: UploadFile = File(...)) -> Any:
-    model = getattr(app.state, "model", None)
-    if model is None:
-        raise HTTPException(status_code=500, detail=f"Model not loaded: {getattr(app.state, '_model_load_exception', None)}")
-
-    content = await file.read()
-    input_tensor = preprocess_image(content)
-    
-    # Simple single prediction
-    preds = model.predict(input_tensor, verbose=0)
-    pred = preds[0]
-
-    top_indices = np.argsort(pred)[-5:][::-1]
-    results = []
-    for idx in top_indices:
-        results.append(
-            {
-                "class_id": int(idx),
-                "class_name": IMAGENET_LABELS[idx] if idx < len(IMAGENET_LABELS) else f"class_{idx}",
-                "confidence": float(pred[idx]),
-            }
+@app.get("/ready")
+def ready() -> JSONResponse:
+    """Readiness: 200 once the model is loaded and warmed up, 503 before."""
+    if INFERENCE_CLIENT is not None:
+        status = {"service": "fastapi-mobilenetv2", **INFERENCE_CLIENT.status()}
+        return JSONResponse(status, status_code=200 if status["ready"] else 503)
+    warmup: Optional[Warmup] = getattr(app.state, "warmup", None)
+    status = {"service": "fastapi-mobilenetv2", **(warmup.status() if warmup else {"ready": False})}
+    if getattr(app.state, "engine", None) is None:
+        status.update(ready=False, error=f"Model not loaded: {getattr(app.state, '_model_load_exception', None)}")
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+
+@app.get("/cache_stats")
+def cache_stats() -> Dict[str, Any]:
+    return PREDICTION_CACHE.stats()
+
+
+@app.get("/metrics")
+def metrics() -> Response:
+    body, content_type = metrics_response()
+    return Response(body, media_type=content_type)
+
+
+class ProfileRequest(BaseModel):
+    seconds: float = 10.0
+    top: int = 20
+    idle: bool = False
+    tf_trace: bool = False
+
+
+@app.post("/admin/profile")
+async def admin_profile(options: ProfileRequest, x_admin_token: Optional[str] = Header(None)) -> Dict[str, Any]:
+    try:
+        check_admin(x_admin_token)
+    except PermissionError as exc:
+        raise HTTPException(status_code=403, detail=str(exc)) from exc
+    try:
+        return await capture_profile(
+            options.seconds, "fastapi", top=options.top, idle=options.idle, tf_trace=options.tf_trace
         )
-    
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    except RuntimeError as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
+
+
+@app.post("/predict")
+async def predict(file: UploadFile = File(...)) -> Response:
+    with METRICS.in_flight("predict"):
+        return await _predict(file)
+
+
+async def _predict(file: UploadFile) -> Response:
+    error = model_error()
+    if error is not None:
+        raise HTTPException(status_code=500, detail=error)
+
+    with METRICS.time("upload_read"):
+        content = await file.read()
+    # Identical uploads are answered from the cache without decoding or batching
+    cache_key = content_key(content) if PREDICTION_CACHE.enabled else None
+    if cache_key is not None:
+        cached = PREDICTION_CACHE.get(cache_key)
+        if cached is not None:
+            return Response(json_array([cached]), media_type="application/json", headers={"Server-Timing": "cache;desc=hit"})
+
+    # Decoding is CPU-bound; keep it off the event loop as well
+    try:
+        with METRICS.time("decode"):
+            image = await run_decode(load_image, content)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    # Concurrent requests share one inference call via the micro-batcher
+    enqueued = time.perf_counter()
+    try:
+        result, started, finished = await submit(image)
+    except QueueFullError as exc:
+        raise HTTPException(status_code=503, detail=str(exc)) from exc
+    METRICS.observe("queue_wait", started - enqueued)
+    if cache_key is not None:
+        PREDICTION_CACHE.put(cache_key, result)
+
+    # Queue wait covers batching delay plus time waiting for a free inference worker
+    server_timing = f"queue;dur={(started - enqueued) * 1000:.2f}, compute;dur={(finished - started) * 1000:.2f}"
+
     # Return as a list with one item to match the response shape of the other services
-    return [{
-        "predictions": results,
-        "top_prediction": results[0]["class_name"],
-        "confidence": results[0]["confidence"],
-    }]
\ No newline at end of file
+    with METRICS.time("serialize"):
+        body = json_array([result])
+    return Response(body, media_type="application/json", headers={"Server-Timing": server_timing})
+
+
+@app.post("/predict_tensor")
+async def predict_tensor(request: Request) -> Response:
+    with METRICS.in_flight("predict_tensor"):
+        return await _predict_tensor(request)
+
+
+async def _predict_tensor(request: Request) -> Response:
+    error = model_error()
+    if error is not None:
+        raise HTTPException(status_code=500, detail=error)
+
+    with METRICS.time("upload_read"):
+        body = await request.body()
+    try:
+        shape = request.headers.get(TENSOR_SHAPE_HEADER)
+        with METRICS.time("decode"):
+            tensor = decode_tensor(body, parse_shape(shape) if shape else None)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    # Each frame is a view into the request body and batches like a decoded upload.
+    # Frames go in batch-sized chunks, so tensors larger than the queue fit too.
+    limit = INFERENCE_CLIENT.capacity if INFERENCE_CLIENT is not None else INFERENCE_QUEUE_DEPTH
+    chunk = min(MAX_BATCH_SIZE, limit) if limit else MAX_BATCH_SIZE
+    enqueued = time.perf_counter()
+    outputs: List[Tuple[bytes, float, float]] = []
+    try:
+        for start in range(0, len(tensor), chunk):
+            outputs += await submit_all(tensor[start : start + chunk])
+    except QueueFullError as exc:
+        raise HTTPException(status_code=503, detail=str(exc)) from exc
+
+    started = min(output[1] for output in outputs)
+    finished = max(output[2] for output in outputs)
+    METRICS.observe("queue_wait", started - enqueued)
+    server_timing = f"queue;dur={(started - enqueued) * 1000:.2f}, compute;dur={(finished - started) * 1000:.2f}"
+    with METRICS.time("serialize"):
+        body = json_array([output[0] for output in outputs])
+    return Response(body, media_type="application/json", headers={"Server-Timing": server_timing})
+
+
+@app.post("/predict_bulk")
+async def predict_bulk(request: Request) -> Response:
+    error = model_error()
+    if error is not None:
+        raise HTTPException(status_code=500, detail=error)
+
+    async def predict_images(images: List[bytes]) -> List[Union[bytes, Exception]]:
+        with METRICS.time("decode"):
+            decoded = await run_decode(decode_images, images)
+        outputs = await asyncio.gather(
+            *(submit(image) for image in decoded if not isinstance(image, Exception)),
+            return_exceptions=True,
+        )
+        return merge_results(decoded, (o if isinstance(o, Exception) else o[0] for o in outputs))
+
+    # Each chunk of MAX_BATCH_SIZE images is submitted at once, so the batcher forms full batches
+    items = iter_bulk_items(request.stream(), bulk_format(request.headers.get("content-type")))
+    lines = stream_predictions(items, predict_images, batch_size=MAX_BATCH_SIZE)
+    return ndjson_response(METRICS.in_flight_stream("predict_bulk", lines))
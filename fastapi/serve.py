@@ -0,0 +1,248 @@
+"""Pre-forking launcher for the FastAPI app in `main.py`.
+
+`uvicorn --workers N` spawns every worker as a fresh interpreter, which
+imports FastAPI, NumPy and TensorFlow and loads its own model, so resident
+memory grows by a full process per worker. This launcher imports all of that
+once in the parent, freezes the parent's objects (`gc.freeze`, so the
+garbage collector does not dirty their pages) and forks the workers, which
+then share those pages copy-on-write:
+
+* the Python heap of every imported module, TensorFlow's included
+* `.tflite` weights, which TFLite memory-maps from the model file, so all
+  workers read the same page-cache pages
+* shared library code (shared either way)
+
+Each worker still builds its own engine in the app's lifespan. A loaded
+TensorFlow or ONNX Runtime model owns thread pools and runtime state that do
+not survive `fork`, so Keras variables and ONNX initializers stay private
+per worker; `.tflite` is the format whose weights are fully shared.
+
+Configured through environment variables:
+
+* `WEB_CONCURRENCY`: worker processes (default 1: serve from this process,
+  like `uvicorn main:app`)
+* `SHARED_INFERENCE`: `1` forks one extra inference process that holds the
+  only model and batches the frames of all workers, which exchange them
+  through shared memory instead of loading a model each (see
+  `shared_inference.py`; default `0`)
+* `HOST` / `PORT`: listen address (default `0.0.0.0:8000`)
+* `MAX_RESTARTS`: restarts a child may need within `RESTART_WINDOW_S`
+  seconds (default 5 in 60) before the launcher gives up and exits
+
+With several workers, each sizes its thread pools for its share of the CPUs
+(`CPU_LIMIT`, see `common.runtime`; in shared mode the inference process
+sizes them for all CPUs and the workers split the decode threads), Prometheus metrics are aggregated across
+workers through `PROMETHEUS_MULTIPROC_DIR` (a fresh temporary directory
+unless set), and workers that exit are restarted after a backoff that doubles
+with every recent exit. A child that keeps exiting, or an inference process
+that dies before it is ready (e.g. the model cannot be loaded), shuts the
+launcher down with status 1 rather than leaving workers that accept requests
+no process can answer.
+
+Usage:
+    WEB_CONCURRENCY=4 python fastapi/serve.py
+    WEB_CONCURRENCY=4 SHARED_INFERENCE=1 python fastapi/serve.py
+"""
+
+from __future__ import annotations
+
+import gc
+import importlib
+import logging
+import os
+import signal
+import socket
+import sys
+import tempfile
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+import uvicorn
+
+logger = logging.getLogger("uvicorn.error")
+
+# Child index of the shared inference process; workers are numbered from 0
+INFERENCE_PROCESS = -1
+
+
+class RestartPolicy:
+    """Whether an exited child is restarted, and after how long.
+
+    Every exit of a child doubles its restart delay, from `backoff_s` up to
+    `max_backoff_s`, and more than `max_restarts` exits within `window_s`
+    seconds exhaust its budget.
+    """
+
+    def __init__(self, max_restarts: int = 5, window_s: float = 60.0, backoff_s: float = 1.0,
+                 max_backoff_s: float = 30.0):
+        self.max_restarts = max_restarts
+        self.window_s = window_s
+        self.backoff_s = backoff_s
+        self.max_backoff_s = max_backoff_s
+        self._exits: Dict[int, Deque[float]] = {}
+
+    @classmethod
+    def from_env(cls) -> "RestartPolicy":
+        return cls(int(os.getenv("MAX_RESTARTS", "5")), float(os.getenv("RESTART_WINDOW_S", "60")))
+
+    def record_exit(self, index: int, now: Optional[float] = None) -> Optional[float]:
+        """Delay before restarting child `index`, or None once its budget is spent."""
+        now = time.monotonic() if now is None else now
+        exits = self._exits.setdefault(index, deque())
+        exits.append(now)
+        while exits and exits[0] <= now - self.window_s:
+            exits.popleft()
+        if len(exits) > self.max_restarts:
+            return None
+        return min(self.backoff_s * 2 ** (len(exits) - 1), self.max_backoff_s)
+
+
+def preload_framework(model_path: str) -> None:
+    """Import the inference framework `model_path` needs without creating any runtime state."""
+    extension = os.path.splitext(model_path)[1].lower()
+    if extension == ".onnx":
+        importlib.import_module("onnxruntime")
+    elif extension == ".tflite":
+        from common.inference import _tflite_interpreter_class
+
+        _tflite_interpreter_class()
+    else:
+        tf = importlib.import_module("tensorflow")
+        # Keras is imported lazily on first attribute access
+        tf.keras.models
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app: object, sock: socket.socket) -> None:
+    # Uvicorn installs its own handlers; until then, die like a plain process
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    server = uvicorn.Server(uvicorn.Config(app, lifespan="on"))
+    server.run(sockets=[sock])
+
+
+def serve(workers: int, host: str, port: int, shared_inference: bool = False) -> int:
+    from common.runtime import available_cpus
+
+    cpus, _ = available_cpus()
+    if shared_inference:
+        # The inference process is the only model user; workers just decode
+        os.environ["CPU_LIMIT"] = f"{cpus:g}"
+        os.environ.setdefault("DECODE_THREADS", str(max(1, int(cpus) // workers)))
+    else:
+        # Every worker gets an equal share of the CPUs for its thread pools
+        os.environ["CPU_LIMIT"] = f"{cpus / workers:g}"
+    if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="prometheus-")
+
+    preload_framework(os.getenv("MODEL_PATH", "model/mobilenet_v2.keras"))
+    app_module = importlib.import_module("main")
+    from prometheus_client import multiprocess
+
+    slots = None
+    if shared_inference:
+        from shared_inference import InferenceClient, SharedSlots, run_inference_server
+
+        # Each worker may have as many frames in flight as the single-process queue allows
+        slots = SharedSlots(workers, app_module.INFERENCE_QUEUE_DEPTH or 256)
+    sock = bind_socket(host, port)
+    # Objects allocated so far are never collected; without this, the first
+    # collection in each worker would write to (and so copy) their pages
+    gc.freeze()
+
+    children: Dict[int, int] = {}
+    stopping = False
+    exit_code = 0
+    restarts = RestartPolicy.from_env()
+
+    def spawn(index: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            if index == INFERENCE_PROCESS:
+                sock.close()
+                try:
+                    run_inference_server(slots, app_module)
+                except Exception:
+                    logger.exception("Inference process failed")
+                finally:
+                    os._exit(1)
+            try:
+                if slots is not None:
+                    app_module.INFERENCE_CLIENT = InferenceClient(slots, index)
+                run_worker(app_module.app, sock)
+            finally:
+                os._exit(0)
+        children[pid] = index
+
+    def stop(signum: int, _frame: object) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            os.kill(pid, signal.SIGTERM)
+
+    def give_up(reason: str) -> None:
+        nonlocal exit_code
+        logger.error(f"{reason}; shutting down")
+        exit_code = 1
+        stop(signal.SIGTERM, None)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    logger.info(f"Forking {workers} workers on {host}:{port}" + (" and an inference process" if slots else ""))
+    if slots is not None:
+        spawn(INFERENCE_PROCESS)
+    for index in range(workers):
+        spawn(index)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        index = children.pop(pid, None)
+        if index is None:
+            continue
+        multiprocess.mark_process_dead(pid)
+        if stopping:
+            continue
+        role = "Inference process" if index == INFERENCE_PROCESS else "Worker"
+        description = f"{role} {pid} exited with status {os.waitstatus_to_exitcode(status)}"
+        if index == INFERENCE_PROCESS and not slots.status().get("ready"):
+            # Failed to load or warm up the model; a restart would fail the same way
+            give_up(f"{description} before it was ready ({slots.status().get('error') or 'see its log'})")
+            continue
+        delay = restarts.record_exit(index)
+        if delay is None:
+            give_up(f"{description}, more than {restarts.max_restarts} restarts within {restarts.window_s:g}s")
+            continue
+        logger.warning(f"{description}; restarting in {delay:g}s")
+        time.sleep(delay)
+        # A signal may have arrived during the delay
+        if not stopping:
+            spawn(index)
+    return exit_code
+
+
+def main() -> Optional[int]:
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s:     %(message)s")
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    host = os.getenv("HOST", "0.0.0.0")
+    port = int(os.getenv("PORT", "8000"))
+    shared_inference = os.getenv("SHARED_INFERENCE", "0") == "1"
+    if workers <= 1 and not shared_inference:
+        uvicorn.run("main:app", host=host, port=port)
+        return
+    return serve(max(workers, 1), host, port, shared_inference)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
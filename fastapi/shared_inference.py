@@ -0,0 +1,301 @@
+"""Shared-memory inference process for multi-worker FastAPI (`serve.py` with `SHARED_INFERENCE=1`).
+
+With `WEB_CONCURRENCY` workers that each load the model, every worker holds its
+own copy of the weights and batches only its own requests: under moderate load
+each worker runs small batches, and the copies compete for the same CPUs. In
+shared mode the HTTP workers load no model. They read and decode uploads and
+copy each `(224, 224, 3)` uint8 frame into a slot of an anonymous shared memory
+block; a single inference process holds the model, batches the frames of all
+workers together (`MAX_BATCH_SIZE`, `BATCH_WAIT_TIMEOUT_S`) through the app's
+`run_batch` and writes each rendered JSON result back into the frame's slot.
+
+Every worker owns `slots_per_worker` slots, so a frame is only ever written by
+its worker and a result only by the inference process, and no locks are
+needed. Slots are announced over pipes: workers write `(slot, sequence)`
+records to one request pipe (writes this small are atomic, so records of
+different workers never interleave) and the inference process answers on each
+worker's own response pipe. The sequence number lets a worker discard a late
+answer for a slot it has since reused. Pipes outlive a worker that crashes, so
+a restarted worker drains its pipe and starts its sequence at a random value;
+answers meant for its predecessor then never match its own requests.
+
+The inference process also publishes its warmup status in the block, which
+the workers serve at `/ready`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import json
+import logging
+import mmap
+import os
+import select
+import signal
+import struct
+import time
+import typing as t
+from collections import deque
+
+import numpy as np
+
+logger = logging.getLogger("uvicorn.error")
+
+FRAME_SHAPE = (224, 224, 3)
+# The rendered top-5 JSON of one image is a few hundred bytes
+RESULT_BYTES = 4096
+STATUS_BYTES = 4096
+RECORD = struct.Struct("<II")
+# Every write is a single record, so reads of whole records never split one
+READ_BYTES = RECORD.size * 512
+OK, FAILED = 1.0, 2.0
+
+
+class SharedSlots:
+    """Frame and result slots in anonymous shared memory, plus the pipes announcing them.
+
+    Created in the parent before forking: the inference process and every
+    worker inherit the same mapping and pipes.
+    """
+
+    def __init__(self, workers: int, slots_per_worker: int):
+        if workers < 1 or slots_per_worker < 1:
+            raise ValueError("workers and slots_per_worker must be >= 1")
+        self.workers = workers
+        self.slots_per_worker = slots_per_worker
+        count = workers * slots_per_worker
+        frame_bytes = int(np.prod(FRAME_SHAPE))
+        # Per slot: result length, OK/FAILED and the perf_counter timestamps
+        # at which its batch started and finished computing
+        meta_bytes = 4 * 8
+        size = count * (frame_bytes + RESULT_BYTES + meta_bytes) + 8 + STATUS_BYTES
+        # An anonymous mapping is MAP_SHARED, so forked children see each other's writes
+        self._buffer = mmap.mmap(-1, size)
+        offset = 0
+        self.frames = np.ndarray((count, *FRAME_SHAPE), np.uint8, self._buffer, offset)
+        offset += self.frames.nbytes
+        self.results = np.ndarray((count, RESULT_BYTES), np.uint8, self._buffer, offset)
+        offset += self.results.nbytes
+        self.meta = np.ndarray((count, 4), np.float64, self._buffer, offset)
+        offset += self.meta.nbytes
+        self._status_length = np.ndarray((1,), np.int64, self._buffer, offset)
+        self._status = np.ndarray((STATUS_BYTES,), np.uint8, self._buffer, offset + 8)
+
+        self.request_r, self.request_w = os.pipe()
+        self.responses = [os.pipe() for _ in range(workers)]
+        os.set_blocking(self.request_r, False)
+        for read_fd, _ in self.responses:
+            os.set_blocking(read_fd, False)
+
+    def worker_of(self, slot: int) -> int:
+        return slot // self.slots_per_worker
+
+    def write_result(self, slot: int, payload: bytes, started: float, finished: float, ok: bool = True) -> None:
+        if len(payload) > RESULT_BYTES:
+            payload, ok = f"Result of {len(payload)} bytes exceeds the {RESULT_BYTES}-byte slot".encode(), False
+        self.results[slot, : len(payload)] = np.frombuffer(payload, np.uint8)
+        self.meta[slot] = (len(payload), OK if ok else FAILED, started, finished)
+
+    def read_result(self, slot: int) -> t.Tuple[bytes, float, float]:
+        length, state, started, finished = self.meta[slot]
+        payload = self.results[slot, : int(length)].tobytes()
+        if state != OK:
+            raise RuntimeError(payload.decode(errors="replace"))
+        return payload, float(started), float(finished)
+
+    def publish_status(self, status: t.Dict[str, t.Any]) -> None:
+        payload = json.dumps(status).encode()[:STATUS_BYTES]
+        # Readers see no status (not ready) while it is rewritten
+        self._status_length[0] = 0
+        self._status[: len(payload)] = np.frombuffer(payload, np.uint8)
+        self._status_length[0] = len(payload)
+
+    def status(self) -> t.Dict[str, t.Any]:
+        length = int(self._status_length[0])
+        try:
+            return json.loads(self._status[:length].tobytes()) if length else {"ready": False}
+        except ValueError:
+            return {"ready": False}
+
+
+class InferenceClient:
+    """A worker's side: copies frames into its own slots and awaits their results on the event loop."""
+
+    def __init__(self, slots: SharedSlots, worker: int, timeout_s: float = 60.0):
+        self.slots = slots
+        self.worker = worker
+        self.timeout_s = timeout_s
+        first = worker * slots.slots_per_worker
+        self._free = list(range(first, first + slots.slots_per_worker))
+        self._pending: t.Dict[int, t.Tuple[int, asyncio.Future]] = {}
+        # Random, so a restarted worker never reuses its predecessor's (slot, sequence) pairs
+        self._sequence = int.from_bytes(os.urandom(4), "little")
+        self._response_fd = slots.responses[worker][0]
+
+    @property
+    def capacity(self) -> int:
+        return self.slots.slots_per_worker
+
+    @property
+    def free_slots(self) -> int:
+        return len(self._free)
+
+    @property
+    def model_error(self) -> t.Optional[str]:
+        """Why the inference process could not load the model, if it failed."""
+        status = self.slots.status()
+        return None if status.get("model_loaded", True) else status.get("error")
+
+    def status(self) -> t.Dict[str, t.Any]:
+        return self.slots.status()
+
+    def start(self) -> None:
+        # Answers left in the pipe were meant for a previous worker on these slots
+        while True:
+            try:
+                if not os.read(self._response_fd, READ_BYTES):
+                    break
+            except BlockingIOError:
+                break
+        asyncio.get_running_loop().add_reader(self._response_fd, self._on_response)
+
+    def stop(self) -> None:
+        asyncio.get_running_loop().remove_reader(self._response_fd)
+        for _, future in self._pending.values():
+            if not future.done():
+                future.set_exception(RuntimeError("Inference client stopped"))
+
+    async def submit(self, image: np.ndarray) -> t.Tuple[bytes, float, float]:
+        """Run one `(224, 224, 3)` uint8 frame through the inference process.
+
+        Returns the rendered result with the `perf_counter` timestamps at which
+        its batch started and finished (the clock is shared by all processes).
+        """
+        if not self._free:
+            raise RuntimeError(f"All {self.capacity} shared-memory slots are in use")
+        slot = self._free.pop()
+        self._sequence = (self._sequence + 1) % 2**32
+        future = asyncio.get_running_loop().create_future()
+        self._pending[slot] = (self._sequence, future)
+        try:
+            self.slots.frames[slot] = image
+            os.write(self.slots.request_w, RECORD.pack(slot, self._sequence))
+            return await asyncio.wait_for(future, self.timeout_s)
+        finally:
+            # After a timeout the slot is reused; its sequence number discards the late answer
+            del self._pending[slot]
+            self._free.append(slot)
+
+    def _on_response(self) -> None:
+        try:
+            data = os.read(self._response_fd, READ_BYTES)
+        except BlockingIOError:
+            return
+        for slot, sequence in RECORD.iter_unpack(data):
+            entry = self._pending.get(slot)
+            if entry is None or entry[0] != sequence or entry[1].done():
+                continue
+            try:
+                entry[1].set_result(self.slots.read_result(slot))
+            except RuntimeError as exc:
+                entry[1].set_exception(exc)
+
+
+class InferenceServer:
+    """The inference process's side: batches the frames of all workers and answers them."""
+
+    def __init__(self, slots: SharedSlots, max_batch_size: int = 8, batch_wait_timeout_s: float = 0.01):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be >= 1")
+        self.slots = slots
+        self.max_batch_size = max_batch_size
+        self.batch_wait_timeout_s = max(batch_wait_timeout_s, 0.0)
+        self._pending: t.Deque[t.Tuple[int, int]] = deque()
+
+    def _read(self, timeout: t.Optional[float]) -> None:
+        if not select.select([self.slots.request_r], [], [], timeout)[0]:
+            return
+        try:
+            self._pending.extend(RECORD.iter_unpack(os.read(self.slots.request_r, READ_BYTES)))
+        except BlockingIOError:
+            pass
+
+    def collect(self, timeout: t.Optional[float] = None) -> t.List[t.Tuple[int, int]]:
+        """Next batch of `(slot, sequence)` requests, like `MicroBatcher` forms them.
+
+        Waits up to `timeout` seconds (forever if None) for a first request,
+        then until `max_batch_size` requests are queued or
+        `batch_wait_timeout_s` has elapsed, whichever comes first.
+        """
+        if not self._pending:
+            self._read(timeout)
+            if not self._pending:
+                return []
+        deadline = time.perf_counter() + self.batch_wait_timeout_s
+        while len(self._pending) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            self._read(remaining)
+        return [self._pending.popleft() for _ in range(min(len(self._pending), self.max_batch_size))]
+
+    def serve_batch(
+        self,
+        handle_batch: t.Callable[[t.List[np.ndarray]], t.List[t.Tuple[bytes, float, float]]],
+        timeout: t.Optional[float] = None,
+    ) -> int:
+        """Collect one batch, run `handle_batch` on its frames and answer every worker; returns its size."""
+        requests = self.collect(timeout)
+        if not requests:
+            return 0
+        slots = [slot for slot, _ in requests]
+        try:
+            # Frames are passed as views; preprocessing copies them into the batch tensor
+            results = handle_batch([self.slots.frames[slot] for slot in slots])
+            if len(results) != len(slots):
+                raise RuntimeError(f"Batch handler returned {len(results)} results for {len(slots)} items")
+        except Exception as exc:
+            now = time.perf_counter()
+            for slot in slots:
+                self.slots.write_result(slot, str(exc).encode(), now, now, ok=False)
+        else:
+            for slot, (payload, started, finished) in zip(slots, results):
+                self.slots.write_result(slot, payload, started, finished)
+        # One write per worker, so each learns about all of its slots at once
+        answers: t.Dict[int, bytearray] = {}
+        for slot, sequence in requests:
+            answers.setdefault(self.slots.worker_of(slot), bytearray()).extend(RECORD.pack(slot, sequence))
+        for worker, records in answers.items():
+            os.write(self.slots.responses[worker][1], records)
+        return len(requests)
+
+
+def run_inference_server(slots: SharedSlots, app: t.Any) -> None:
+    """Body of the inference process: load and warm up the model, then serve batches until killed.
+
+    `app` is the FastAPI app module (`main`), whose model settings, `run_batch`
+    and metrics the process reuses.
+    """
+    from common.inference import load_engine, power_of_two_buckets
+    from common.warmup import Warmup
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    slots.publish_status({"ready": False, "model_loaded": False, "error": None})
+    logger.info(f"Inference process {os.getpid()}: thread settings: {app.THREAD_SETTINGS.describe()}")
+    try:
+        engine = load_engine(
+            app.MODEL_PATH, buckets=power_of_two_buckets(app.MAX_BATCH_SIZE), num_threads=app.THREAD_SETTINGS.intra_op
+        )
+    except Exception as exc:
+        slots.publish_status({"ready": False, "model_loaded": False, "error": f"Model not loaded: {exc}"})
+        raise
+    warmup = Warmup.from_env()
+    app.warm_up(engine, warmup)
+    slots.publish_status({**warmup.status(), "model_loaded": True})
+
+    server = InferenceServer(slots, app.MAX_BATCH_SIZE, app.BATCH_WAIT_TIMEOUT_S)
+    handle_batch = functools.partial(app.run_batch, engine)
+    while True:
+        server.serve_batch(handle_batch)
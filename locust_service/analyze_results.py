@@ -8,6 +8,7 @@ import glob
 import json
 from datetime import datetime
 import csv
+import sys
 
 def load_locust_results(csv_path: str) -> dict:
     """Load Locust CSV results."""
@@ -146,6 +147,37 @@ Generated: {timestamp}
     )
 
 
+def record_results(stats_by_service: dict) -> None:
+    """Record the run in the results store when the repository scripts are available."""
+    store_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts", "generic")
+    sys.path.insert(0, store_dir)
+    try:
+        from results_store import record_run
+    except ImportError:
+        # Standalone copy (e.g. the locust image) without the repository scripts
+        return
+
+    names = {"total_requests": "requests", "failure_count": "failures", "avg_response_time": "avg",
+             "max_response_time": "max", "rps": "rps", "p50": "p50", "p95": "p95", "p99": "p99"}
+    rows = []
+    for service, stats in stats_by_service.items():
+        if not stats:
+            continue
+        metrics = {names[key]: value for key, value in stats.items() if key in names}
+        if stats.get("total_requests"):
+            metrics["success_rate"] = 100 * (1 - stats.get("failure_count", 0) / stats["total_requests"])
+        rows.append((service, 0, metrics))
+    if not rows:
+        return
+    try:
+        # Not `locust`: these runs have no user-count levels, so they share no keys with compare_locust.py's
+        run_id = record_run("locust-analyze", rows, {"analyzer": "analyze_results"})
+    except Exception as e:  # the analysis must not depend on the store
+        print(f"Could not record results: {e}")
+        return
+    print(f"Recorded run {run_id} in the results store")
+
+
 def main():
     """Main function to analyze results."""
     results_dir = os.path.dirname(os.path.abspath(__file__))
@@ -172,6 +204,11 @@ def main():
         fastapi_results.get("stats", {})
     )
     
+    record_results({
+        "bentoml": bentoml_results.get("stats", {}),
+        "fastapi": fastapi_results.get("stats", {}),
+    })
+
     # Save report
     report_path = os.path.join(results_dir, "comparison_summary.md")
     with open(report_path, 'w') as f:
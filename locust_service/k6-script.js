@@ -0,0 +1,50 @@
+// k6 load test that samples images from a corpus pack (scripts/generic/corpus.py).
+//
+//   k6 run -e BASE_URL=http://localhost:8000 -e FIELD=file \
+//       -e CORPUS_PATH=../tmp/corpus/corpus.pack -e VUS=20 -e DURATION=30s locust_service/k6-script.js
+//
+// k6 cannot memory-map files, so each VU reads the pack once at init time
+// (`open` in the init context) and slices images out of that buffer; no
+// request touches the disk or re-encodes anything. FastAPI expects the
+// multipart field `file`, BentoML and Ray Serve `files`.
+
+import http from 'k6/http';
+import { check } from 'k6';
+
+const BASE_URL = __ENV.BASE_URL || 'http://localhost:8000';
+const FIELD = __ENV.FIELD || (BASE_URL.includes(':8000') ? 'file' : 'files');
+const CORPUS_PATH = __ENV.CORPUS_PATH || '../tmp/corpus/corpus.pack';
+
+const CONTENT_TYPES = { jpeg: 'image/jpeg', png: 'image/png', webp: 'image/webp' };
+const EXTENSIONS = { jpeg: 'jpg', png: 'png', webp: 'webp' };
+
+export const options = {
+  vus: parseInt(__ENV.VUS || '10', 10),
+  duration: __ENV.DURATION || '30s',
+};
+
+// Header: 8 bytes magic "MBCORPUS", uint64 LE index length, then the ASCII JSON index
+const pack = open(CORPUS_PATH, 'b');
+const header = new DataView(pack, 0, 16);
+const magic = String.fromCharCode(...new Uint8Array(pack, 0, 8));
+if (magic !== 'MBCORPUS') {
+  throw new Error(`${CORPUS_PATH} is not a corpus pack`);
+}
+const indexLength = header.getUint32(8, true) + header.getUint32(12, true) * 2 ** 32;
+const indexBytes = new Uint8Array(pack, 16, indexLength);
+let indexJson = '';
+for (let i = 0; i < indexLength; i += 8192) {
+  indexJson += String.fromCharCode(...indexBytes.subarray(i, i + 8192));
+}
+const index = JSON.parse(indexJson);
+
+export default function () {
+  const position = Math.floor(Math.random() * index.sequence.length);
+  const blob = index.blobs[index.sequence[position]];
+  const name = `${String(position).padStart(6, '0')}.${EXTENSIONS[blob.format]}`;
+  const body = {};
+  body[FIELD] = http.file(pack.slice(blob.offset, blob.offset + blob.length), name, CONTENT_TYPES[blob.format]);
+
+  const res = http.post(`${BASE_URL}/predict`, body, { timeout: '30s' });
+  check(res, { 'status is 200': (r) => r.status === 200 });
+}
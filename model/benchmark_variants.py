@@ -0,0 +1,229 @@
+"""
+Benchmark the exported MobileNetV2 variants against the fp32 Keras model.
+
+For every model file found in `model/` (Keras, TFLite fp32, ONNX and the
+quantized TFLite variants written by `download_model.py`) this reports:
+
+* latency of single-image inference (p50/p95),
+* throughput at a fixed batch size,
+* peak resident memory of a process that only loads and runs that variant,
+* top-1 / top-5 agreement with the fp32 Keras predictions.
+
+Agreement is measured on the images in `--images` (default: the INT8
+calibration set); without images a seeded synthetic set is used, which only
+checks numerical drift, not accuracy.
+
+Each variant runs in its own spawned process so memory numbers are not
+polluted by the others. Run from the repository root:
+
+    python -m model.benchmark_variants --iterations 50 --batch-size 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import time
+from datetime import datetime
+
+os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+
+import numpy as np
+
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(MODEL_DIR)
+DEFAULT_IMAGES_DIR = os.getenv("CALIBRATION_DIR", os.path.join(MODEL_DIR, "calibration"))
+DEFAULT_REPORT_DIR = os.path.join(PROJECT_DIR, "reports", "models")
+REFERENCE_VARIANT = "keras_fp32"
+
+VARIANT_FILES = {
+    "keras_fp32": "mobilenet_v2.keras",
+    "tflite_fp32": "mobilenet_v2.tflite",
+    "onnx_fp32": "mobilenet_v2.onnx",
+    "tflite_dynamic_int8": "mobilenet_v2_dynamic_int8.tflite",
+    "tflite_float16": "mobilenet_v2_float16.tflite",
+    "tflite_int8": "mobilenet_v2_int8.tflite",
+}
+
+
+def available_variants(model_dir: str = MODEL_DIR) -> dict[str, str]:
+    """Return `{variant: path}` for the exported model files that exist."""
+    variants = {}
+    for name, filename in VARIANT_FILES.items():
+        path = os.path.join(model_dir, filename)
+        if os.path.exists(path):
+            variants[name] = path
+    return variants
+
+
+def load_eval_images(directory: str, limit: int) -> tuple[np.ndarray, str]:
+    """Return `(N, 224, 224, 3)` uint8 evaluation images and a description of their source."""
+    from common.preprocessing import load_image
+
+    paths = sorted(
+        path for path in glob.glob(os.path.join(directory, "**", "*"), recursive=True)
+        if path.lower().endswith((".jpg", ".jpeg", ".png", ".webp", ".bmp"))
+    )[:limit]
+    if paths:
+        images = []
+        for path in paths:
+            with open(path, "rb") as f:
+                images.append(load_image(f.read()))
+        return np.stack(images), directory
+    # Smooth random images: less degenerate than white noise for a CNN
+    rng = np.random.default_rng(0)
+    low_res = rng.integers(0, 256, size=(limit, 7, 7, 3), dtype=np.uint8)
+    images = np.repeat(np.repeat(low_res, 32, axis=1), 32, axis=2)
+    return images, "synthetic (seeded)"
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_variant(path: str, images: np.ndarray, batch_size: int, iterations: int) -> dict:
+    """Load one variant and measure it. Runs inside a dedicated process."""
+    from common.inference import load_engine, power_of_two_buckets
+    from common.preprocessing import BatchBuffer
+
+    rss_before = peak_rss_mb()
+    load_started = time.perf_counter()
+    engine = load_engine(path, buckets=power_of_two_buckets(batch_size))
+    load_s = time.perf_counter() - load_started
+
+    buffer = BatchBuffer(capacity=max(len(images), batch_size))
+    inputs = buffer.fill(list(images)).copy()
+
+    # Warm up every bucket that will be used
+    engine.predict(inputs[:1])
+    engine.predict(inputs[:batch_size])
+
+    latencies = []
+    for i in range(iterations):
+        sample = inputs[i % len(inputs)][None]
+        started = time.perf_counter()
+        engine.predict(sample)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    batches = max(iterations // batch_size, 1)
+    started = time.perf_counter()
+    for i in range(batches):
+        start = (i * batch_size) % max(len(inputs) - batch_size + 1, 1)
+        engine.predict(inputs[start : start + batch_size])
+    throughput = batches * batch_size / (time.perf_counter() - started)
+
+    outputs = engine.predict(inputs)
+    return {
+        "backend": engine.backend,
+        "file_mb": os.path.getsize(path) / (1024 * 1024),
+        "load_s": load_s,
+        "latency_p50_ms": float(np.percentile(latencies, 50)),
+        "latency_p95_ms": float(np.percentile(latencies, 95)),
+        "throughput_ips": throughput,
+        "peak_rss_mb": peak_rss_mb(),
+        "load_rss_mb": peak_rss_mb() - rss_before,
+        "top5": np.argsort(outputs, axis=1)[:, -5:][:, ::-1].tolist(),
+    }
+
+
+def agreement(reference_top5: np.ndarray, variant_top5: np.ndarray) -> tuple[float, float]:
+    """Return `(top1, top5)` agreement of a variant with the reference.
+
+    top-1: fraction of images with the same top class.
+    top-5: fraction of images whose reference top class is in the variant's top 5.
+    """
+    reference_top5 = np.asarray(reference_top5)
+    variant_top5 = np.asarray(variant_top5)
+    top1 = float(np.mean(reference_top5[:, 0] == variant_top5[:, 0]))
+    top5 = float(np.mean([ref[0] in var for ref, var in zip(reference_top5, variant_top5)]))
+    return top1, top5
+
+
+def write_report(results: dict[str, dict], meta: dict, report_dir: str) -> str:
+    os.makedirs(report_dir, exist_ok=True)
+    lines = [
+        "# 🧪 Model Variant Benchmark",
+        "",
+        f"**Run Date:** {meta['run_date']}",
+        f"- **Batch size (throughput):** {meta['batch_size']}",
+        f"- **Iterations:** {meta['iterations']}",
+        f"- **Evaluation images:** {meta['num_images']} from {meta['images_source']}",
+        f"- **Reference:** `{REFERENCE_VARIANT}`",
+        "",
+        "| Variant | File (MB) | p50 (ms) | p95 (ms) | Throughput (img/s) | Peak RSS (MB) | Top-1 agree | Top-5 agree |",
+        "| :--- | ---: | ---: | ---: | ---: | ---: | ---: | ---: |",
+    ]
+    for name, r in results.items():
+        if "error" in r:
+            lines.append(f"| {name} | - | - | - | - | - | - | error: {r['error']} |")
+            continue
+        lines.append(
+            f"| {name} | {r['file_mb']:.1f} | {r['latency_p50_ms']:.2f} | {r['latency_p95_ms']:.2f} | "
+            f"{r['throughput_ips']:.1f} | {r['peak_rss_mb']:.0f} | {r['top1_agreement']:.1%} | {r['top5_agreement']:.1%} |"
+        )
+    report_path = os.path.join(report_dir, "model_variants.md")
+    with open(report_path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    with open(os.path.join(report_dir, "model_variants.json"), "w") as f:
+        json.dump({"meta": meta, "results": results}, f, indent=2)
+    return report_path
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--images", default=DEFAULT_IMAGES_DIR, help="Directory of evaluation images")
+    parser.add_argument("--num-images", type=int, default=64)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--report-dir", default=DEFAULT_REPORT_DIR)
+    args = parser.parse_args(argv)
+
+    variants = available_variants()
+    if REFERENCE_VARIANT not in variants:
+        print(f"Reference model {VARIANT_FILES[REFERENCE_VARIANT]} not found; run model/download_model.py first")
+        return 1
+
+    images, images_source = load_eval_images(args.images, args.num_images)
+    print(f"Evaluating {len(variants)} variants on {len(images)} images from {images_source}")
+
+    results: dict[str, dict] = {}
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(processes=1, maxtasksperchild=1) as pool:
+        for name, path in variants.items():
+            print(f"  {name} ({os.path.basename(path)})...")
+            try:
+                results[name] = pool.apply(run_variant, (path, images, args.batch_size, args.iterations))
+            except Exception as exc:
+                print(f"    failed: {exc}")
+                results[name] = {"error": str(exc)}
+
+    if "error" in results[REFERENCE_VARIANT]:
+        print("Reference model failed; cannot compute agreement")
+        return 1
+    reference_top5 = results[REFERENCE_VARIANT]["top5"]
+    for r in results.values():
+        if "error" not in r:
+            r["top1_agreement"], r["top5_agreement"] = agreement(reference_top5, r.pop("top5"))
+
+    meta = {
+        "run_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "batch_size": args.batch_size,
+        "iterations": args.iterations,
+        "num_images": len(images),
+        "images_source": images_source,
+    }
+    report_path = write_report(results, meta, args.report_dir)
+    print(open(report_path).read())
+    print(f"Report saved to {report_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,6 +2,22 @@
 Download and save MobileNetV2 model for both BentoML and FastAPI services.
 Uses TensorFlow's built-in MobileNetV2 for ImageNet classification.
 
+Besides the Keras model, TFLite and ONNX exports are written next to it so the
+services can be switched to a lighter runtime via `MODEL_PATH` (see
+`common/inference.py`). The ONNX export needs `tf2onnx` and is skipped with a
+warning when it is not installed.
+
+Post-training-quantized TFLite variants are written as well:
+
+* `mobilenet_v2_dynamic_int8.tflite`: INT8 weights, float activations.
+* `mobilenet_v2_float16.tflite`: float16 weights.
+* `mobilenet_v2_int8.tflite`: full INT8 weights and activations, calibrated
+  on the images in `CALIBRATION_DIR` (default `model/calibration/`). Skipped
+  with a warning when no calibration images are found.
+
+All variants keep float32 inputs and outputs so they are drop-in replacements
+for `MODEL_PATH`. Compare them with `python -m model.benchmark_variants`.
+
 IMPORTANT: This script must be run with TensorFlow 2.16.1 to ensure
 model compatibility with the containerized services.
 """
@@ -9,10 +25,29 @@ model compatibility with the containerized services.
 import os
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
 
+import glob
+import sys
+import tempfile
+
+import numpy as np
 import tensorflow as tf
 
 MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(MODEL_DIR)
+# Run as `python model/download_model.py`: `common` lives in the project root
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
 MODEL_PATH = os.path.join(MODEL_DIR, "mobilenet_v2.keras")
+TFLITE_PATH = os.path.join(MODEL_DIR, "mobilenet_v2.tflite")
+ONNX_PATH = os.path.join(MODEL_DIR, "mobilenet_v2.onnx")
+CALIBRATION_DIR = os.getenv("CALIBRATION_DIR", os.path.join(MODEL_DIR, "calibration"))
+QUANTIZED_VARIANTS = ("dynamic_int8", "float16", "int8")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+
+
+def quantized_path(variant):
+    """Path of the TFLite file for a quantized variant."""
+    return os.path.join(MODEL_DIR, f"mobilenet_v2_{variant}.tflite")
 
 
 def download_and_save_model():
@@ -44,6 +79,110 @@ def download_and_save_model():
     return MODEL_PATH
 
 
+def load_calibration_images(directory=CALIBRATION_DIR, limit=200):
+    """Load up to `limit` images from `directory` as normalized float32 arrays.
+
+    Decoded and normalized by the services' own `common.preprocessing`, so
+    the INT8 ranges are calibrated on exactly the tensors seen at inference.
+    """
+    from common.preprocessing import load_image, preprocess_batch
+
+    paths = sorted(
+        path for path in glob.glob(os.path.join(directory, "**", "*"), recursive=True)
+        if path.lower().endswith(IMAGE_EXTENSIONS)
+    )[:limit]
+    frames = []
+    for path in paths:
+        with open(path, "rb") as f:
+            frames.append(load_image(f.read()))
+    if not frames:
+        return []
+    # preprocess_batch returns a reused buffer; copy it out
+    return list(np.array(preprocess_batch(frames)))
+
+
+def export_tflite(model, output_path=TFLITE_PATH, quantization=None, calibration_images=None):
+    """Convert a Keras model to a TFLite flatbuffer.
+
+    `quantization` is `None` (float32) or one of `QUANTIZED_VARIANTS`; `"int8"`
+    requires `calibration_images` for the representative dataset. Conversion
+    goes through a SavedModel export, which freezes the Keras 3 variables that
+    the converter cannot read directly.
+    """
+    if quantization not in (None,) + QUANTIZED_VARIANTS:
+        raise ValueError(f"Unknown quantization '{quantization}'")
+    if quantization == "int8" and not calibration_images:
+        raise ValueError("Full INT8 quantization needs calibration images")
+
+    with tempfile.TemporaryDirectory() as saved_model_dir:
+        model.export(saved_model_dir)
+        converter = tf.lite.TFLiteConverter.from_saved_model(saved_model_dir)
+        if quantization is not None:
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        if quantization == "float16":
+            converter.target_spec.supported_types = [tf.float16]
+        elif quantization == "int8":
+            def representative_dataset():
+                for image in calibration_images:
+                    yield [np.expand_dims(image, axis=0).astype(np.float32)]
+
+            converter.representative_dataset = representative_dataset
+            # Integer-only kernels; float32 input/output keep the engine interface unchanged
+            converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        tflite_model = converter.convert()
+    with open(output_path, "wb") as f:
+        f.write(tflite_model)
+    return output_path
+
+
+def export_onnx(model, output_path=ONNX_PATH, opset=17):
+    """Convert a Keras model to ONNX with a dynamic batch dimension."""
+    import tf2onnx
+
+    input_shape = tuple(model.input_shape[1:])
+    tf2onnx.convert.from_function(
+        tf.function(lambda x: model(x, training=False)),
+        input_signature=[tf.TensorSpec((None,) + input_shape, tf.float32, name="input")],
+        opset=opset,
+        output_path=output_path,
+    )
+    return output_path
+
+
+def export_runtime_models(model):
+    """Write TFLite and ONNX variants of `model` next to the Keras file."""
+    print(f"\nExporting TFLite model to {TFLITE_PATH}...")
+    export_tflite(model)
+    print("TFLite model saved successfully!")
+
+    print(f"\nExporting ONNX model to {ONNX_PATH}...")
+    try:
+        export_onnx(model)
+        print("ONNX model saved successfully!")
+    except ImportError:
+        print("WARNING: tf2onnx not installed; skipping ONNX export")
+        print("  uv pip install tf2onnx")
+        return [TFLITE_PATH]
+    return [TFLITE_PATH, ONNX_PATH]
+
+
+def export_quantized_models(model, calibration_dir=CALIBRATION_DIR):
+    """Write the post-training-quantized TFLite variants of `model`."""
+    paths = []
+    calibration_images = load_calibration_images(calibration_dir)
+    for variant in QUANTIZED_VARIANTS:
+        output_path = quantized_path(variant)
+        if variant == "int8" and not calibration_images:
+            print(f"\nWARNING: no calibration images in {calibration_dir}; skipping full INT8 export")
+            print("  Add a few hundred representative JPEG/PNG images there and re-run.")
+            continue
+        print(f"\nExporting {variant} TFLite model to {output_path}...")
+        export_tflite(model, output_path, quantization=variant, calibration_images=calibration_images)
+        print(f"{variant} model saved successfully!")
+        paths.append(output_path)
+    return paths
+
+
 def download_imagenet_labels():
     """Download ImageNet labels for MobileNetV2."""
     print("\nDownloading ImageNet labels...")
@@ -78,6 +217,9 @@ if __name__ == "__main__":
         print()
     
     model_path = download_and_save_model()
+    loaded_model = tf.keras.models.load_model(model_path)
+    runtime_paths = export_runtime_models(loaded_model)
+    runtime_paths += export_quantized_models(loaded_model)
     labels = download_imagenet_labels()
     
     print()
@@ -85,6 +227,8 @@ if __name__ == "__main__":
     print("Download Complete!")
     print("=" * 50)
     print(f"Model: {model_path}")
+    for path in runtime_paths:
+        print(f"Model: {path}")
     print(f"Labels: {len(labels)} classes")
     print()
     print("Next steps:")
@@ -3,20 +3,98 @@ Ray Serve deployment for MobileNetV2 image classification.
 
 The service uses Ray Serve + FastAPI ingress to expose the same API shape as the
 existing BentoML and FastAPI demos: `/predict` and `/health`.
+
+The application is a two-deployment graph. `ImagePreprocessor` is a stateless
+deployment that decodes and resizes uploads into compact `(N, 224, 224, 3)`
+uint8 tensors; `MobileNetV2Deployment` is the HTTP ingress and model, and
+receives those tensors through a deployment handle before batching them for
+inference. Each deployment has its own replica count and resources
+(`RAY_PREPROCESS_*` and `RAY_*` environment variables), so decoding and
+inference can be scaled separately on multi-core nodes.
+
+Uploads seen before are answered from a per-replica content-hash prediction
+cache (`common.cache`, enabled with `CACHE_MAX_ENTRIES`) before reaching the
+preprocessor and `_batched_predict`, so cache hits never occupy a batch slot.
+Counters are served at `/cache_stats`.
+
+Batching starts from `RAY_MAX_BATCH_SIZE` and `RAY_BATCH_WAIT_TIMEOUT_S`.
+Setting `RAY_TARGET_P95_MS` enables `common.batching.AdaptiveBatchController`,
+which retunes both at runtime (within `RAY_ADAPTIVE_*` bounds) so the
+batching-stage p95 (queue wait + inference) stays under the target. The current
+settings and recent decisions are served at `/batching`.
+
+`/predict_tensor` takes already-decoded frames (a raw uint8 `(N, 224, 224, 3)`
+body with an optional `X-Tensor-Shape` header, or an `.npy` file) straight to
+`_batched_predict`, bypassing the preprocessing deployment.
+
+`/predict_bulk` takes a streamed tar archive or NDJSON body of many images,
+parses it as bytes arrive and sends chunks of the current max batch size
+through the preprocessor and `_batched_predict`, streaming NDJSON results
+back in input order (see `common.bulk`).
+
+The same deployment also serves the `mobilenet.MobileNetService` gRPC API
+(`common/mobilenet.proto`) on the Serve gRPC proxy: `Predict` mirrors
+`/predict` without multipart parsing or JSON, and `PredictStream` streams one
+response per batch back for a request carrying many images. Both share
+`_batched_predict` with the HTTP endpoints.
+
+`/metrics` serves the replica's Prometheus stage histograms, batch sizes and
+in-flight gauges (see `common.metrics`). Decoding runs on the preprocessing
+deployment, so the `decode` stage is the round trip to it, including the hop.
+Like the other per-replica endpoints, a scrape reaches one ingress replica.
+
+`POST /admin/profile` (guarded by the `ADMIN_TOKEN` value in the
+`X-Admin-Token` header) samples one ingress replica, or with
+`"deployment": "preprocessor"` one preprocessing replica, for a few seconds
+under live load (see `common.profiling`).
+
+Each replica sizes its TensorFlow/OpenMP/ONNX Runtime thread pools from its
+`num_cpus` share, capped by the container's CPU quota, before loading
+anything (see `common.runtime`), and logs the effective settings.
+
+Model replicas warm the model up at every batch size `_batched_predict` can
+form before their constructor returns (see `common.warmup`), so Serve only
+routes to them, on startup and on scale-up alike, once they are warm.
+`/ready` reports the warmup of the replica that answers; it is reachable only
+once a warmed replica is running, which makes it the pod's readiness probe.
 """
 from __future__ import annotations
 
-import io
+import asyncio
+import collections
+import json
 import os
+import time
 import logging
 import typing as t
 
+import grpc
 import numpy as np
-import tensorflow as tf
-from fastapi import FastAPI, HTTPException, UploadFile, File, status
+
+from fastapi import FastAPI, Header, HTTPException, Request, Response, UploadFile, File, status
 from pydantic import BaseModel
-from PIL import Image
 from ray import serve
+from ray.serve.grpc_util import RayServegRPCContext
+from ray.serve.handle import DeploymentHandle
+
+from common.batching import AdaptiveBatchController
+from common.bulk import bulk_format, decode_images, iter_bulk_items, merge_results, ndjson_response, stream_predictions
+from common.cache import PredictionCache, content_key
+from common.inference import load_engine, power_of_two_buckets
+from common.metrics import metrics_response, service_metrics
+from common.mobilenet_pb2 import ImageResult, PredictRequest, PredictResponse as PredictResponseProto
+from common.postprocessing import Postprocessor, json_array
+from common.profiling import capture_profile, check_admin
+from common.runtime import configure_threads
+from common.warmup import Warmup
+from common.preprocessing import (
+    TENSOR_SHAPE_HEADER,
+    decode_tensor,
+    load_image,
+    parse_shape,
+    preprocess_batch,
+    preprocess_image,
+)
 
 # Configure logging
 logger = logging.getLogger("ray.serve")
@@ -25,8 +103,20 @@ logger = logging.getLogger("ray.serve")
 MODEL_PATH = os.getenv("MODEL_PATH", "/app/model/mobilenet_v2.keras")
 LABELS_PATH = os.getenv("LABELS_PATH", "/app/imagenet_labels.txt")
 NUM_REPLICAS = int(os.getenv("RAY_NUM_REPLICAS", "1"))
-NUM_CPUS = float(os.getenv("RAY_NUM_CPUS", "1"))
+NUM_CPUS = float(os.getenv("RAY_NUM_CPUS", "0.5"))
 MEMORY_BYTES = int(os.getenv("RAY_MEMORY_BYTES", str(512 * 1024 * 1024)))
+PREPROCESS_NUM_REPLICAS = int(os.getenv("RAY_PREPROCESS_NUM_REPLICAS", "1"))
+PREPROCESS_NUM_CPUS = float(os.getenv("RAY_PREPROCESS_NUM_CPUS", "0.5"))
+PREPROCESS_MEMORY_BYTES = int(os.getenv("RAY_PREPROCESS_MEMORY_BYTES", str(256 * 1024 * 1024)))
+# @serve.batch settings; the starting point when adaptive batching is enabled
+MAX_BATCH_SIZE = int(os.getenv("RAY_MAX_BATCH_SIZE", "8"))
+BATCH_WAIT_TIMEOUT_S = float(os.getenv("RAY_BATCH_WAIT_TIMEOUT_S", "0.01"))
+# Adaptive batching: target p95 of queue wait + inference (0 = fixed settings)
+TARGET_P95_MS = float(os.getenv("RAY_TARGET_P95_MS", "0"))
+ADAPTIVE_MIN_BATCH_SIZE = int(os.getenv("RAY_ADAPTIVE_MIN_BATCH_SIZE", "1"))
+ADAPTIVE_MAX_BATCH_SIZE = int(os.getenv("RAY_ADAPTIVE_MAX_BATCH_SIZE", "32"))
+ADAPTIVE_MAX_WAIT_S = float(os.getenv("RAY_ADAPTIVE_MAX_WAIT_S", "0.05"))
+ADAPTIVE_INTERVAL_S = float(os.getenv("RAY_ADAPTIVE_INTERVAL_S", "2"))
 
 def load_labels(path: str) -> list[str]:
     """Load ImageNet labels from a file."""
@@ -41,6 +131,7 @@ def load_labels(path: str) -> list[str]:
     return [f"class_{i}" for i in range(1001)]
 
 IMAGENET_LABELS = load_labels(LABELS_PATH)
+POSTPROCESSOR = Postprocessor(IMAGENET_LABELS)
 
 class PredictionResult(BaseModel):
     class_id: int
@@ -56,17 +147,12 @@ class HealthResponse(BaseModel):
     status: str
     service: str
 
-def preprocess_image(image_data: bytes) -> np.ndarray:
-    """Preprocess image for MobileNetV2."""
-    try:
-        image = Image.open(io.BytesIO(image_data)).convert("RGB")
-        image = image.resize((224, 224))
-        image_array = np.array(image, dtype=np.float32) / 255.0
-        return np.expand_dims(image_array, axis=0)
-    except Exception as e:
-        logger.error(f"Image preprocessing failed: {e}")
-        raise ValueError(f"Invalid image data: {e}") from e
-
+class ProfileRequest(BaseModel):
+    seconds: float = 10.0
+    top: int = 20
+    idle: bool = False
+    tf_trace: bool = False
+    deployment: t.Literal["model", "preprocessor"] = "model"
 
 fastapi_app = FastAPI(
     title="MobileNetV2 Classifier - Ray Serve",
@@ -74,7 +160,13 @@ fastapi_app = FastAPI(
     version="1.0.0",
 )
 
-def _count_images(requests: list[list[bytes]]) -> int:
+def _image_result(result: t.Union[bytes, Exception]) -> ImageResult:
+    """Convert one serialized JSON prediction (or decode error) into its protobuf message."""
+    if isinstance(result, Exception):
+        return ImageResult(error=str(result))
+    return ImageResult(**json.loads(result))
+
+def _count_images(requests: list[np.ndarray]) -> int:
     """Calculate the total number of images in a batch of requests.
     
     Used by Ray Serve to ensure the 'max_batch_size' limit is applied to the
@@ -83,6 +175,46 @@ def _count_images(requests: list[list[bytes]]) -> int:
     return sum(len(req) for req in requests)
 
 
+@serve.deployment(
+    num_replicas=PREPROCESS_NUM_REPLICAS,
+    max_ongoing_requests=100,
+    ray_actor_options={
+        "num_cpus": PREPROCESS_NUM_CPUS,
+        "memory": PREPROCESS_MEMORY_BYTES,
+    },
+)
+class ImagePreprocessor:
+    """Stateless decode/resize stage of the graph."""
+
+    def __init__(self):
+        threads = configure_threads(PREPROCESS_NUM_CPUS)
+        logger.info(f"Preprocessor thread settings: {threads.describe()}")
+
+    def preprocess(self, images: list[bytes]) -> np.ndarray:
+        """Decode encoded images into one `(N, 224, 224, 3)` uint8 tensor.
+
+        uint8 is a quarter of the size of the normalized float32 input, which
+        keeps the hop to the model deployment cheap. Raises `ValueError` for
+        undecodable images.
+        """
+        return np.stack([load_image(image) for image in images])
+
+    def preprocess_bulk(self, images: list[bytes]) -> tuple[np.ndarray, list[t.Optional[str]]]:
+        """Like `preprocess`, but skips undecodable images instead of failing.
+
+        Returns the tensor of the images that decoded and, per input image,
+        `None` or its error message.
+        """
+        decoded = decode_images(images)
+        frames = [image for image in decoded if not isinstance(image, Exception)]
+        tensor = np.stack(frames) if frames else np.empty((0, 224, 224, 3), dtype=np.uint8)
+        return tensor, [str(image) if isinstance(image, Exception) else None for image in decoded]
+
+    async def profile(self, options: dict[str, t.Any]) -> dict[str, t.Any]:
+        """Profile this replica; `options` are `capture_profile` keyword arguments."""
+        return await capture_profile(name="rayserve-preprocessor", **options)
+
+
 @serve.deployment(
     num_replicas=NUM_REPLICAS,
     max_ongoing_requests=100,
@@ -93,27 +225,108 @@ def _count_images(requests: list[list[bytes]]) -> int:
 )
 @serve.ingress(fastapi_app)
 class MobileNetV2Deployment:
-    def __init__(self):
+    def __init__(self, preprocessor: DeploymentHandle):
+        self.preprocessor = preprocessor
         # Disable TensorFlow logs to keep Ray worker logs clean
         os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+        # Ray only sizes OpenMP from num_cpus; TensorFlow would use every host core
+        threads = configure_threads(NUM_CPUS)
+        logger.info(f"Thread settings: {threads.describe()}")
         logger.info(f"Loading model from {MODEL_PATH}")
         try:
-            self.model = tf.keras.models.load_model(MODEL_PATH)
-            logger.info("Model loaded successfully")
+            # Backend (Keras, TFLite or ONNX) follows the MODEL_PATH extension
+            batch_limit = max(MAX_BATCH_SIZE, ADAPTIVE_MAX_BATCH_SIZE if TARGET_P95_MS > 0 else 0)
+            self.engine = load_engine(
+                MODEL_PATH, buckets=power_of_two_buckets(batch_limit), num_threads=threads.intra_op
+            )
+            logger.info(f"Model loaded successfully ({self.engine.backend} backend)")
         except Exception as e:
             logger.error(f"Failed to load model: {e}")
             raise
+        self.cache = PredictionCache.from_env()
+        self.metrics = service_metrics("rayserve")
+        # Serve routes to a replica once its constructor returns, so warm up first
+        self.warmup = Warmup.from_env().run(self.engine, POSTPROCESSOR.to_json)
+        self.metrics.observe_warmup(self.warmup.duration_s)
+        logger.info(f"Warmup finished in {self.warmup.duration_s:.2f}s (batch sizes {list(self.engine.buckets)})")
+
+        # Images waiting for or in inference, the controller's queue depth signal
+        self._pending_images = 0
+        self.batch_controller: t.Optional[AdaptiveBatchController] = None
+        if TARGET_P95_MS > 0:
+            self.batch_controller = AdaptiveBatchController(
+                target_p95_s=TARGET_P95_MS / 1000,
+                batch_size=MAX_BATCH_SIZE,
+                wait_s=BATCH_WAIT_TIMEOUT_S,
+                min_batch_size=ADAPTIVE_MIN_BATCH_SIZE,
+                max_batch_size=ADAPTIVE_MAX_BATCH_SIZE,
+                max_wait_s=ADAPTIVE_MAX_WAIT_S,
+                interval_s=ADAPTIVE_INTERVAL_S,
+                apply=self._apply_batching,
+            )
+
+    def _apply_batching(self, batch_size: int, wait_s: float) -> None:
+        self._batched_predict.set_max_batch_size(batch_size)
+        self._batched_predict.set_batch_wait_timeout_s(wait_s)
+        logger.info(f"Adaptive batching: max_batch_size={batch_size}, batch_wait_timeout_s={wait_s:.4f}")
 
     @fastapi_app.get("/health", response_model=HealthResponse)
     async def health(self) -> HealthResponse:
         return HealthResponse(status="healthy", service="rayserve-mobilenetv2")
 
-    @serve.batch(max_batch_size=8, batch_wait_timeout_s=0.01, batch_size_fn=_count_images)
-    async def _batched_predict(self, requests: list[list[bytes]]) -> list[list[PredictResponse]]:
-        """Batch incoming requests to share one model.predict call.
+    @fastapi_app.get("/ready")
+    async def ready(self) -> dict[str, t.Any]:
+        return {"service": "rayserve-mobilenetv2", **self.warmup.status()}
+
+    @fastapi_app.get("/cache_stats")
+    async def cache_stats(self) -> dict[str, t.Any]:
+        return self.cache.stats()
+
+    @fastapi_app.get("/metrics")
+    async def metrics(self) -> Response:
+        body, content_type = metrics_response()
+        return Response(body, media_type=content_type)
+
+    @fastapi_app.post("/admin/profile")
+    async def admin_profile(
+        self, options: ProfileRequest, x_admin_token: t.Optional[str] = Header(None)
+    ) -> dict[str, t.Any]:
+        """Sample this replica (or a preprocessing replica) under live load."""
+        try:
+            check_admin(x_admin_token)
+        except PermissionError as exc:
+            raise HTTPException(status_code=403, detail=str(exc)) from exc
+        kwargs = options.model_dump(exclude={"deployment"})
+        try:
+            if options.deployment == "preprocessor":
+                return await self.preprocessor.profile.remote(kwargs)
+            return await capture_profile(name="rayserve", **kwargs)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(getattr(exc, "cause", exc))) from exc
+        except RuntimeError as exc:
+            raise HTTPException(status_code=409, detail=str(getattr(exc, "cause", exc))) from exc
+
+    @fastapi_app.get("/batching")
+    async def batching(self) -> dict[str, t.Any]:
+        """Current batching settings and, if adaptive, the controller's recent decisions."""
+        settings = {
+            "adaptive": self.batch_controller is not None,
+            "max_batch_size": self._batched_predict._get_max_batch_size(),
+            "batch_wait_timeout_s": self._batched_predict._get_batch_wait_timeout_s(),
+            "pending_images": self._pending_images,
+        }
+        if self.batch_controller is not None:
+            settings["controller"] = self.batch_controller.snapshot()
+        return settings
+
+    @serve.batch(max_batch_size=MAX_BATCH_SIZE, batch_wait_timeout_s=BATCH_WAIT_TIMEOUT_S, batch_size_fn=_count_images)
+    async def _batched_predict(self, requests: list[np.ndarray]) -> list[tuple[list[bytes], float]]:
+        """Batch incoming requests to share one inference call.
         
         Ray Serve's @serve.batch decorator aggregates concurrent calls to this method.
-        'requests' is a list of what was passed to each call.
+        'requests' is a list of what was passed to each call: the decoded
+        `(n, 224, 224, 3)` uint8 tensor of each request. Each call gets back its
+        results and the time the batch started, for its queue wait.
         """
         # Calculate how many images each request sent
         request_sizes = [len(req) for req in requests]
@@ -121,44 +334,35 @@ class MobileNetV2Deployment:
         all_images = [img for req in requests for img in req]
         
         if not all_images:
-             return [[] for _ in requests]
+             return [([], time.perf_counter()) for _ in requests]
 
+        started = time.perf_counter()
+        self.metrics.observe_batch(len(all_images))
         try:
-            # Preprocess all images
-            tensors = [preprocess_image(img) for img in all_images]
-            batch = np.vstack(tensors)
+            # Normalize all images straight into the reused batch tensor,
+            # padded to the engine's bucket size
+            batch = preprocess_batch(all_images, pad_to=self.engine.bucket_size(len(all_images)))
             
             # Perform inference on the whole batch
-            predictions = self.model.predict(batch, verbose=0)
+            predictions = self.engine.predict(batch, len(all_images))
+            inferred = time.perf_counter()
             
-            # Post-process results
-            all_results: list[PredictResponse] = []
-            for pred in predictions:
-                top_indices = np.argsort(pred)[-5:][::-1]
-                results: list[PredictionResult] = []
-                for idx in top_indices:
-                    class_name = IMAGENET_LABELS[idx] if idx < len(IMAGENET_LABELS) else f"class_{idx}"
-                    results.append(
-                        PredictionResult(
-                            class_id=int(idx),
-                            class_name=class_name,
-                            confidence=float(pred[idx]),
-                        )
-                    )
-                all_results.append(
-                    PredictResponse(
-                        predictions=results,
-                        top_prediction=results[0].class_name,
-                        confidence=results[0].confidence,
-                    )
-                )
+            # Post-process the whole batch at once into serialized JSON
+            # (same shape as PredictResponse, without per-image validation)
+            all_results = POSTPROCESSOR.to_json(predictions)
+            self.metrics.observe("inference", inferred - started)
+            self.metrics.observe("postprocess", time.perf_counter() - inferred)
 
             # Re-group results to match the original request structure
-            responses: list[list[PredictResponse]] = []
+            responses: list[tuple[list[bytes], float]] = []
             curr_idx = 0
             for size in request_sizes:
-                responses.append(all_results[curr_idx : curr_idx + size])
+                responses.append((all_results[curr_idx : curr_idx + size], started))
                 curr_idx += size
+            if self.batch_controller is not None:
+                self.batch_controller.record_batch(len(all_images), time.perf_counter() - started)
+                # Pending still counts this batch until its callers resume
+                self.batch_controller.maybe_adjust(self._pending_images - len(all_images))
             return responses
 
         except Exception as exc:
@@ -169,19 +373,172 @@ class MobileNetV2Deployment:
                 detail=f"Inference error: {str(exc)}"
             ) from exc
 
+    async def _predict_encoded(self, images: list[bytes]) -> list[bytes]:
+        """Decode on the preprocessing deployment, then batch the tensors for inference.
+
+        Raises `ValueError` if any image cannot be decoded.
+        """
+        try:
+            with self.metrics.time("decode"):
+                tensor = await self.preprocessor.preprocess.remote(images)
+        except ValueError as exc:
+            # Errors from the other replica arrive wrapped in a RayTaskError
+            raise ValueError(str(getattr(exc, "cause", exc))) from exc
+        return await self._predict_tensor(tensor)
+
+    async def _predict_lenient(self, images: list[bytes]) -> list[t.Union[bytes, Exception]]:
+        """Like `_predict_encoded`, but returns a `ValueError` for each undecodable image."""
+        with self.metrics.time("decode"):
+            tensor, errors = await self.preprocessor.preprocess_bulk.remote(images)
+        results = await self._predict_tensor(tensor) if len(tensor) else []
+        return merge_results([ValueError(e) if e is not None else None for e in errors], results)
+
+    async def _predict_tensor(self, tensor: np.ndarray) -> list[bytes]:
+        """Batch a decoded `(n, 224, 224, 3)` uint8 tensor for inference.
+
+        `@serve.batch` rejects an item larger than its max batch size, so the
+        tensor is split into chunks of the current size. The adaptive
+        controller may still lower it before a chunk is batched; such a chunk
+        is split again to the new size (`_predict_chunk`).
+        """
+        enqueued = time.perf_counter()
+        chunk = self._batched_predict._get_max_batch_size()
+        self._pending_images += len(tensor)
+        self.metrics.pending.inc(len(tensor))
+        try:
+            parts = await asyncio.gather(
+                *(self._predict_chunk(tensor[i : i + chunk]) for i in range(0, max(len(tensor), 1), chunk))
+            )
+        finally:
+            self._pending_images -= len(tensor)
+            self.metrics.pending.dec(len(tensor))
+        outputs = [output for part in parts for output in part]
+        results = [result for chunk_results, _ in outputs for result in chunk_results]
+        started = min(chunk_started for _, chunk_started in outputs)
+        self.metrics.observe("queue_wait", started - enqueued)
+        if self.batch_controller is not None:
+            self.batch_controller.record_latency(time.perf_counter() - enqueued)
+        return results
+
+    async def _predict_chunk(self, tensor: np.ndarray) -> list[tuple[list[bytes], float]]:
+        """`_batched_predict` one chunk, re-split if the max batch size shrank below it while queued."""
+        try:
+            return [await self._batched_predict(tensor)]
+        except RuntimeError as exc:
+            if "greater than max_batch_size" not in str(exc):
+                raise
+        size = self._batched_predict._get_max_batch_size()
+        parts = await asyncio.gather(*(self._predict_chunk(tensor[i : i + size]) for i in range(0, len(tensor), size)))
+        return [output for part in parts for output in part]
+
     @fastapi_app.post("/predict", response_model=list[PredictResponse])
-    async def predict(self, files: list[UploadFile] = File(...)) -> list[PredictResponse]:
+    async def predict(self, files: list[UploadFile] = File(...)) -> Response:
         """Endpoint for image classification. Accepts multiple files."""
-        images_data = []
-        for file in files:
-            content = await file.read()
-            images_data.append(content)
-            
-        if not images_data:
-            raise HTTPException(status_code=400, detail="No images provided")
+        with self.metrics.in_flight("predict"):
+            images_data = []
+            with self.metrics.time("upload_read"):
+                for file in files:
+                    content = await file.read()
+                    images_data.append(content)
+
+            if not images_data:
+                raise HTTPException(status_code=400, detail="No images provided")
+
+            try:
+                results = await self._predict_cached(images_data)
+            except ValueError as exc:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+            # Results are pre-serialized, so skip FastAPI's response_model validation.
+            with self.metrics.time("serialize"):
+                body = json_array(results)
+            return Response(body, media_type="application/json")
+
+    async def _predict_cached(self, images: list[bytes]) -> list[bytes]:
+        """Predict encoded images, answering repeated ones from the cache."""
+        if not self.cache.enabled:
+            # Call the batched predictor. Ray Serve will aggregate concurrent calls.
+            return await self._predict_encoded(images)
 
-        # Call the batched predictor. Ray Serve will aggregate concurrent calls.
-        return await self._batched_predict(images_data)
+        # Answer repeated uploads from the cache; only misses take batch slots
+        keys = [content_key(content) for content in images]
+        results: list[t.Optional[bytes]] = [self.cache.get(key) for key in keys]
+        misses = [i for i, result in enumerate(results) if result is None]
+        if misses:
+            computed = await self._predict_encoded([images[i] for i in misses])
+            for i, result in zip(misses, computed):
+                self.cache.put(keys[i], result)
+                results[i] = result
+        return t.cast(list[bytes], results)
+
+    @fastapi_app.post("/predict_tensor", response_model=list[PredictResponse])
+    async def predict_tensor(self, request: Request) -> Response:
+        """Classify raw uint8 `(N, 224, 224, 3)` frames or an `.npy` payload."""
+        with self.metrics.in_flight("predict_tensor"):
+            with self.metrics.time("upload_read"):
+                body = await request.body()
+            try:
+                shape = request.headers.get(TENSOR_SHAPE_HEADER)
+                with self.metrics.time("decode"):
+                    tensor = decode_tensor(body, parse_shape(shape) if shape else None)
+            except ValueError as exc:
+                raise HTTPException(status_code=400, detail=str(exc)) from exc
+            results = await self._predict_tensor(tensor)
+            with self.metrics.time("serialize"):
+                body = json_array(results)
+            return Response(body, media_type="application/json")
+
+    @fastapi_app.post("/predict_bulk")
+    async def predict_bulk(self, request: Request) -> Response:
+        """Classify a streamed tar or NDJSON body of images, streaming NDJSON results."""
+
+        # Chunks follow the max batch size at request start so each fills a batch;
+        # _predict_tensor splits them again if the controller shrinks it meanwhile
+        items = iter_bulk_items(request.stream(), bulk_format(request.headers.get("content-type")))
+        batch_size = self._batched_predict._get_max_batch_size()
+        lines = stream_predictions(items, self._predict_lenient, batch_size=batch_size)
+        return ndjson_response(self.metrics.in_flight_stream("predict_bulk", lines))
+
+    # gRPC methods: Serve routes `mobilenet.MobileNetService/<Method>` calls to
+    # the deployment method of the same name
+
+    async def Predict(self, request: PredictRequest, grpc_context: RayServegRPCContext) -> PredictResponseProto:
+        """Unary gRPC counterpart of `/predict`."""
+        with self.metrics.in_flight("grpc_predict"):
+            if not request.images:
+                grpc_context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+                grpc_context.set_details("No images provided")
+                return PredictResponseProto()
+            try:
+                results = await self._predict_cached(list(request.images))
+            except ValueError as exc:
+                grpc_context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+                grpc_context.set_details(str(exc))
+                return PredictResponseProto()
+            except HTTPException as exc:
+                # Inference failures are raised for HTTP callers of the batch method
+                grpc_context.set_code(grpc.StatusCode.INTERNAL)
+                grpc_context.set_details(str(exc.detail))
+                return PredictResponseProto()
+            with self.metrics.time("serialize"):
+                return PredictResponseProto(results=[_image_result(result) for result in results])
+
+    async def PredictStream(self, request: PredictRequest) -> t.AsyncIterator[PredictResponseProto]:
+        """Server-streaming gRPC call: one response per batch of the request's images, in order."""
+        images = list(request.images)
+        # Sized like /predict_bulk; a later shrink is absorbed by _predict_tensor
+        batch_size = self._batched_predict._get_max_batch_size()
+        pending: collections.deque = collections.deque()
+        try:
+            for start in range(0, len(images), batch_size):
+                pending.append(asyncio.ensure_future(self._predict_lenient(images[start : start + batch_size])))
+                # Keep the next batch queued behind the running one, like /predict_bulk
+                if len(pending) > 2:
+                    yield PredictResponseProto(results=[_image_result(r) for r in await pending.popleft()])
+            while pending:
+                yield PredictResponseProto(results=[_image_result(r) for r in await pending.popleft()])
+        finally:
+            for task in pending:
+                task.cancel()
 
 # Create the deployment graph
-graph = MobileNetV2Deployment.bind()
\ No newline at end of file
+graph = MobileNetV2Deployment.bind(ImagePreprocessor.bind())
\ No newline at end of file
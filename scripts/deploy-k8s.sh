@@ -7,6 +7,11 @@ PROJECT_DIR="$(dirname "$SCRIPT_DIR")"
 
 SERVICE=${1:-"all"}
 REPLICAS=${2:-1}
+# PROFILING=1 enables /admin/profile with ADMIN_TOKEN, or with a random token if it is unset
+if [ "${PROFILING:-0}" == "1" ] && [ -z "${ADMIN_TOKEN:-}" ]; then
+    ADMIN_TOKEN=$(python3 -c "import secrets; print(secrets.token_hex(16))")
+fi
+export ADMIN_TOKEN=${ADMIN_TOKEN:-}
 
 cd "$PROJECT_DIR"
 
@@ -30,3 +35,7 @@ echo ""
 echo "=========================================="
 echo "Deployment Complete"
 echo "=========================================="
+if [ -n "$ADMIN_TOKEN" ]; then
+    echo "/admin/profile is enabled; its token is in the admin-token Secret:"
+    echo "  kubectl get secret admin-token -n ml-benchmark -o jsonpath='{.data.token}' | base64 -d"
+fi
@@ -16,6 +16,19 @@ DURATION_PER_LEVEL=${1:-${DURATION_PER_LEVEL:-10}}  # Seconds to run each concur
 CONCURRENCY_LEVELS=${2:-${CONCURRENCY_LEVELS:-"10 20 40 80"}}  # Space-separated concurrency levels
 REPLICAS=${3:-${REPLICAS:-1}} # Number of pods per service
 SERVICE_FILTER=${4:-"all"} # Service to test: bentoml, fastapi, rayserve, or all
+# concurrency: levels are concurrent clients (closed loop)
+# rate: levels are requests per second started on a fixed schedule (open loop)
+LOAD_MODE=${LOAD_MODE:-concurrency}
+# Optional corpus pack (scripts/generic/corpus.py); default is one random 224x224 JPEG
+CORPUS=${CORPUS:-}
+# Seconds of sampling profile captured at every level (0 = off), PROFILE_DELAY seconds into it.
+# The clusters are deployed with ADMIN_TOKEN (random when profiling without one); unset, /admin/profile stays off
+PROFILE_SECONDS=${PROFILE_SECONDS:-0}
+PROFILE_DELAY=${PROFILE_DELAY:-2}
+if [ "$PROFILE_SECONDS" != "0" ] && [ -z "${ADMIN_TOKEN:-}" ]; then
+    ADMIN_TOKEN=$(python3 -c "import secrets; print(secrets.token_hex(16))")
+fi
+export ADMIN_TOKEN=${ADMIN_TOKEN:-}
 
 # Colors for output
 RED='\033[0;31m'
@@ -77,27 +90,26 @@ run_load_test() {
     local SERVICE_ID=$1    # e.g., "bentoml"
     local SERVICE_NAME=$2  # e.g., "BentoML"
     local SERVICE_URL=$3
-    local HEALTH_PATH=${4:-/health}
+    local HEALTH_PATH=${4:-/ready}
     local CONCURRENT=$5
-    local RESULTS_FILE="$TMP_DIR/loadtest_${SERVICE_ID}_${CONCURRENT}.txt"
     local START_TS=$(date +%s)
     
-    print_subheader "Testing ${SERVICE_NAME} (Concurrency: ${CONCURRENT})"
+    print_subheader "Testing ${SERVICE_NAME} (${LOAD_MODE} level: ${CONCURRENT})"
     echo "  URL: ${SERVICE_URL}"
-    echo "  Duration: ${DURATION_PER_LEVEL}s | Concurrency: ${CONCURRENT} | Pods: ${REPLICAS}"
+    echo "  Duration: ${DURATION_PER_LEVEL}s | Level: ${CONCURRENT} (${LOAD_MODE}) | Pods: ${REPLICAS}"
     echo ""
     
     # Generate payload
     generate_payload
     local IMAGE_PATH="$TMP_DIR/test_image.jpg"
     
-    # Health check first
-    echo -n "  Health check: "
+    # Readiness check first: 200 only once the model is loaded and warmed up
+    echo -n "  Readiness check: "
     local RETRIES=0
     local MAX_RETRIES=15
     local HEALTH_OK=false
     while [ $RETRIES -lt $MAX_RETRIES ]; do
-        if curl -s --max-time 2 "${SERVICE_URL}${HEALTH_PATH}" > /dev/null 2>&1;
+        if curl -sf --max-time 2 "${SERVICE_URL}${HEALTH_PATH}" > /dev/null 2>&1;
         then
             HEALTH_OK=true
             break
@@ -114,130 +126,41 @@ run_load_test() {
         return 1
     fi
     
-    # Run the load test using curl in parallel
-    echo "  Running load test..."
-    
-    # Create a temporary script for parallel execution
-    cat > "$TMP_DIR/run_request.sh" << 'REQSCRIPT'
-#!/bin/bash
-URL=$1
-IMAGE_PATH=$2
-SVC_ID=$3
-FIELD_NAME="files"
-if [ "$SVC_ID" = "fastapi" ]; then
-    FIELD_NAME="file"
-fi
-
-START=$(python3 -c "import time; print(time.time())")
-RESPONSE=$(curl -s -w "\n%{http_code}" --connect-timeout 2 --max-time 8 -X POST "$URL/predict" \
-    -F "$FIELD_NAME=@$IMAGE_PATH" 2>/dev/null)
-END=$(python3 -c "import time; print(time.time())")
-HTTP_CODE=$(echo "$RESPONSE" | tail -1)
-DURATION=$(python3 -c "print(round(($END - $START) * 1000, 2))")
-if [ "$HTTP_CODE" = "200" ]; then
-    echo "SUCCESS $DURATION"
-else
-    echo "FAILED $DURATION"
-fi
-REQSCRIPT
-    chmod +x "$TMP_DIR/run_request.sh"
-    
-    # Run requests for the specified duration
-    > "$RESULTS_FILE"
-    local END_AT=$(($(date +%s) + DURATION_PER_LEVEL))
-    
-    # Launch worker processes that run until time is up; track PIDs so we can force-stop
-    WORKER_PIDS=()
-    for i in $(seq 1 $CONCURRENT); do
-        (
-            while [ $(date +%s) -lt $END_AT ]; do
-                "$TMP_DIR/run_request.sh" "$SERVICE_URL" "$IMAGE_PATH" "$SERVICE_ID" >> "$RESULTS_FILE"
-            done
-        ) & 
-        WORKER_PIDS+=($!)
-    done
-    
-    # Show progress while waiting
-    local ELAPSED=0
-    while [ $ELAPSED -lt $DURATION_PER_LEVEL ]; do
-        sleep 1
-        ELAPSED=$((ELAPSED + 1))
-        local CURRENT_COUNT=$(wc -l < "$RESULTS_FILE" 2>/dev/null || echo "0")
-        printf "\r  Progress: %ds/%ds (%d requests completed)" $ELAPSED $DURATION_PER_LEVEL $CURRENT_COUNT
-    done
-    
-    # Stop any stragglers and wait
-    for pid in "${WORKER_PIDS[@]}"; do
-        kill $pid 2>/dev/null || true
-    done
-
-    # Ensure workers exit promptly
-    for pid in "${WORKER_PIDS[@]}"; do
-        wait $pid 2>/dev/null || true
-    done
+    # Drive the load from one asyncio process with keep-alive connections
+    local FIELD_NAME="files"
+    if [ "$SERVICE_ID" = "fastapi" ]; then
+        FIELD_NAME="file"
+    fi
+    local IMAGE_ARGS=(--image "$IMAGE_PATH")
+    if [ -n "$CORPUS" ]; then
+        IMAGE_ARGS=(--corpus "$CORPUS")
+    fi
+    local PROFILE_PID=""
+    if [ "$PROFILE_SECONDS" != "0" ]; then
+        echo "  Profiling for ${PROFILE_SECONDS}s after ${PROFILE_DELAY}s..."
+        python3 "$SCRIPT_DIR/profile_capture.py" capture \
+            --url "$SERVICE_URL" \
+            --seconds "$PROFILE_SECONDS" \
+            --delay "$PROFILE_DELAY" \
+            --output "$TMP_DIR/profiles/${SERVICE_ID}_${CONCURRENT}" > "$TMP_DIR/profile_${SERVICE_ID}_${CONCURRENT}.log" 2>&1 &
+        PROFILE_PID=$!
+    fi
+    echo "  Running load test (${LOAD_MODE} mode)..."
+    python3 "$SCRIPT_DIR/loadgen.py" \
+        --url "$SERVICE_URL" \
+        --field "$FIELD_NAME" \
+        --mode "$LOAD_MODE" \
+        --level "$CONCURRENT" \
+        --duration "$DURATION_PER_LEVEL" \
+        "${IMAGE_ARGS[@]}" \
+        --output "$TMP_DIR/stats_${SERVICE_ID}_${CONCURRENT}.json"
+
+    if [ -n "$PROFILE_PID" ]; then
+        wait "$PROFILE_PID" || echo -e "  ${YELLOW}⚠️  Profile capture failed (see $TMP_DIR/profile_${SERVICE_ID}_${CONCURRENT}.log)${NC}"
+    fi
 
     local END_TS=$(date +%s)
-    echo ""; echo "  Completed in $((END_TS-START_TS))s — parsing results..."
-    
-    # Parse results
-    local SUCCESS=$(grep -c "SUCCESS" "$RESULTS_FILE" 2>/dev/null || echo "0")
-    local FAILED=$(grep -c "FAILED" "$RESULTS_FILE" 2>/dev/null || echo "0")
-    
-    # Ensure they are clean integers
-    SUCCESS=${SUCCESS//[^0-9]/}
-    FAILED=${FAILED//[^0-9]/}
-    SUCCESS=${SUCCESS:-0}
-    FAILED=${FAILED:-0}
-    
-    # Calculate statistics
-    local STATS=$(python3 << PYSCRIPT
-import statistics
-import json
-
-times = []
-try:
-    with open("$RESULTS_FILE", "r") as f:
-        for line in f:
-            parts = line.strip().split()
-            if len(parts) >= 2 and parts[0] == "SUCCESS":
-                times.append(float(parts[1]))
-except Exception:
-    pass
-
-if times:
-    avg = statistics.mean(times)
-    median = statistics.median(times)
-    min_t = min(times)
-    max_t = max(times)
-    times.sort()
-    p95 = times[int(len(times) * 0.95)] if len(times) > 0 else times[0]
-    p99 = times[int(len(times) * 0.99)] if len(times) > 0 else times[0]
-    stdev = statistics.stdev(times) if len(times) > 1 else 0
-    print(f"{avg:.2f},{median:.2f},{min_t:.2f},{max_t:.2f},{p95:.2f},{p99:.2f},{stdev:.2f}")
-else:
-    print("0,0,0,0,0,0,0")
-PYSCRIPT
-)
-    
-    IFS=',' read -r AVG MEDIAN MIN MAX P95 P99 STDEV <<< "$STATS"
-    local RPS=$(python3 -c "print(round($SUCCESS / max($DURATION_PER_LEVEL, 0.001), 2))" 2>/dev/null || echo "0")
-    local SUCCESS_RATE=$(python3 -c "print(round($SUCCESS / max($SUCCESS + $FAILED, 1) * 100, 1))" 2>/dev/null || echo "0")
-    
-    # Save to a JSON file for final aggregation
-    cat > "$TMP_DIR/stats_${SERVICE_ID}_${CONCURRENT}.json" << EOF
-{
-    "rps": "$RPS",
-    "avg": "$AVG",
-    "median": "$MEDIAN",
-    "min": "$MIN",
-    "max": "$MAX",
-    "p95": "$P95",
-    "p99": "$P99",
-    "success_rate": "$SUCCESS_RATE",
-    "success": "$SUCCESS",
-    "failed": "$FAILED"
-}
-EOF
+    echo "  Completed in $((END_TS-START_TS))s"
 }
 
 # Main execution
@@ -245,16 +168,21 @@ main() {
     print_header "🚀 Automated Load Test - Sequential Cluster Mode"
     echo "  Duration per level: ${DURATION_PER_LEVEL}s"
     echo "  Concurrency levels: $CONCURRENCY_LEVELS"
+    echo "  Load mode:          $LOAD_MODE"
+    echo "  Corpus:             ${CORPUS:-random 224x224 JPEG}"
+    echo "  Profile per level:  ${PROFILE_SECONDS}s"
     echo "  Pods per service:   $REPLICAS"
     echo "  Target service:     $SERVICE_FILTER"
     
     check_prerequisites
     
-    # Only clear stats for the filtered service(s)
-    if [ "$SERVICE_FILTER" = "all" ]; then
-        rm -f "$TMP_DIR/stats_*.json"
-    else
-        rm -f "$TMP_DIR/stats_${SERVICE_FILTER}_*.json"
+    # Only clear stats for the filtered service(s); KEEP_STATS=1 adds levels to the previous run
+    if [ "${KEEP_STATS:-}" != "1" ]; then
+        if [ "$SERVICE_FILTER" = "all" ]; then
+            rm -f "$TMP_DIR"/stats_*.json "$TMP_DIR"/profiles/*
+        else
+            rm -f "$TMP_DIR"/stats_"${SERVICE_FILTER}"_*.json "$TMP_DIR"/profiles/"${SERVICE_FILTER}"_*
+        fi
     fi
     
     for SVC in bentoml fastapi rayserve;
@@ -267,9 +195,9 @@ main() {
         "$PROJECT_DIR/scripts/manage-service-cluster.sh" up "$SVC" "$REPLICAS"
         
         case $SVC in
-            bentoml)  PORT=3000; SVC_PORT=3000; HEALTH="/healthz"; NAME="BentoML" ;;
-            fastapi)  PORT=8000; SVC_PORT=8000; HEALTH="/health"; NAME="FastAPI" ;; 
-            rayserve) PORT=31800; SVC_PORT=8000; HEALTH="/health"; NAME="Ray Serve" ;; 
+            bentoml)  PORT=3000; SVC_PORT=3000; HEALTH="/readyz"; NAME="BentoML" ;;
+            fastapi)  PORT=8000; SVC_PORT=8000; HEALTH="/ready"; NAME="FastAPI" ;; 
+            rayserve) PORT=31800; SVC_PORT=8000; HEALTH="/ready"; NAME="Ray Serve" ;; 
         esac
         
         echo "🔌 Port forwarding..."
@@ -291,7 +219,8 @@ main() {
 
     # Run data processing
 
-    "$SCRIPT_DIR/process-results.sh" "$CONCURRENCY_LEVELS" "$DURATION_PER_LEVEL"
+    LOAD_MODE="$LOAD_MODE" REPLICAS="$REPLICAS" CORPUS="$CORPUS" \
+        "$SCRIPT_DIR/process-results.sh" "$CONCURRENCY_LEVELS" "$DURATION_PER_LEVEL"
 }
 
 
@@ -0,0 +1,366 @@
+"""Batching parameter sweep for the three services.
+
+Each service is started locally once per grid point, with its batching knobs
+set through environment variables, then driven at several concurrency levels:
+
+* BentoML: `BENTOML_MAX_BATCH_SIZE` x `BENTOML_MAX_LATENCY_MS`
+* Ray Serve: `RAY_MAX_BATCH_SIZE` x `RAY_BATCH_WAIT_TIMEOUT_S`
+* FastAPI: `MAX_BATCH_SIZE` x `BATCH_WAIT_TIMEOUT_S`
+
+For every framework the Pareto frontier of throughput vs p95 and vs p99
+latency is reported: the configurations for which no other configuration is
+both faster and lower-latency. Raw points and frontiers are written to
+`reports/sweep/batching_sweep.json`, with a Markdown summary (and a chart if
+matplotlib is installed) next to it.
+
+Usage:
+    python scripts/generic/batching_sweep.py --services bentoml rayserve \\
+        --batch-sizes 1 8 32 --bounds-ms 1 10 50 --concurrency 1 8 32 --duration 15
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import io
+import json
+import os
+import shutil
+import signal
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence
+
+PROJECT_DIR = Path(__file__).resolve().parents[2]
+REPORT_DIR = PROJECT_DIR / "reports" / "sweep"
+LOG_DIR = PROJECT_DIR / "tmp" / "sweep"
+
+
+def _executable(name: str) -> str:
+    """Console script installed next to the running interpreter, else on PATH."""
+    candidate = Path(sys.executable).with_name(name)
+    return str(candidate) if candidate.exists() else (shutil.which(name) or name)
+
+
+@dataclass(frozen=True)
+class ServiceSpec:
+    name: str
+    port: int
+    health_path: str
+    field_name: str
+    bound_name: str
+    default_bounds_ms: Sequence[float]
+    command: Callable[[int], List[str]]
+    batching_env: Callable[[int, float], Dict[str, str]]
+    min_batch_size: int = 1
+
+
+SERVICES: Dict[str, ServiceSpec] = {
+    "bentoml": ServiceSpec(
+        name="BentoML",
+        port=3000,
+        health_path="/readyz",
+        field_name="files",
+        bound_name="max_latency_ms",
+        default_bounds_ms=(100, 1000, 60000),
+        command=lambda port: [
+            _executable("bentoml"), "serve", "bentoml_service.service:MobileNetV2Classifier", "--port", str(port),
+        ],
+        batching_env=lambda size, bound_ms: {
+            "BENTOML_MAX_BATCH_SIZE": str(size),
+            "BENTOML_MAX_LATENCY_MS": str(int(bound_ms)),
+        },
+        # BentoML rejects max_batch_size=1 for batchable APIs
+        min_batch_size=2,
+    ),
+    "rayserve": ServiceSpec(
+        name="Ray Serve",
+        port=8000,
+        health_path="/ready",
+        field_name="files",
+        bound_name="batch_wait_timeout_ms",
+        default_bounds_ms=(1, 10, 25),
+        command=lambda port: [_executable("serve"), "run", "rayserve.app:graph"],
+        batching_env=lambda size, bound_ms: {
+            "RAY_MAX_BATCH_SIZE": str(size),
+            "RAY_BATCH_WAIT_TIMEOUT_S": str(bound_ms / 1000),
+        },
+    ),
+    "fastapi": ServiceSpec(
+        name="FastAPI",
+        port=8000,
+        health_path="/ready",
+        field_name="file",
+        bound_name="batch_wait_timeout_ms",
+        default_bounds_ms=(1, 10, 25),
+        command=lambda port: [
+            sys.executable, "-m", "uvicorn", "main:app", "--app-dir", "fastapi", "--port", str(port),
+        ],
+        batching_env=lambda size, bound_ms: {
+            "MAX_BATCH_SIZE": str(size),
+            "BATCH_WAIT_TIMEOUT_S": str(bound_ms / 1000),
+        },
+    ),
+}
+
+
+def generate_image() -> bytes:
+    """Random 224x224 JPEG, the same payload the generic load test uses."""
+    import numpy as np
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.fromarray(np.random.randint(0, 256, (224, 224, 3), dtype=np.uint8), "RGB").save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(len(sorted_values) * q / 100), len(sorted_values) - 1)]
+
+
+def run_closed_loop(make_request: Callable[[], Callable[[], bool]], concurrency: int, duration_s: float) -> dict:
+    """Closed-loop load: `concurrency` clients sending back-to-back requests.
+
+    `make_request` is called once per client thread (to open its own
+    connection) and returns a callable that sends one request and reports
+    whether it succeeded.
+    """
+    latencies: List[float] = []
+    failures = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration_s
+
+    def worker() -> None:
+        send = make_request()
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            ok = send()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with lock:
+                if ok:
+                    latencies.append(elapsed_ms)
+                else:
+                    failures[0] += 1
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    total = len(latencies) + failures[0]
+    return {
+        "concurrency": concurrency,
+        "rps": len(latencies) / elapsed,
+        "avg": statistics.mean(latencies) if latencies else 0.0,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "success": len(latencies),
+        "failed": failures[0],
+        "success_rate": 100.0 * len(latencies) / total if total else 0.0,
+    }
+
+
+def drive_load(url: str, field_name: str, image: bytes, concurrency: int, duration_s: float) -> dict:
+    """Closed-loop multipart `/predict` load from keep-alive clients."""
+    import requests
+
+    def make_request() -> Callable[[], bool]:
+        session = requests.Session()
+
+        def send() -> bool:
+            try:
+                return session.post(url, files={field_name: ("image.jpg", image, "image/jpeg")}, timeout=30).status_code == 200
+            except requests.RequestException:
+                return False
+
+        return send
+
+    return run_closed_loop(make_request, concurrency, duration_s)
+
+
+def wait_healthy(url: str, process: subprocess.Popen, timeout_s: float) -> bool:
+    import requests
+
+    deadline = time.time() + timeout_s
+    while time.time() < deadline:
+        if process.poll() is not None:
+            return False
+        try:
+            if requests.get(url, timeout=2).status_code == 200:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(1)
+    return False
+
+
+def stop_service(process: subprocess.Popen) -> None:
+    """Stop the service and every worker it spawned."""
+    if process.poll() is None:
+        os.killpg(process.pid, signal.SIGINT)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            process.wait()
+
+
+def run_point(spec: ServiceSpec, batch_size: int, bound_ms: float, levels: Sequence[int], duration_s: float,
+              image: bytes, startup_timeout_s: float) -> List[dict]:
+    env = dict(
+        os.environ,
+        PYTHONPATH=str(PROJECT_DIR),
+        MODEL_PATH=os.getenv("MODEL_PATH", str(PROJECT_DIR / "model" / "mobilenet_v2.keras")),
+        LABELS_PATH=os.getenv("LABELS_PATH", str(PROJECT_DIR / "model" / "imagenet_labels.txt")),
+        TF_CPP_MIN_LOG_LEVEL="2",
+        **spec.batching_env(batch_size, bound_ms),
+    )
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
+    log_path = LOG_DIR / f"{spec.name.lower().replace(' ', '')}_{batch_size}_{bound_ms:g}.log"
+    base_url = f"http://localhost:{spec.port}"
+    points = []
+    with open(log_path, "w") as log:
+        process = subprocess.Popen(
+            spec.command(spec.port), cwd=PROJECT_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+        try:
+            if not wait_healthy(base_url + spec.health_path, process, startup_timeout_s):
+                print(f"  ! {spec.name} did not become healthy, see {log_path}")
+                return points
+            # Warm up the compiled functions before measuring
+            drive_load(base_url + "/predict", spec.field_name, image, max(levels), 2)
+            for concurrency in levels:
+                stats = drive_load(base_url + "/predict", spec.field_name, image, concurrency, duration_s)
+                stats.update(batch_size=batch_size, bound_ms=bound_ms)
+                points.append(stats)
+                print(
+                    f"  batch={batch_size:<3} {spec.bound_name}={bound_ms:<7g} c={concurrency:<4} "
+                    f"rps={stats['rps']:8.2f} p95={stats['p95']:8.2f}ms p99={stats['p99']:8.2f}ms "
+                    f"ok={stats['success_rate']:.1f}%"
+                )
+        finally:
+            stop_service(process)
+    return points
+
+
+def pareto_frontier(points: Sequence[dict], latency_key: str, min_success_rate: float = 0.0) -> List[dict]:
+    """Points not dominated in (higher rps, lower `latency_key`), by ascending latency.
+
+    Points that shed load (success rate below `min_success_rate`) are not
+    eligible: their latency only covers the requests that were served.
+    """
+    frontier = []
+    best_rps = float("-inf")
+    eligible = [p for p in points if p.get("success_rate", 100.0) >= min_success_rate]
+    for point in sorted(eligible, key=lambda p: (p[latency_key], -p["rps"])):
+        if point["rps"] > best_rps:
+            frontier.append(point)
+            best_rps = point["rps"]
+    return frontier
+
+
+def write_report(results: Dict[str, dict], args: argparse.Namespace) -> None:
+    REPORT_DIR.mkdir(parents=True, exist_ok=True)
+    with open(REPORT_DIR / "batching_sweep.json", "w") as f:
+        json.dump(results, f, indent=2)
+
+    lines = [
+        "# Batching Parameter Sweep",
+        "",
+        f"**Run Date:** {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+        f"- **Duration per level:** {args.duration}s",
+        f"- **Concurrency levels:** {' '.join(map(str, args.concurrency))}",
+        f"- **Frontier excludes points below:** {args.min_success_rate:g}% success",
+        "",
+    ]
+    for key, result in results.items():
+        spec = SERVICES[key]
+        lines += [f"## {spec.name}", ""]
+        for latency_key in ("p95", "p99"):
+            lines += [
+                f"### Throughput vs {latency_key} frontier",
+                "",
+                f"| max_batch_size | {spec.bound_name} | Concurrency | RPS | p95 (ms) | p99 (ms) | Success % |",
+                "|---|---|---|---|---|---|---|",
+            ]
+            for p in result[f"frontier_{latency_key}"]:
+                lines.append(
+                    f"| {p['batch_size']} | {p['bound_ms']:g} | {p['concurrency']} | {p['rps']:.2f} | "
+                    f"{p['p95']:.2f} | {p['p99']:.2f} | {p['success_rate']:.1f} |"
+                )
+            lines.append("")
+    lines.append("*Generated by scripts/generic/batching_sweep.py*")
+    with open(REPORT_DIR / "batching_sweep.md", "w") as f:
+        f.write("\n".join(lines))
+
+    try:
+        import matplotlib.pyplot as plt
+    except ImportError:
+        return
+    plt.figure(figsize=(10, 6))
+    for key, result in results.items():
+        points = result["points"]
+        scatter = plt.scatter([p["p95"] for p in points], [p["rps"] for p in points], alpha=0.3)
+        frontier = result["frontier_p95"]
+        plt.plot([p["p95"] for p in frontier], [p["rps"] for p in frontier], marker="o",
+                 color=scatter.get_facecolor()[0][:3], label=SERVICES[key].name)
+    plt.xlabel("p95 latency (ms)")
+    plt.ylabel("Requests per Second")
+    plt.title("Batching Sweep: Throughput vs p95 (frontier)")
+    plt.legend()
+    plt.grid(linestyle="--", alpha=0.7)
+    plt.savefig(REPORT_DIR / "batching_sweep.png")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--services", nargs="+", choices=sorted(SERVICES), default=["bentoml", "rayserve"])
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 4, 8, 16, 32])
+    parser.add_argument("--bounds-ms", nargs="+", type=float, default=None,
+                        help="Wait timeouts (Ray Serve/FastAPI) or max latencies (BentoML) in ms; per-service defaults")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per concurrency level")
+    parser.add_argument("--startup-timeout", type=float, default=180)
+    parser.add_argument("--min-success-rate", type=float, default=99.0,
+                        help="Points with a lower success rate (%%) are left off the frontier")
+    args = parser.parse_args()
+
+    image = generate_image()
+    results: Dict[str, dict] = {}
+    for key in args.services:
+        spec = SERVICES[key]
+        bounds = args.bounds_ms or spec.default_bounds_ms
+        print(f"\n== {spec.name}: {len(args.batch_sizes) * len(bounds)} configurations ==")
+        points = []
+        for batch_size in args.batch_sizes:
+            if batch_size < spec.min_batch_size:
+                print(f"  skipping batch={batch_size}: {spec.name} needs >= {spec.min_batch_size}")
+                continue
+            for bound_ms in bounds:
+                points += run_point(spec, batch_size, bound_ms, args.concurrency, args.duration, image,
+                                    args.startup_timeout)
+        results[key] = {
+            "bound_name": spec.bound_name,
+            "points": points,
+            "frontier_p95": pareto_frontier(points, "p95", args.min_success_rate),
+            "frontier_p99": pareto_frontier(points, "p99", args.min_success_rate),
+        }
+    write_report(results, args)
+    print(f"\nReport saved to {REPORT_DIR / 'batching_sweep.md'}")
+
+
+if __name__ == "__main__":
+    main()
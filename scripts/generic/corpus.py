@@ -0,0 +1,288 @@
+"""Deterministic image corpus for the load tests, stored in one pack file.
+
+The load tests used to send the same random 224x224 JPEG on every request,
+so decode cost never changed, resizing was never exercised and the
+prediction cache could not be measured. `build` synthesizes a corpus with a
+weighted mix of resolutions (long edge, e.g. 320 to 3840 for 4K) and formats
+(JPEG/PNG/WebP), plus a share of byte-identical duplicates, and writes it
+into a single pack file. The same `--seed` and options produce the same
+images.
+
+Pack layout (little endian):
+
+* 8 bytes magic `MBCORPUS`, then a uint64 length of the JSON index
+* the ASCII JSON index: `blobs` (offset, length, format, size of each
+  unique encoded image) and `sequence` (blob id of every corpus entry, in
+  sampling order; duplicates repeat a blob id)
+* the encoded images, starting on a 4 KiB boundary
+
+`CorpusPack` memory-maps the file, so clients sample images as slices of
+the mapping: no per-request disk I/O and no re-encoding. Locust
+(`CORPUS_PATH`), `loadgen.py` (`--corpus`) and the k6 script read the same
+file.
+
+Usage:
+    python scripts/generic/corpus.py build --output tmp/corpus/corpus.pack --count 500 \\
+        --sizes 320:3 640:3 1280:2 1920:1 3840:1 --formats jpeg:6 png:2 webp:2 --duplicates 0.2
+    python scripts/generic/corpus.py info tmp/corpus/corpus.pack
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import mmap
+import random
+import struct
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+MAGIC = b"MBCORPUS"
+HEADER = struct.Struct("<8sQ")
+ALIGNMENT = 4096
+CONTENT_TYPES = {"jpeg": "image/jpeg", "png": "image/png", "webp": "image/webp"}
+EXTENSIONS = {"jpeg": "jpg", "png": "png", "webp": "webp"}
+ASPECT_RATIOS = (4 / 3, 16 / 9, 1.0, 3 / 4)
+DEFAULT_SIZES = {320: 3, 640: 3, 1280: 2, 1920: 1, 3840: 1}
+DEFAULT_FORMATS = {"jpeg": 6, "png": 2, "webp": 2}
+
+
+@dataclass(frozen=True)
+class CorpusImage:
+    name: str
+    data: memoryview
+    content_type: str
+    width: int
+    height: int
+
+
+def parse_weights(specs: Sequence[str], cast=str) -> Dict:
+    """Parse `value:weight` CLI items (weight defaults to 1)."""
+    weights = {}
+    for spec in specs:
+        value, _, weight = spec.partition(":")
+        weights[cast(value)] = float(weight or 1)
+    if not weights or any(w < 0 for w in weights.values()) or not sum(weights.values()):
+        raise ValueError(f"Invalid weights: {' '.join(specs)}")
+    return weights
+
+
+def synthesize_image(rng, width: int, height: int):
+    """Photo-like test image: smooth colour fields, a few shapes and sensor noise.
+
+    Pure noise (what the load test used to send) compresses unlike real
+    photos; this keeps JPEG/PNG/WebP sizes and decode cost in a realistic
+    range while staying cheap to generate at 4K.
+    """
+    from PIL import Image, ImageChops, ImageDraw
+
+    coarse = rng.integers(0, 256, (int(rng.integers(2, 6)), int(rng.integers(2, 6)), 3), dtype="uint8")
+    image = Image.fromarray(coarse, "RGB").resize((width, height), Image.BICUBIC)
+    draw = ImageDraw.Draw(image)
+    for _ in range(int(rng.integers(3, 12))):
+        x0, x1 = sorted(int(v) for v in rng.integers(0, width, 2))
+        y0, y1 = sorted(int(v) for v in rng.integers(0, height, 2))
+        fill = tuple(int(v) for v in rng.integers(0, 256, 3))
+        shape = draw.ellipse if rng.random() < 0.5 else draw.rectangle
+        shape((x0, y0, x1, y1), fill=fill)
+
+    # A seeded noise tile keeps generation O(pixels) in C rather than numpy floats
+    tile = Image.fromarray(rng.integers(0, 17, (256, 256, 3), dtype="uint8"), "RGB")
+    noise = Image.new("RGB", (width, height))
+    for top in range(0, height, 256):
+        for left in range(0, width, 256):
+            noise.paste(tile, (left, top))
+    return ImageChops.add(image, noise, offset=-8)
+
+
+def encode_image(image, fmt: str) -> bytes:
+    buffer = io.BytesIO()
+    if fmt == "jpeg":
+        image.save(buffer, format="JPEG", quality=85)
+    elif fmt == "webp":
+        image.save(buffer, format="WEBP", quality=80)
+    else:
+        image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def plan_corpus(
+    count: int, sizes: Dict[int, float], formats: Dict[str, float], duplicates: float, seed: int
+) -> Tuple[List[dict], List[int]]:
+    """Choose the unique images and the entry sequence, without encoding anything."""
+    if count < 1:
+        raise ValueError("count must be at least 1")
+    if not 0 <= duplicates < 1:
+        raise ValueError("duplicates must be in [0, 1)")
+    unknown = set(formats) - set(CONTENT_TYPES)
+    if unknown:
+        raise ValueError(f"Unsupported formats: {', '.join(sorted(unknown))}")
+
+    rng = random.Random(seed)
+    unique = max(1, round(count * (1 - duplicates)))
+    specs = []
+    for _ in range(unique):
+        long_edge = rng.choices(list(sizes), weights=list(sizes.values()))[0]
+        ratio = rng.choice(ASPECT_RATIOS)
+        width, height = (long_edge, round(long_edge / ratio)) if ratio >= 1 else (round(long_edge * ratio), long_edge)
+        fmt = rng.choices(list(formats), weights=list(formats.values()))[0]
+        specs.append({"format": fmt, "width": width, "height": height})
+
+    sequence = list(range(unique)) + [rng.randrange(unique) for _ in range(count - unique)]
+    rng.shuffle(sequence)
+    return specs, sequence
+
+
+def build_corpus(
+    output: Path,
+    count: int = 500,
+    sizes: Optional[Dict[int, float]] = None,
+    formats: Optional[Dict[str, float]] = None,
+    duplicates: float = 0.2,
+    seed: int = 0,
+) -> dict:
+    """Synthesize, encode and pack the corpus; returns the index."""
+    import numpy as np
+
+    sizes = sizes or DEFAULT_SIZES
+    formats = formats or DEFAULT_FORMATS
+    specs, sequence = plan_corpus(count, sizes, formats, duplicates, seed)
+
+    # Encoded images go to a side file first: offsets depend on the index size
+    output.parent.mkdir(parents=True, exist_ok=True)
+    data_path = output.with_suffix(output.suffix + ".tmp")
+    blobs = []
+    with open(data_path, "wb") as data:
+        for blob_id, spec in enumerate(specs):
+            image = synthesize_image(np.random.default_rng([seed, blob_id]), spec["width"], spec["height"])
+            encoded = encode_image(image, spec["format"])
+            blobs.append({**spec, "offset": data.tell(), "length": len(encoded)})
+            data.write(encoded)
+
+    # Offsets in the index depend on the index's own length; grow until stable
+    base = 0
+    while True:
+        index = {
+            "version": 1,
+            "seed": seed,
+            "config": {"count": count, "sizes": sizes, "formats": formats, "duplicates": duplicates},
+            "blobs": [{**blob, "offset": blob["offset"] + base} for blob in blobs],
+            "sequence": sequence,
+        }
+        encoded_index = json.dumps(index, separators=(",", ":")).encode()
+        start = -(-(HEADER.size + len(encoded_index)) // ALIGNMENT) * ALIGNMENT
+        if start == base:
+            break
+        base = start
+
+    with open(output, "wb") as pack, open(data_path, "rb") as data:
+        pack.write(HEADER.pack(MAGIC, len(encoded_index)))
+        pack.write(encoded_index)
+        pack.write(b"\0" * (base - HEADER.size - len(encoded_index)))
+        while chunk := data.read(1 << 20):
+            pack.write(chunk)
+    data_path.unlink()
+    return index
+
+
+class CorpusPack:
+    """Read-only, memory-mapped view of a corpus pack."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._file = open(self.path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, index_length = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{self.path} is not a corpus pack")
+        self.index = json.loads(self._mmap[HEADER.size : HEADER.size + index_length])
+        self.blobs: List[dict] = self.index["blobs"]
+        self.sequence: List[int] = self.index["sequence"]
+
+    def __len__(self) -> int:
+        return len(self.sequence)
+
+    def entry(self, position: int) -> CorpusImage:
+        """The corpus entry at `position` (wrapping around) in sampling order."""
+        blob = self.blobs[self.sequence[position % len(self.sequence)]]
+        return CorpusImage(
+            name=f"{position % len(self.sequence):06d}.{EXTENSIONS[blob['format']]}",
+            data=memoryview(self._mmap)[blob["offset"] : blob["offset"] + blob["length"]],
+            content_type=CONTENT_TYPES[blob["format"]],
+            width=blob["width"],
+            height=blob["height"],
+        )
+
+    def sample(self, rng: random.Random = random) -> CorpusImage:  # type: ignore[assignment]
+        return self.entry(rng.randrange(len(self.sequence)))
+
+    def close(self) -> None:
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Images handed out still reference the mapping; it is unmapped with them
+            pass
+        self._file.close()
+
+    def __enter__(self) -> "CorpusPack":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def describe(pack: CorpusPack) -> str:
+    blobs = pack.blobs
+    counts = Counter(pack.blobs[i]["format"] for i in pack.sequence)
+    sizes = Counter(max(pack.blobs[i]["width"], pack.blobs[i]["height"]) for i in pack.sequence)
+    total = sum(blob["length"] for blob in blobs)
+    return "\n".join(
+        [
+            f"{pack.path}: {len(pack)} entries, {len(blobs)} unique images, {total / 1e6:.1f} MB encoded",
+            f"  duplicates: {1 - len(blobs) / len(pack):.1%} of entries",
+            "  formats:    " + ", ".join(f"{fmt} {n}" for fmt, n in sorted(counts.items())),
+            "  long edge:  " + ", ".join(f"{size}px {n}" for size, n in sorted(sizes.items())),
+        ]
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="Generate a corpus pack")
+    build.add_argument("--output", type=Path, default=Path("tmp/corpus/corpus.pack"))
+    build.add_argument("--count", type=int, default=500, help="Number of corpus entries")
+    build.add_argument("--sizes", nargs="+", default=[f"{k}:{v}" for k, v in DEFAULT_SIZES.items()],
+                       help="Long-edge pixels with weights, e.g. 320:3 3840:1")
+    build.add_argument("--formats", nargs="+", default=[f"{k}:{v}" for k, v in DEFAULT_FORMATS.items()],
+                       help="jpeg/png/webp with weights, e.g. jpeg:6 png:2 webp:2")
+    build.add_argument("--duplicates", type=float, default=0.2, help="Share of entries repeating an earlier image")
+    build.add_argument("--seed", type=int, default=0)
+
+    info = commands.add_parser("info", help="Summarize an existing pack")
+    info.add_argument("pack", type=Path)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build_corpus(
+            args.output,
+            count=args.count,
+            sizes=parse_weights(args.sizes, int),
+            formats=parse_weights(args.formats),
+            duplicates=args.duplicates,
+            seed=args.seed,
+        )
+        path = args.output
+    else:
+        path = args.pack
+    with CorpusPack(path) as pack:
+        print(describe(pack))
+
+
+if __name__ == "__main__":
+    main()
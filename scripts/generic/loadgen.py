@@ -0,0 +1,393 @@
+"""Asyncio load generator for the `/predict` endpoints.
+
+Replaces the curl-per-request loop of `automated-loadtest.sh`: one process
+sends pre-encoded multipart requests over a pool of keep-alive HTTP/1.1
+connections, so the client is no longer the bottleneck. Two modes:
+
+* `--mode concurrency` (closed loop): `--level` clients send back-to-back.
+* `--mode rate` (open loop): requests start at a constant `--level` per
+  second regardless of how fast responses come back, over at most
+  `--connections` connections.
+
+Every request carries the same random 224x224 JPEG (or `--image`) unless
+`--corpus` points at a pack built by `corpus.py`; requests then cycle
+through its entries in order, sent straight from the memory map.
+
+Latencies go into HDR-style histograms (3 significant digits). In rate mode
+each latency is measured from the request's scheduled start, so time spent
+waiting for a free connection behind a slow server is counted (no
+coordinated omission). In concurrency mode the histogram is corrected after
+the run the way HdrHistogram's `copyCorrectedForCoordinatedOmission` does,
+with `--expected-interval-ms` (default: the uncorrected median) as the
+expected interval between requests.
+
+Writes the `stats_<svc>_<level>.json` format `process-results.sh` consumes
+(string `rps`, `avg`, `median`, `min`, `max`, `p95`, `p99`, `success_rate`,
+`success`, `failed`, in ms; corrected values), plus the uncorrected summary
+and the raw histogram.
+
+Usage:
+    python scripts/generic/loadgen.py --url http://localhost:8000 --field file \\
+        --mode rate --level 50 --duration 30 --output tmp/generic/stats_fastapi_50.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import io
+import json
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+
+class HdrHistogram:
+    """Log-linear latency histogram in integer microseconds.
+
+    Values below 2048 are exact; above, each power of two is split into 1024
+    buckets, which keeps the relative error under 0.1% (3 significant digits)
+    at any magnitude.
+    """
+
+    SUB_BUCKETS = 2048
+    HALF = SUB_BUCKETS // 2
+
+    def __init__(self) -> None:
+        self.counts: Dict[int, int] = {}
+        self.total = 0
+
+    @classmethod
+    def _index(cls, value: int) -> int:
+        if value < cls.SUB_BUCKETS:
+            return value
+        shift = value.bit_length() - cls.SUB_BUCKETS.bit_length() + 1
+        return cls.SUB_BUCKETS + (shift - 1) * cls.HALF + ((value >> shift) - cls.HALF)
+
+    @classmethod
+    def _range(cls, index: int) -> Tuple[int, int]:
+        """Lowest and highest value counted in bucket `index`."""
+        if index < cls.SUB_BUCKETS:
+            return index, index
+        shift, offset = divmod(index - cls.SUB_BUCKETS, cls.HALF)
+        shift += 1
+        low = (offset + cls.HALF) << shift
+        return low, low + (1 << shift) - 1
+
+    def record(self, value_us: int, count: int = 1) -> None:
+        index = self._index(max(int(value_us), 0))
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.total += count
+
+    def record_corrected(self, value_us: int, expected_interval_us: int) -> None:
+        """Record a value plus the samples a stalled closed-loop client never sent."""
+        self.record(value_us)
+        if expected_interval_us <= 0:
+            return
+        missing = value_us - expected_interval_us
+        while missing >= expected_interval_us:
+            self.record(missing)
+            missing -= expected_interval_us
+
+    def corrected(self, expected_interval_us: int) -> "HdrHistogram":
+        """Copy with coordinated omission corrected for `expected_interval_us`."""
+        copy = HdrHistogram()
+        for index, count in self.counts.items():
+            value = self._range(index)[1]
+            for _ in range(count):
+                copy.record_corrected(value, expected_interval_us)
+        return copy
+
+    def percentile(self, q: float) -> int:
+        if not self.total:
+            return 0
+        threshold = max(1, -(-self.total * q // 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= threshold:
+                return self._range(index)[1]
+        return self.max()
+
+    def mean(self) -> float:
+        if not self.total:
+            return 0.0
+        return sum(sum(self._range(i)) / 2 * c for i, c in self.counts.items()) / self.total
+
+    def min(self) -> int:
+        return self._range(min(self.counts))[0] if self.counts else 0
+
+    def max(self) -> int:
+        return self._range(max(self.counts))[1] if self.counts else 0
+
+    def summary_ms(self) -> Dict[str, float]:
+        return {
+            "avg": self.mean() / 1000,
+            "median": self.percentile(50) / 1000,
+            "min": self.min() / 1000,
+            "max": self.max() / 1000,
+            "p95": self.percentile(95) / 1000,
+            "p99": self.percentile(99) / 1000,
+        }
+
+    def to_list(self) -> List[List[int]]:
+        """Non-empty buckets as `[highest value (us), count]` pairs."""
+        return [[self._range(i)[1], self.counts[i]] for i in sorted(self.counts)]
+
+
+class HttpConnection:
+    """Minimal keep-alive HTTP/1.1 client connection for a fixed request."""
+
+    def __init__(self, host: str, port: int):
+        self.host, self.port = host, port
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def request(self, payload: Sequence[bytes]) -> int:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        assert self.reader is not None
+        self.writer.writelines(payload)
+        await self.writer.drain()
+
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        status = int(lines[0].split(" ", 2)[1])
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip().lower()
+
+        if "content-length" in headers:
+            await self.reader.readexactly(int(headers["content-length"]))
+        elif headers.get("transfer-encoding") == "chunked":
+            while True:
+                size = int((await self.reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        if headers.get("connection") == "close":
+            self.close()
+        return status
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+def build_request(
+    url: str, field: str, image: bytes, filename: str = "image.jpg", content_type: str = "image/jpeg"
+) -> Tuple[str, int, List[bytes]]:
+    """Encode the multipart `/predict` request once; every send reuses the parts.
+
+    The image is kept as its own part, so corpus images are sent straight
+    from the pack's memory map.
+    """
+    parts = urlsplit(url)
+    host, port = parts.hostname or "localhost", parts.port or 80
+    boundary = uuid.uuid4().hex
+    body = (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode()
+    trailer = f"\r\n--{boundary}--\r\n".encode()
+    length = len(body) + len(image) + len(trailer)
+    head = (
+        f"POST {parts.path or '/'} HTTP/1.1\r\nHost: {host}:{port}\r\n"
+        f"Content-Type: multipart/form-data; boundary={boundary}\r\n"
+        f"Content-Length: {length}\r\nConnection: keep-alive\r\n\r\n"
+    ).encode()
+    return host, port, [head + body, image, trailer]
+
+
+class LoadGenerator:
+    def __init__(
+        self, host: str, port: int, payloads: Sequence[Sequence[bytes]], connections: int, timeout_s: float
+    ):
+        # Requests cycle through the payloads in order
+        self.payloads = payloads
+        self.sent = 0
+        self.timeout_s = timeout_s
+        # Latency from the intended start, and from the moment a connection was free
+        self.histogram = HdrHistogram()
+        self.service_histogram = HdrHistogram()
+        self.success = 0
+        self.failed = 0
+        self.pool: asyncio.Queue = asyncio.Queue()
+        for _ in range(connections):
+            self.pool.put_nowait(HttpConnection(host, port))
+
+    async def send(self, started: float) -> None:
+        """Send one request and record its latency measured from `started`."""
+        payload = self.payloads[self.sent % len(self.payloads)]
+        self.sent += 1
+        connection = await self.pool.get()
+        sent = time.perf_counter()
+        try:
+            status = await asyncio.wait_for(connection.request(payload), self.timeout_s)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError, IndexError):
+            # The connection's state is unknown; reconnect on next use
+            connection.close()
+            status = 0
+        finally:
+            self.pool.put_nowait(connection)
+        if status == 200:
+            finished = time.perf_counter()
+            self.success += 1
+            self.histogram.record(int((finished - started) * 1_000_000))
+            self.service_histogram.record(int((finished - sent) * 1_000_000))
+        else:
+            self.failed += 1
+
+    async def run_rate(self, rate: float, duration_s: float) -> None:
+        """Open loop: start requests on a fixed schedule, whatever the response times."""
+        start = time.perf_counter()
+        tasks = set()
+        sent = 0
+        while True:
+            if sent / rate >= duration_s:
+                break
+            scheduled = start + sent / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            # Latency counts from the schedule, including waiting for a connection
+            task = asyncio.create_task(self.send(scheduled))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            sent += 1
+        if tasks:
+            await asyncio.wait(tasks)
+
+    async def run_concurrency(self, concurrency: int, duration_s: float) -> None:
+        """Closed loop: `concurrency` clients send back-to-back until the deadline."""
+        deadline = time.perf_counter() + duration_s
+
+        async def client() -> None:
+            while time.perf_counter() < deadline:
+                await self.send(time.perf_counter())
+
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+
+    def close(self) -> None:
+        while not self.pool.empty():
+            self.pool.get_nowait().close()
+
+
+async def report_progress(generator: LoadGenerator, duration_s: float) -> None:
+    try:
+        for elapsed in range(1, int(duration_s) + 1):
+            await asyncio.sleep(1)
+            done = generator.success + generator.failed
+            print(f"\r  Progress: {elapsed}s/{int(duration_s)}s ({done} requests completed)", end="", flush=True)
+    finally:
+        print()
+
+
+async def run(args: argparse.Namespace, images: Sequence[Tuple[str, bytes, str]]) -> dict:
+    """Drive the load with `(filename, data, content type)` images, in order."""
+    url = args.url.rstrip("/") + args.path
+    payloads = []
+    for filename, data, content_type in images:
+        host, port, payload = build_request(url, args.field, data, filename, content_type)
+        payloads.append(payload)
+    connections = args.connections or (args.level if args.mode == "concurrency" else 64)
+    generator = LoadGenerator(host, port, payloads, int(connections), args.timeout)
+    progress = asyncio.create_task(report_progress(generator, args.duration))
+    started = time.perf_counter()
+    try:
+        if args.mode == "rate":
+            await generator.run_rate(args.level, args.duration)
+        else:
+            await generator.run_concurrency(int(args.level), args.duration)
+    finally:
+        generator.close()
+        progress.cancel()
+        await asyncio.gather(progress, return_exceptions=True)
+    elapsed = time.perf_counter() - started
+
+    if args.mode == "rate":
+        # Measured from the schedule already; the uncorrected view starts at the send
+        corrected, raw, interval_us = generator.histogram, generator.service_histogram, 0
+    else:
+        raw = generator.histogram
+        interval_us = int(args.expected_interval_ms * 1000) if args.expected_interval_ms else raw.percentile(50)
+        corrected = raw.corrected(interval_us)
+
+    total = generator.success + generator.failed
+    summary = corrected.summary_ms()
+    stats = {key: f"{value:.2f}" for key, value in summary.items()}
+    stats.update(
+        {
+            "rps": f"{generator.success / max(elapsed, 0.001):.2f}",
+            "success_rate": f"{100 * generator.success / max(total, 1):.1f}",
+            "success": str(generator.success),
+            "failed": str(generator.failed),
+            "mode": args.mode,
+            "images": len(payloads),
+            "level": int(args.level) if float(args.level).is_integer() else args.level,
+            "connections": int(connections),
+            "duration_s": round(elapsed, 3),
+            "expected_interval_ms": interval_us / 1000,
+            "uncorrected": {key: round(value, 2) for key, value in raw.summary_ms().items()},
+            "histogram_us": raw.to_list(),
+        }
+    )
+    return stats
+
+
+def generate_image() -> bytes:
+    """Random 224x224 JPEG, the same payload the load test always used."""
+    import numpy as np
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.fromarray(np.random.randint(0, 256, (224, 224, 3), dtype=np.uint8), "RGB").save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", required=True, help="Service base URL, e.g. http://localhost:8000")
+    parser.add_argument("--path", default="/predict")
+    parser.add_argument("--field", default="files", help="Multipart field name (FastAPI uses `file`)")
+    parser.add_argument("--mode", choices=("concurrency", "rate"), default="concurrency")
+    parser.add_argument("--level", type=float, required=True, help="Clients (concurrency) or requests/s (rate)")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds to generate load")
+    parser.add_argument("--connections", type=int, default=None,
+                        help="Connection pool size (default: --level for concurrency, 64 for rate)")
+    parser.add_argument("--timeout", type=float, default=8, help="Per-request timeout in seconds")
+    parser.add_argument("--expected-interval-ms", type=float, default=None,
+                        help="Coordinated-omission correction interval for concurrency mode")
+    parser.add_argument("--image", type=Path, default=None, help="JPEG to send (default: random 224x224)")
+    parser.add_argument("--corpus", type=Path, default=None,
+                        help="Corpus pack (see corpus.py) to cycle through instead of a single image")
+    parser.add_argument("--output", type=Path, default=None, help="stats JSON path (default: stdout)")
+    args = parser.parse_args()
+
+    if args.corpus:
+        from corpus import CorpusPack
+
+        pack = CorpusPack(args.corpus)
+        images = [(entry.name, entry.data, entry.content_type) for entry in map(pack.entry, range(len(pack)))]
+    else:
+        image = args.image.read_bytes() if args.image else generate_image()
+        images = [("image.jpg", image, "image/jpeg")]
+    stats = asyncio.run(run(args, images))
+    if args.output is None:
+        json.dump(stats, sys.stdout, indent=4)
+        print()
+        return
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(stats, f, indent=4)
+    print(f"  {stats['success']} ok / {stats['failed']} failed, {stats['rps']} rps, "
+          f"p95 {stats['p95']} ms, p99 {stats['p99']} ms (corrected)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,407 @@
+"""In-process microbenchmarks of the inference hot path.
+
+Times the code every request runs, on the local CPU, without kind,
+Kubernetes or a load test:
+
+* `preprocess`: `load_image` / `preprocess_image` of photo-like JPEGs
+  (224x224 and 1280x960) and `preprocess_batch` from decoded frames (FastAPI,
+  Ray Serve) and from PIL images (BentoML)
+* `postprocess`: batch top-k and the JSON (`to_json`) and dict (`to_dicts`)
+  renderings
+* `inference`: `InferenceEngine.predict` of the `--model` file
+* `service`: each service's batch handler (`run_batch`,
+  `_batched_predict`, `_infer`) on decoded images
+* `request`: one-image `/predict` calls through FastAPI's and BentoML's
+  ASGI apps with Starlette's test client. Ray Serve's handler cannot run
+  outside a Serve cluster, so its request benchmark chains
+  `ImagePreprocessor.preprocess`, `_batched_predict` and `json_array`
+  in-process, without the HTTP proxy or batch queue.
+
+Batch-size benchmarks run at every `--batch-sizes` value. Like
+pytest-benchmark, each benchmark is warmed up, then repeated for at least
+`--min-time` seconds (and `--min-rounds` rounds); per-round times give
+min/median/mean/p95/stddev and items per second.
+
+Results go to `reports/microbench/microbench.json` (plus a Markdown table).
+`--compare` checks them against an earlier JSON file and exits with status 1
+if any median got slower by more than `--tolerance` percent. Groups whose
+framework is not installed are skipped.
+
+Usage:
+    python scripts/generic/microbench.py --groups preprocess postprocess inference
+    python scripts/generic/microbench.py --filter 'batch.*\\[8\\]' --compare reports/microbench/baseline.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import datetime
+import functools
+import importlib
+import importlib.util
+import json
+import os
+import re
+import statistics
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+PROJECT_DIR = Path(__file__).resolve().parents[2]
+REPORT_DIR = PROJECT_DIR / "reports" / "microbench"
+GROUPS = ("preprocess", "postprocess", "inference", "service", "request")
+DEFAULT_BATCH_SIZES = (1, 2, 4, 8, 16, 32)
+DEFAULT_MODEL = PROJECT_DIR / "model" / "mobilenet_v2.keras"
+LABELS_PATH = PROJECT_DIR / "model" / "imagenet_labels.txt"
+
+sys.path.insert(0, str(PROJECT_DIR))
+
+
+@dataclass
+class Benchmark:
+    """One timed callable; `items` is how many images a call processes."""
+
+    name: str
+    group: str
+    func: Callable[[], Any]
+    items: int = 1
+    params: Dict[str, Any] = field(default_factory=dict)
+
+
+def measure(func: Callable[[], Any], min_time_s: float, min_rounds: int, max_rounds: int, warmup: int) -> Dict[str, float]:
+    """Time `func` over rounds until `min_time_s` and `min_rounds` are both reached."""
+    for _ in range(warmup):
+        func()
+    timings: List[float] = []
+    started = time.perf_counter()
+    while len(timings) < max_rounds and (len(timings) < min_rounds or time.perf_counter() - started < min_time_s):
+        round_started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - round_started)
+    timings.sort()
+    return {
+        "rounds": len(timings),
+        "min_ms": timings[0] * 1000,
+        "max_ms": timings[-1] * 1000,
+        "mean_ms": statistics.fmean(timings) * 1000,
+        "median_ms": statistics.median(timings) * 1000,
+        "p95_ms": timings[min(int(0.95 * len(timings)), len(timings) - 1)] * 1000,
+        "stddev_ms": (statistics.stdev(timings) if len(timings) > 1 else 0.0) * 1000,
+    }
+
+
+def sample_images(count: int, width: int, height: int, seed: int = 0) -> List[bytes]:
+    """Photo-like JPEGs from the load test corpus generator."""
+    from corpus import encode_image, synthesize_image
+
+    rng = np.random.default_rng(seed)
+    return [encode_image(synthesize_image(rng, width, height), "jpeg") for _ in range(count)]
+
+
+def labels() -> List[str]:
+    if LABELS_PATH.exists():
+        return LABELS_PATH.read_text().splitlines()
+    return [f"class_{i}" for i in range(1001)]
+
+
+def preprocess_benchmarks(batch_sizes: Sequence[int]) -> Iterator[Benchmark]:
+    import io
+
+    from PIL import Image
+
+    from common.preprocessing import load_image, preprocess_batch, preprocess_image
+
+    for width, height in ((224, 224), (1280, 960)):
+        image = sample_images(1, width, height)[0]
+        size = f"{width}x{height}"
+        yield Benchmark(f"load_image[{size}]", "preprocess", lambda image=image: load_image(image), params={"size": size})
+        yield Benchmark(f"preprocess_image[{size}]", "preprocess", lambda image=image: preprocess_image(image),
+                        params={"size": size})
+
+    jpegs = sample_images(max(batch_sizes), 640, 480, seed=1)
+    frames = [load_image(jpeg) for jpeg in jpegs]
+    for n in batch_sizes:
+        yield Benchmark(f"preprocess_batch_frames[{n}]", "preprocess",
+                        lambda n=n: preprocess_batch(frames[:n]), items=n, params={"batch_size": n})
+        # BentoML hands over lazily decoded PIL images; reopen them every round
+        yield Benchmark(f"preprocess_batch_pil[{n}]", "preprocess",
+                        lambda n=n: preprocess_batch([Image.open(io.BytesIO(jpeg)) for jpeg in jpegs[:n]]),
+                        items=n, params={"batch_size": n})
+
+
+def postprocess_benchmarks(batch_sizes: Sequence[int]) -> Iterator[Benchmark]:
+    from common.postprocessing import Postprocessor
+
+    postprocessor = Postprocessor(labels())
+    rng = np.random.default_rng(0)
+    logits = rng.standard_normal((max(batch_sizes), 1001)).astype(np.float32)
+    preds = np.exp(logits) / np.exp(logits).sum(axis=1, keepdims=True)
+    for n in batch_sizes:
+        batch = preds[:n]
+        params = {"batch_size": n}
+        yield Benchmark(f"top_k[{n}]", "postprocess", lambda b=batch: postprocessor.top_k_indices(b), n, params)
+        yield Benchmark(f"to_json[{n}]", "postprocess", lambda b=batch: postprocessor.to_json(b), n, params)
+        yield Benchmark(f"to_dicts[{n}]", "postprocess", lambda b=batch: postprocessor.to_dicts(b), n, params)
+
+
+def inference_benchmarks(batch_sizes: Sequence[int], model: Path) -> Iterator[Benchmark]:
+    from common.inference import load_engine, power_of_two_buckets
+    from common.preprocessing import preprocess_batch
+
+    engine = load_engine(str(model), buckets=power_of_two_buckets(max(batch_sizes)))
+    frames = np.random.default_rng(0).integers(0, 256, (max(batch_sizes), 224, 224, 3), dtype=np.uint8)
+    for n in batch_sizes:
+        batch = preprocess_batch(list(frames[:n]), pad_to=engine.bucket_size(n)).copy()
+        yield Benchmark(f"predict[{engine.backend}][{n}]", "inference", lambda b=batch, n=n: engine.predict(b, n),
+                        items=n, params={"batch_size": n, "backend": engine.backend})
+
+
+def _load_module(name: str, path: Path) -> Any:
+    spec = importlib.util.spec_from_file_location(name, path)
+    assert spec and spec.loader, f"Failed to load {path}"
+    module = importlib.util.module_from_spec(spec)
+    # Registered so frameworks can resolve the module's string annotations
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+@functools.lru_cache(maxsize=None)
+def fastapi_module() -> Any:
+    return _load_module("fastapi_app", PROJECT_DIR / "fastapi" / "main.py")
+
+
+@functools.lru_cache(maxsize=None)
+def bentoml_module() -> Any:
+    return _load_module("bentoml_service", PROJECT_DIR / "bentoml_service" / "service.py")
+
+
+@functools.lru_cache(maxsize=None)
+def rayserve_replicas() -> tuple[Any, Any, Any]:
+    """The Ray Serve app module with local preprocessor and model replica instances."""
+    app = importlib.import_module("rayserve.app")
+    # The deployment decorators keep the original classes reachable for local use
+    preprocessor = app.ImagePreprocessor.func_or_class()
+    return app, preprocessor, app.MobileNetV2Deployment.func_or_class(preprocessor)
+
+
+def service_benchmarks(batch_sizes: Sequence[int], model: Path, cleanup: List[Callable[[], Any]]) -> Iterator[Benchmark]:
+    from PIL import Image
+
+    from common.inference import load_engine, power_of_two_buckets
+    from common.preprocessing import load_image
+
+    jpegs = sample_images(max(batch_sizes), 640, 480, seed=2)
+    frames = [load_image(jpeg) for jpeg in jpegs]
+    pil_images = [Image.fromarray(frame) for frame in frames]
+
+    if _available("fastapi"):
+        main = fastapi_module()
+        engine = load_engine(str(model), buckets=power_of_two_buckets(max(batch_sizes)))
+        for n in batch_sizes:
+            yield Benchmark(f"fastapi.run_batch[{n}]", "service", lambda n=n: main.run_batch(engine, frames[:n]),
+                            items=n, params={"batch_size": n, "service": "fastapi"})
+    if _available("ray"):
+        _, _, replica = rayserve_replicas()
+        # serve.batch wraps the method; call the undecorated one with a single request
+        batched = type(replica)._batched_predict.__wrapped__
+        runner = asyncio.Runner()
+        cleanup.append(runner.close)
+        stacked = np.stack(frames)
+        for n in batch_sizes:
+            yield Benchmark(f"rayserve._batched_predict[{n}]", "service",
+                            lambda n=n: runner.run(batched(replica, [stacked[:n]])),
+                            items=n, params={"batch_size": n, "service": "rayserve"})
+    if _available("bentoml"):
+        svc = bentoml_module().MobileNetV2Classifier()
+        wait_ready(svc.__is_ready__)
+        for n in batch_sizes:
+            yield Benchmark(f"bentoml._infer[{n}]", "service", lambda n=n: svc._infer(pil_images[:n]),
+                            items=n, params={"batch_size": n, "service": "bentoml"})
+
+
+def wait_ready(is_ready: Callable[[], bool], timeout_s: float = 300.0) -> None:
+    """Wait for a service's background startup warmup, which would compete with the measurements."""
+    deadline = time.monotonic() + timeout_s
+    while not is_ready():
+        if time.monotonic() > deadline:
+            raise RuntimeError("Service did not finish its warmup")
+        time.sleep(0.2)
+
+
+def request_benchmarks(cleanup: List[Callable[[], Any]]) -> Iterator[Benchmark]:
+    jpeg = sample_images(1, 640, 480, seed=3)[0]
+
+    def client_post(app: Any, field_name: str, ready_path: str) -> Callable[[], Any]:
+        from starlette.testclient import TestClient
+
+        client = TestClient(app)
+        client.__enter__()  # run the lifespan (model loading) once, not per round
+        cleanup.append(lambda: client.__exit__(None, None, None))
+        wait_ready(lambda: client.get(ready_path).status_code == 200)
+        files = [(field_name, ("image.jpg", jpeg, "image/jpeg"))]
+
+        def post() -> None:
+            response = client.post("/predict", files=files)
+            if response.status_code != 200:
+                raise RuntimeError(f"/predict returned {response.status_code}: {response.text[:200]}")
+
+        return post
+
+    if _available("fastapi"):
+        yield Benchmark("fastapi./predict", "request", client_post(fastapi_module().app, "file", "/ready"),
+                        params={"service": "fastapi"})
+    if _available("ray"):
+        app, preprocessor, replica = rayserve_replicas()
+        batched = type(replica)._batched_predict.__wrapped__
+        runner = asyncio.Runner()
+        cleanup.append(runner.close)
+
+        def ray_path() -> bytes:
+            tensor = preprocessor.preprocess([jpeg])
+            ((results, _started),) = runner.run(batched(replica, [tensor]))
+            return app.json_array(results)
+
+        yield Benchmark("rayserve.predict_in_process", "request", ray_path, params={"service": "rayserve"})
+    if _available("bentoml"):
+        app = bentoml_module().MobileNetV2Classifier.to_asgi()
+        yield Benchmark("bentoml./predict", "request", client_post(app, "files", "/readyz"), params={"service": "bentoml"})
+
+
+def _available(module: str) -> bool:
+    if importlib.util.find_spec(module) is None:
+        print(f"  {module} is not installed; skipping its benchmarks")
+        return False
+    return True
+
+
+def collect(groups: Sequence[str], batch_sizes: Sequence[int], model: Path,
+            cleanup: List[Callable[[], Any]]) -> Iterator[Benchmark]:
+    if "preprocess" in groups:
+        yield from preprocess_benchmarks(batch_sizes)
+    if "postprocess" in groups:
+        yield from postprocess_benchmarks(batch_sizes)
+    if "inference" in groups:
+        yield from inference_benchmarks(batch_sizes, model)
+    if "service" in groups:
+        yield from service_benchmarks(batch_sizes, model, cleanup)
+    if "request" in groups:
+        yield from request_benchmarks(cleanup)
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+    # The services read these at import time
+    os.environ.setdefault("MODEL_PATH", str(args.model))
+    os.environ.setdefault("LABELS_PATH", str(LABELS_PATH))
+    pattern = re.compile(args.filter) if args.filter else None
+    cleanup: List[Callable[[], Any]] = []
+    results = []
+    try:
+        for bench in collect(args.groups, args.batch_sizes, args.model, cleanup):
+            if pattern and not pattern.search(bench.name):
+                continue
+            stats = measure(bench.func, args.min_time, args.min_rounds, args.max_rounds, args.warmup)
+            stats["items_per_s"] = bench.items / (stats["median_ms"] / 1000)
+            results.append({"name": bench.name, "group": bench.group, "items": bench.items,
+                            "params": bench.params, "stats": stats})
+            print(f"  {bench.name:<40} median {stats['median_ms']:9.3f} ms  "
+                  f"p95 {stats['p95_ms']:9.3f} ms  {stats['items_per_s']:10.1f} items/s  ({stats['rounds']} rounds)")
+    finally:
+        for close in reversed(cleanup):
+            close()
+    return {"meta": run_metadata(args), "benchmarks": results}
+
+
+def run_metadata(args: argparse.Namespace) -> Dict[str, Any]:
+    from results_store import environment, git_info
+
+    return {
+        "run_date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "model": str(args.model),
+        "batch_sizes": list(args.batch_sizes),
+        "min_time_s": args.min_time,
+        **git_info(),
+        "environment": environment(),
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], tolerance_pct: float) -> List[Dict[str, Any]]:
+    """Median change of every benchmark present in both runs; `regression` if slower beyond the tolerance."""
+    previous = {bench["name"]: bench["stats"]["median_ms"] for bench in baseline["benchmarks"]}
+    rows = []
+    for bench in current["benchmarks"]:
+        if bench["name"] not in previous:
+            continue
+        before, after = previous[bench["name"]], bench["stats"]["median_ms"]
+        change = (after - before) / before * 100 if before else 0.0
+        rows.append({"name": bench["name"], "baseline_ms": before, "median_ms": after, "change_pct": change,
+                     "regression": change > tolerance_pct})
+    return rows
+
+
+def write_report(result: Dict[str, Any], output: Path, comparison: Optional[List[Dict[str, Any]]] = None) -> None:
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2))
+    meta = result["meta"]
+    env = meta["environment"]
+    lines = [
+        "# ⏱️ Inference Hot Path Microbenchmarks",
+        "",
+        f"**Run Date:** {meta['run_date']}",
+        f"- **Commit:** {meta.get('git_commit') or 'unknown'}",
+        f"- **Machine:** {env['cpu_count']} CPUs, {env['platform']}, Python {env['python']}",
+        f"- **Model:** `{Path(meta['model']).name}`",
+        "",
+        "| Benchmark | Median (ms) | p95 (ms) | Min (ms) | Stddev (ms) | Items/s | Rounds |",
+        "| :--- | ---: | ---: | ---: | ---: | ---: | ---: |",
+    ]
+    for bench in result["benchmarks"]:
+        s = bench["stats"]
+        lines.append(f"| {bench['name']} | {s['median_ms']:.3f} | {s['p95_ms']:.3f} | {s['min_ms']:.3f} | "
+                     f"{s['stddev_ms']:.3f} | {s['items_per_s']:.1f} | {s['rounds']} |")
+    if comparison:
+        lines += ["", "## Change vs Baseline", "", "| Benchmark | Baseline (ms) | Median (ms) | Change |",
+                  "| :--- | ---: | ---: | ---: |"]
+        for row in comparison:
+            flag = " ⚠️" if row["regression"] else ""
+            lines.append(f"| {row['name']} | {row['baseline_ms']:.3f} | {row['median_ms']:.3f} | "
+                         f"{row['change_pct']:+.1f}%{flag} |")
+    output.with_suffix(".md").write_text("\n".join(lines) + "\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--groups", nargs="+", choices=GROUPS, default=list(GROUPS))
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=list(DEFAULT_BATCH_SIZES))
+    parser.add_argument("--filter", default=None, help="Only run benchmarks whose name matches this regex")
+    parser.add_argument("--model", type=Path, default=Path(os.getenv("MODEL_PATH", DEFAULT_MODEL)))
+    parser.add_argument("--min-time", type=float, default=0.5, help="Seconds to repeat each benchmark for")
+    parser.add_argument("--min-rounds", type=int, default=5)
+    parser.add_argument("--max-rounds", type=int, default=10000)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--output", type=Path, default=REPORT_DIR / "microbench.json")
+    parser.add_argument("--compare", type=Path, default=None, help="Earlier microbench JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=10.0, help="Allowed median slowdown in percent")
+    args = parser.parse_args()
+
+    result = run(args)
+    comparison = compare(json.loads(args.compare.read_text()), result, args.tolerance) if args.compare else None
+    write_report(result, args.output, comparison)
+    print(f"Results written to {args.output} and {args.output.with_suffix('.md')}")
+    if comparison:
+        regressions = [row for row in comparison if row["regression"]]
+        for row in regressions:
+            print(f"  REGRESSION {row['name']}: {row['baseline_ms']:.3f} -> {row['median_ms']:.3f} ms "
+                  f"({row['change_pct']:+.1f}%)")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -41,7 +41,9 @@ tmp_dir = sys.argv[1]
 levels = sys.argv[2].split()
 
 for concurrent in levels:
-    level_data = {"concurrency": int(concurrent)}
+    # Open-loop rates may be fractional; written like loadgen.py writes `level`
+    level = float(concurrent)
+    level_data = {"concurrency": int(level) if level.is_integer() else level}
     for svc in ["bentoml", "fastapi", "rayserve"]:
         stats_file = os.path.join(tmp_dir, f"stats_{svc}_{concurrent}.json")
         if os.path.exists(stats_file):
@@ -176,6 +178,24 @@ main() {
     
     write_markdown_report
     echo "📄 Markdown report saved to $REPORT_DIR/loadtest_report.md"
+
+    echo "📊 Locating saturation point and latency knee..."
+    uvx --with matplotlib python3 "$SCRIPT_DIR/saturation.py" analyze --mode "${LOAD_MODE:-concurrency}" \
+        || echo "⚠️  Saturation analysis failed"
+
+    if compgen -G "$TMP_DIR/profiles/*.profile.json" > /dev/null; then
+        echo "🔥 Summarizing profiles..."
+        mkdir -p "$REPORT_DIR/profiles"
+        cp "$TMP_DIR"/profiles/* "$REPORT_DIR/profiles/"
+        python3 "$SCRIPT_DIR/profile_capture.py" report "$REPORT_DIR/profiles" \
+            --output "$REPORT_DIR/profiles/profiles.md" || echo "⚠️  Profile summary failed"
+    fi
+
+    # Keep the run in the persistent results store for cross-run comparisons
+    python3 "$SCRIPT_DIR/results_store.py" ingest-generic "$TMP_DIR" --levels "$CONCURRENCY_LEVELS" \
+        --config duration_s="$DURATION_PER_LEVEL" levels="$CONCURRENCY_LEVELS" \
+        load_mode="${LOAD_MODE:-concurrency}" replicas="${REPLICAS:-}" corpus="${CORPUS:-}" \
+        || echo "⚠️  Could not record the run in the results store"
     print_header "✅ Processing Complete"
 }
 
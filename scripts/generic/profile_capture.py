@@ -0,0 +1,141 @@
+"""Capture sampling profiles from running services and summarize them.
+
+`capture` calls a service's `POST /admin/profile` endpoint (see
+`common/profiling.py`), which samples the process for `--seconds` while it
+keeps serving, and writes next to `--output`:
+
+* `<output>.speedscope.json`: open in https://www.speedscope.app
+* `<output>.folded`: collapsed stacks for `flamegraph.pl`
+* `<output>.profile.json`: the top-N hot functions and capture metadata
+
+The service must run with `ADMIN_TOKEN` set; the same token is read from
+`ADMIN_TOKEN` here (or `--token`). `--delay` waits before starting, so a
+capture launched together with a load test level skips its ramp-up; with
+`PROFILE_SECONDS` set, `automated-loadtest.sh` does this at every level.
+
+`report` renders the `*.profile.json` files of a directory as one Markdown
+summary (`process-results.sh` writes `reports/generic/profiles/profiles.md`).
+
+Usage:
+    ADMIN_TOKEN=... python scripts/generic/profile_capture.py capture --url http://localhost:8000 \\
+        --seconds 10 --output reports/profile/fastapi
+    python scripts/generic/profile_capture.py report tmp/generic/profiles --output reports/generic/profiles/profiles.md
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Any, Dict, List
+
+
+def request_profile(url: str, token: str, options: Dict[str, Any], timeout_s: float) -> Dict[str, Any]:
+    """POST `options` to `<url>/admin/profile` and return the decoded profile."""
+    request = urllib.request.Request(
+        url.rstrip("/") + "/admin/profile",
+        data=json.dumps(options).encode(),
+        headers={"Content-Type": "application/json", "X-Admin-Token": token},
+        method="POST",
+    )
+    with urllib.request.urlopen(request, timeout=timeout_s) as response:
+        return json.load(response)
+
+
+def write_profile(profile: Dict[str, Any], output: Path) -> List[Path]:
+    """Write the speedscope, folded and summary files of `profile` next to `output`."""
+    output.parent.mkdir(parents=True, exist_ok=True)
+    paths = [
+        output.with_name(output.name + ".speedscope.json"),
+        output.with_name(output.name + ".folded"),
+        output.with_name(output.name + ".profile.json"),
+    ]
+    paths[0].write_text(json.dumps(profile["speedscope"]))
+    paths[1].write_text(profile["folded"])
+    summary = {key: value for key, value in profile.items() if key not in ("speedscope", "folded")}
+    paths[2].write_text(json.dumps(summary, indent=2))
+    return paths
+
+
+def format_top(profile: Dict[str, Any], limit: int) -> List[str]:
+    lines = [
+        "| Self % | Total % | Function | Location |",
+        "|-------:|--------:|----------|----------|",
+    ]
+    for entry in profile["top"][:limit]:
+        location = f"{Path(entry['file']).name}:{entry['line']}"
+        lines.append(f"| {entry['self_pct']:.1f} | {entry['total_pct']:.1f} | `{entry['function']}` | {location} |")
+    return lines
+
+
+def write_report(profile_dir: Path, output: Path, limit: int) -> int:
+    """Summarize every `*.profile.json` in `profile_dir` as Markdown; returns how many were found."""
+    profiles = sorted(profile_dir.glob("*.profile.json"))
+    lines = ["# 🔥 Profiles", ""]
+    for path in profiles:
+        profile = json.loads(path.read_text())
+        name = path.name[: -len(".profile.json")]
+        lines += [
+            f"## {name}",
+            "",
+            f"{profile['samples']} samples over {profile['duration_s']:.1f}s of `{profile['name']}` "
+            f"(pid {profile['pid']}); flame graph: `{name}.speedscope.json`, `{name}.folded`."
+            + (f" TensorFlow trace: `{profile['tf_trace_dir']}` on the pod." if profile.get("tf_trace_dir") else ""),
+            "",
+            *format_top(profile, limit),
+            "",
+        ]
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text("\n".join(lines))
+    return len(profiles)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    capture = commands.add_parser("capture", help="Profile a running service")
+    capture.add_argument("--url", required=True, help="Service base URL")
+    capture.add_argument("--output", type=Path, required=True, help="Output path prefix")
+    capture.add_argument("--seconds", type=float, default=10.0)
+    capture.add_argument("--top", type=int, default=20)
+    capture.add_argument("--delay", type=float, default=0.0, help="Seconds to wait before starting")
+    capture.add_argument("--idle", action="store_true", help="Keep samples of waiting threads")
+    capture.add_argument("--tf-trace", action="store_true", help="Also write a TensorFlow profiler trace on the service")
+    capture.add_argument("--deployment", choices=("model", "preprocessor"), default=None,
+                         help="Ray Serve deployment to profile")
+    capture.add_argument("--token", default=os.getenv("ADMIN_TOKEN", ""))
+
+    report = commands.add_parser("report", help="Summarize captured profiles as Markdown")
+    report.add_argument("profile_dir", type=Path)
+    report.add_argument("--output", type=Path, required=True)
+    report.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.command == "report":
+        count = write_report(args.profile_dir, args.output, args.top)
+        print(f"Summarized {count} profiles in {args.output}")
+        return
+
+    options: Dict[str, Any] = {"seconds": args.seconds, "top": args.top, "idle": args.idle, "tf_trace": args.tf_trace}
+    if args.deployment:
+        options["deployment"] = args.deployment
+    time.sleep(args.delay)
+    try:
+        profile = request_profile(args.url, args.token, options, timeout_s=args.seconds + 60)
+    except urllib.error.HTTPError as exc:
+        sys.exit(f"Profile capture failed: HTTP {exc.code} {exc.read().decode(errors='replace')}")
+    except urllib.error.URLError as exc:
+        sys.exit(f"Profile capture failed: {exc.reason}")
+    paths = write_profile(profile, args.output)
+    print(f"{profile['samples']} samples over {profile['duration_s']:.1f}s; wrote {', '.join(map(str, paths))}")
+    print("\n".join(format_top(profile, min(args.top, 10))))
+
+
+if __name__ == "__main__":
+    main()
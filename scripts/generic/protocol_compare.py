@@ -0,0 +1,187 @@
+"""HTTP/multipart vs gRPC load comparison for the Ray Serve application.
+
+Drives the same deployment and batched predictor through its two front
+doors at several concurrency levels:
+
+* `http`: multipart `POST /predict` through the Serve HTTP proxy
+* `grpc`: unary `mobilenet.MobileNetService/Predict` through the gRPC proxy
+* `grpc_stream`: server-streaming `PredictStream` (one call per request,
+  complete when the last batch arrives)
+
+Every request carries the same `--images` JPEGs, so the difference between
+`http` and `grpc` is multipart parsing, the HTTP proxy and JSON encoding vs
+protobuf framing. With `--start` the application is launched locally from
+`rayserve/serve_config.yaml` (which enables the gRPC servicer); otherwise it
+must already be reachable, e.g. through port-forwards of 8000 and 9000.
+
+Results are written to `reports/protocol/protocol_compare.json` with a
+Markdown summary next to it.
+
+Usage:
+    python scripts/generic/protocol_compare.py --start --concurrency 1 8 32 --duration 15
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import os
+import subprocess
+import sys
+from typing import Callable, Dict, List
+
+from batching_sweep import (
+    LOG_DIR,
+    PROJECT_DIR,
+    _executable,
+    generate_image,
+    run_closed_loop,
+    stop_service,
+    wait_healthy,
+)
+
+REPORT_DIR = PROJECT_DIR / "reports" / "protocol"
+MODES = ("http", "grpc", "grpc_stream")
+
+
+def http_client(url: str, images: List[bytes]) -> Callable[[], Callable[[], bool]]:
+    import requests
+
+    files = [("files", (f"image{i}.jpg", image, "image/jpeg")) for i, image in enumerate(images)]
+
+    def make_request() -> Callable[[], bool]:
+        session = requests.Session()
+
+        def send() -> bool:
+            try:
+                return session.post(url, files=files, timeout=30).status_code == 200
+            except requests.RequestException:
+                return False
+
+        return send
+
+    return make_request
+
+
+def grpc_client(target: str, images: List[bytes], stream: bool) -> Callable[[], Callable[[], bool]]:
+    import grpc
+
+    sys.path.insert(0, str(PROJECT_DIR))
+    from common.mobilenet_pb2 import PredictRequest
+    from common.mobilenet_pb2_grpc import MobileNetServiceStub
+
+    request = PredictRequest(images=images)
+
+    def make_request() -> Callable[[], bool]:
+        # One HTTP/2 channel per client, like the keep-alive HTTP sessions
+        stub = MobileNetServiceStub(grpc.insecure_channel(target))
+
+        def send() -> bool:
+            try:
+                if stream:
+                    results = sum(len(response.results) for response in stub.PredictStream(request, timeout=30))
+                else:
+                    results = len(stub.Predict(request, timeout=30).results)
+            except grpc.RpcError:
+                return False
+            return results == len(images)
+
+        return send
+
+    return make_request
+
+
+def start_service(args: argparse.Namespace) -> subprocess.Popen:
+    env = dict(os.environ)
+    # serve_config.yaml imports `app:graph`; `common` resolves from the project root
+    env["PYTHONPATH"] = os.pathsep.join([str(PROJECT_DIR / "rayserve"), str(PROJECT_DIR), env.get("PYTHONPATH", "")])
+    env.setdefault("MODEL_PATH", str(PROJECT_DIR / "model" / "mobilenet_v2.keras"))
+    env.setdefault("LABELS_PATH", str(PROJECT_DIR / "model" / "imagenet_labels.txt"))
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
+    log = open(LOG_DIR / "protocol_compare_rayserve.log", "w")
+    return subprocess.Popen(
+        [_executable("serve"), "run", str(PROJECT_DIR / "rayserve" / "serve_config.yaml")],
+        cwd=PROJECT_DIR, env=env, stdout=log, stderr=subprocess.STDOUT, start_new_session=True,
+    )
+
+
+def write_report(results: Dict[str, List[dict]], args: argparse.Namespace) -> None:
+    REPORT_DIR.mkdir(parents=True, exist_ok=True)
+    with open(REPORT_DIR / "protocol_compare.json", "w") as f:
+        json.dump({"images_per_request": args.images, "results": results}, f, indent=2)
+
+    lines = [
+        "# Ray Serve: HTTP/multipart vs gRPC",
+        "",
+        f"**Run Date:** {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+        f"- **Duration per level:** {args.duration}s",
+        f"- **Images per request:** {args.images}",
+        "",
+        "| Mode | Concurrency | RPS | Avg (ms) | p50 (ms) | p95 (ms) | p99 (ms) | Success % |",
+        "|---|---|---|---|---|---|---|---|",
+    ]
+    for mode, points in results.items():
+        for p in points:
+            lines.append(
+                f"| {mode} | {p['concurrency']} | {p['rps']:.2f} | {p['avg']:.2f} | {p['p50']:.2f} | "
+                f"{p['p95']:.2f} | {p['p99']:.2f} | {p['success_rate']:.1f} |"
+            )
+
+    if "http" in results and "grpc" in results:
+        lines += ["", "## gRPC vs HTTP", "", "| Concurrency | RPS change | p50 change (ms) |", "|---|---|---|"]
+        for http_point, grpc_point in zip(results["http"], results["grpc"]):
+            rps_change = (grpc_point["rps"] / http_point["rps"] - 1) * 100 if http_point["rps"] else 0.0
+            lines.append(
+                f"| {http_point['concurrency']} | {rps_change:+.1f}% | {grpc_point['p50'] - http_point['p50']:+.2f} |"
+            )
+    lines += ["", "*Generated by scripts/generic/protocol_compare.py*"]
+    with open(REPORT_DIR / "protocol_compare.md", "w") as f:
+        f.write("\n".join(lines))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--http-port", type=int, default=8000)
+    parser.add_argument("--grpc-port", type=int, default=9000)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--images", type=int, default=1, help="Images per request")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per concurrency level")
+    parser.add_argument("--start", action="store_true", help="Launch Ray Serve locally from serve_config.yaml")
+    parser.add_argument("--startup-timeout", type=float, default=180)
+    args = parser.parse_args()
+
+    http_url = f"http://{args.host}:{args.http_port}"
+    process = start_service(args) if args.start else None
+    try:
+        if process is not None and not wait_healthy(f"{http_url}/ready", process, args.startup_timeout):
+            raise SystemExit(f"Ray Serve did not become healthy; see {LOG_DIR / 'protocol_compare_rayserve.log'}")
+
+        images = [generate_image() for _ in range(args.images)]
+        clients = {
+            "http": http_client(f"{http_url}/predict", images),
+            "grpc": grpc_client(f"{args.host}:{args.grpc_port}", images, stream=False),
+            "grpc_stream": grpc_client(f"{args.host}:{args.grpc_port}", images, stream=True),
+        }
+        results: Dict[str, List[dict]] = {}
+        for mode in args.modes:
+            # Warm up connections and the compiled batch shapes
+            run_closed_loop(clients[mode], 1, 2)
+            results[mode] = []
+            for concurrency in args.concurrency:
+                stats = run_closed_loop(clients[mode], concurrency, args.duration)
+                print(f"  {mode} c={concurrency}: {stats['rps']:.2f} rps, p95 {stats['p95']:.1f} ms, "
+                      f"{stats['success_rate']:.1f}% ok")
+                results[mode].append(stats)
+    finally:
+        if process is not None:
+            stop_service(process)
+
+    write_report(results, args)
+    print(f"\nReport saved to {REPORT_DIR / 'protocol_compare.md'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+"""Persistent SQLite store of benchmark runs, with regression checks between runs.
+
+The report scripts (`process-results.sh`, `compare_locust.py`,
+`analyze_results.py`) each parse their raw stats into a Markdown report and
+then throw them away. They now also record every run here (the shell
+aggregator through `ingest-generic`, the Python scripts through
+`record_run`), together with the git commit, the run configuration and the
+environment, so any two runs can be compared later:
+
+* `runs`: one row per ingested run (`source` is `generic`, `locust`,
+  `locust-analyze`, ...),
+  with `git_commit`, `git_branch`, `git_dirty`, `config` and `environment`
+  (JSON)
+* `results`: one row per (run, service, level, metric) value, where
+  `level` is the concurrency, arrival rate or user count of that step
+
+`compare` matches the values of a candidate run (default: the latest run
+of the baseline's source) against a baseline (`latest`: the run of the same
+source before the candidate) and flags every throughput
+drop or latency increase beyond `--tolerance` percent. It exits with status
+1 when something regressed, so it can gate a release.
+
+The database is `reports/benchmarks.sqlite` unless `RESULTS_DB` or `--db`
+says otherwise.
+
+Usage:
+    python scripts/generic/results_store.py ingest-generic tmp/generic --levels "10 20 40 80" \\
+        --config duration_s=10 replicas=2
+    python scripts/generic/results_store.py list
+    python scripts/generic/results_store.py compare --baseline 3 --tolerance 5 --metric-tolerance p99=15
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import socket
+import sqlite3
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+PROJECT_DIR = Path(__file__).resolve().parents[2]
+DEFAULT_DB = Path(os.getenv("RESULTS_DB", PROJECT_DIR / "reports" / "benchmarks.sqlite"))
+
+# Whether a larger value is better; metrics not listed are stored but not compared
+HIGHER_IS_BETTER = {"rps": True, "success_rate": True, "avg": False, "median": False, "p50": False,
+                    "p95": False, "p99": False, "max": False}
+STORED_STATS = set(HIGHER_IS_BETTER) | {"min", "success", "failed"}
+# Environment variables that change what a run measures
+CONFIG_ENV = (
+    "LOAD_MODE", "CORPUS", "CORPUS_PATH", "REPLICAS", "INFERENCE_BACKEND", "MAX_BATCH_SIZE", "BATCH_WAIT_TIMEOUT_S",
+    "BENTOML_MAX_BATCH_SIZE", "BENTOML_MAX_LATENCY_MS", "RAY_MAX_BATCH_SIZE", "RAY_BATCH_WAIT_TIMEOUT_S",
+    "CACHE_MAX_ENTRIES", "CPU_LIMIT", "TF_NUM_INTRAOP_THREADS", "TF_NUM_INTEROP_THREADS", "DECODE_THREADS",
+    "WEB_CONCURRENCY", "SHARED_INFERENCE",
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT NOT NULL,
+    source TEXT NOT NULL,
+    label TEXT,
+    git_commit TEXT,
+    git_branch TEXT,
+    git_dirty INTEGER,
+    config TEXT NOT NULL,
+    environment TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    service TEXT NOT NULL,
+    level REAL NOT NULL,
+    metric TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (run_id, service, level, metric)
+);
+"""
+
+# (service, level, {metric: value})
+ResultRow = Tuple[str, float, Dict[str, float]]
+
+
+def connect(db_path: Optional[Path] = None) -> sqlite3.Connection:
+    path = Path(db_path or DEFAULT_DB)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        out = subprocess.run(["git", *args], cwd=PROJECT_DIR, capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() if out.returncode == 0 else None
+
+
+def git_info() -> Dict[str, Optional[object]]:
+    status = _git("status", "--porcelain", "--untracked-files=no")
+    return {
+        "git_commit": _git("rev-parse", "HEAD"),
+        "git_branch": _git("rev-parse", "--abbrev-ref", "HEAD"),
+        "git_dirty": None if status is None else int(bool(status)),
+    }
+
+
+def environment() -> Dict[str, object]:
+    env: Dict[str, object] = {
+        "hostname": socket.gethostname(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+    }
+    try:
+        env["memory_bytes"] = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (ValueError, OSError, AttributeError):
+        pass
+    env["variables"] = {name: os.environ[name] for name in CONFIG_ENV if name in os.environ}
+    return env
+
+
+def record_run(
+    source: str,
+    rows: Iterable[ResultRow],
+    config: Optional[Dict[str, object]] = None,
+    label: Optional[str] = None,
+    db_path: Optional[Path] = None,
+) -> int:
+    """Store one run and its values; returns the run id."""
+    rows = list(rows)
+    if not rows:
+        raise ValueError("No results to record")
+    conn = connect(db_path)
+    with conn:
+        cursor = conn.execute(
+            "INSERT INTO runs (created_at, source, label, git_commit, git_branch, git_dirty, config, environment)"
+            " VALUES (:created_at, :source, :label, :git_commit, :git_branch, :git_dirty, :config, :environment)",
+            {
+                "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+                "source": source,
+                "label": label,
+                **git_info(),
+                "config": json.dumps(config or {}, sort_keys=True),
+                "environment": json.dumps(environment(), sort_keys=True),
+            },
+        )
+        run_id = int(cursor.lastrowid)
+        conn.executemany(
+            "INSERT OR REPLACE INTO results (run_id, service, level, metric, value) VALUES (?, ?, ?, ?, ?)",
+            [
+                (run_id, service, float(level), metric, float(value))
+                for service, level, metrics in rows
+                for metric, value in metrics.items()
+                if _is_number(value)
+            ],
+        )
+    conn.close()
+    return run_id
+
+
+def _is_number(value: object) -> bool:
+    try:
+        float(value)  # type: ignore[arg-type]
+    except (TypeError, ValueError):
+        return False
+    return not isinstance(value, bool)
+
+
+def generic_rows(tmp_dir: Path, levels: Optional[List[str]] = None) -> List[ResultRow]:
+    """Rows from the `stats_<svc>_<level>.json` files written by `loadgen.py`."""
+    rows = []
+    for path in sorted(Path(tmp_dir).glob("stats_*_*.json")):
+        service, _, level = path.stem[len("stats_"):].rpartition("_")
+        if levels is not None and level not in levels:
+            continue
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, json.JSONDecodeError):
+            continue
+        metrics = {key: float(value) for key, value in data.items() if key in STORED_STATS and _is_number(value)}
+        rows.append((service, float(level), metrics))
+    return rows
+
+
+def resolve_run(
+    conn: sqlite3.Connection, ref: str, source: Optional[str] = None, before: Optional[int] = None
+) -> sqlite3.Row:
+    """A run by id, or `latest` (optionally of one source, and older than run `before`)."""
+    if ref == "latest":
+        conditions, params = [], []
+        if source:
+            conditions, params = conditions + ["source = ?"], params + [source]
+        if before is not None:
+            conditions, params = conditions + ["id < ?"], params + [before]
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        run = conn.execute("SELECT * FROM runs" + where + " ORDER BY id DESC LIMIT 1", params).fetchone()
+    else:
+        run = conn.execute("SELECT * FROM runs WHERE id = ?", (int(ref),)).fetchone()
+    if run is None:
+        raise SystemExit(
+            f"No run matches {ref!r}" + (f" for source {source!r}" if source else "")
+            + (f" before run {before}" if before is not None else "")
+        )
+    return run
+
+
+def resolve_comparison(conn: sqlite3.Connection, baseline_ref: str, candidate_ref: str) -> Tuple[sqlite3.Row, sqlite3.Row]:
+    """The baseline and candidate runs of `compare`.
+
+    A `latest` candidate is the newest run of the baseline's source. A
+    `latest` baseline is the run of the candidate's source before the
+    candidate, so `--baseline latest --candidate latest` compares the two
+    newest runs. A run is never compared with itself.
+    """
+    if baseline_ref == "latest":
+        candidate = resolve_run(conn, candidate_ref)
+        baseline = resolve_run(conn, "latest", source=candidate["source"], before=candidate["id"])
+    else:
+        baseline = resolve_run(conn, baseline_ref)
+        candidate = resolve_run(conn, candidate_ref, source=baseline["source"])
+    if baseline["id"] == candidate["id"]:
+        raise SystemExit(f"Baseline and candidate are both run {baseline['id']}; pick two different runs")
+    return baseline, candidate
+
+
+def run_values(conn: sqlite3.Connection, run_id: int) -> Dict[Tuple[str, float, str], float]:
+    rows = conn.execute("SELECT service, level, metric, value FROM results WHERE run_id = ?", (run_id,))
+    return {(r["service"], r["level"], r["metric"]): r["value"] for r in rows}
+
+
+def compare_values(
+    baseline: Dict[Tuple[str, float, str], float],
+    candidate: Dict[Tuple[str, float, str], float],
+    tolerance_pct: float = 5.0,
+    metric_tolerance: Optional[Dict[str, float]] = None,
+) -> List[dict]:
+    """One entry per comparable value; `regression` is set beyond the tolerance."""
+    metric_tolerance = metric_tolerance or {}
+    comparisons = []
+    for key in sorted(set(baseline) & set(candidate)):
+        service, level, metric = key
+        if metric not in HIGHER_IS_BETTER:
+            continue
+        before, after = baseline[key], candidate[key]
+        change = (after - before) / before * 100 if before else 0.0
+        worse = -change if HIGHER_IS_BETTER[metric] else change
+        tolerance = metric_tolerance.get(metric, tolerance_pct)
+        comparisons.append(
+            {
+                "service": service, "level": level, "metric": metric, "baseline": before, "candidate": after,
+                "change_pct": change, "tolerance_pct": tolerance, "regression": bool(before) and worse > tolerance,
+            }
+        )
+    return comparisons
+
+
+def format_comparison(baseline: sqlite3.Row, candidate: sqlite3.Row, comparisons: List[dict]) -> str:
+    regressions = [c for c in comparisons if c["regression"]]
+
+    def describe(run: sqlite3.Row) -> str:
+        commit = (run["git_commit"] or "unknown")[:10] + (" (dirty)" if run["git_dirty"] else "")
+        return f"run {run['id']} ({run['source']}, {run['created_at']}, {commit})"
+
+    lines = [
+        "# Benchmark Regression Check",
+        "",
+        f"- **Baseline:** {describe(baseline)}",
+        f"- **Candidate:** {describe(candidate)}",
+        f"- **Regressions:** {len(regressions)} of {len(comparisons)} compared values",
+        "",
+        "| Service | Level | Metric | Baseline | Candidate | Change | Tolerance | Status |",
+        "|---|---|---|---|---|---|---|---|",
+    ]
+    for c in comparisons:
+        level = int(c["level"]) if float(c["level"]).is_integer() else c["level"]
+        lines.append(
+            f"| {c['service']} | {level} | {c['metric']} | {c['baseline']:.2f} | {c['candidate']:.2f} | "
+            f"{c['change_pct']:+.1f}% | {c['tolerance_pct']:g}% | {'**REGRESSION**' if c['regression'] else 'ok'} |"
+        )
+    if json.loads(baseline["config"]) != json.loads(candidate["config"]):
+        lines += ["", f"*Configs differ:* baseline `{baseline['config']}`, candidate `{candidate['config']}`"]
+    return "\n".join(lines)
+
+
+def parse_assignments(items: Optional[List[str]]) -> Dict[str, object]:
+    """`key=value` CLI items; numbers are stored as numbers."""
+    parsed: Dict[str, object] = {}
+    for item in items or []:
+        key, sep, value = item.partition("=")
+        if not sep:
+            raise SystemExit(f"Expected key=value, got {item!r}")
+        parsed[key] = float(value) if _is_number(value) else value
+    return parsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", type=Path, default=DEFAULT_DB)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest_generic = commands.add_parser("ingest-generic", help="Record loadgen stats_<svc>_<level>.json files")
+    ingest_generic.add_argument("tmp_dir", type=Path)
+    ingest_generic.add_argument("--levels", default=None, help="Space-separated levels to include (default: all)")
+    ingest_generic.add_argument("--label", default=None)
+    ingest_generic.add_argument("--config", nargs="*", help="key=value settings of the run")
+
+    listing = commands.add_parser("list", help="Show recorded runs")
+    listing.add_argument("--source", default=None)
+    listing.add_argument("--limit", type=int, default=20)
+
+    compare = commands.add_parser("compare", help="Flag regressions of a run against a baseline")
+    compare.add_argument("--baseline", required=True, help="Run id or `latest` (the run before the candidate)")
+    compare.add_argument("--candidate", default="latest", help="Run id or `latest` (of the baseline's source)")
+    compare.add_argument("--tolerance", type=float, default=5.0, help="Allowed change in percent")
+    compare.add_argument("--metric-tolerance", nargs="*", help="Per-metric overrides, e.g. p99=15")
+    compare.add_argument("--output", type=Path, default=None, help="Also write the Markdown report here")
+    args = parser.parse_args()
+
+    if args.command == "ingest-generic":
+        rows = generic_rows(args.tmp_dir, args.levels.split() if args.levels else None)
+        if not rows:
+            print(f"No stats files found in {args.tmp_dir} to record.")
+            return
+        run_id = record_run("generic", rows, parse_assignments(args.config), args.label, args.db)
+        print(f"Recorded generic run {run_id} ({len(rows)} result rows) in {args.db}")
+        return
+
+    conn = connect(args.db)
+    if args.command == "list":
+        query, params = "SELECT * FROM runs", []
+        if args.source:
+            query, params = query + " WHERE source = ?", [args.source]
+        runs = conn.execute(query + " ORDER BY id DESC LIMIT ?", params + [args.limit]).fetchall()
+        for run in runs:
+            commit = (run["git_commit"] or "unknown")[:10] + ("*" if run["git_dirty"] else "")
+            print(f"{run['id']:>5}  {run['created_at']}  {run['source']:<14} {commit:<11} "
+                  f"{run['label'] or ''}  {run['config']}")
+        return
+
+    baseline, candidate = resolve_comparison(conn, args.baseline, args.candidate)
+    comparisons = compare_values(
+        run_values(conn, baseline["id"]),
+        run_values(conn, candidate["id"]),
+        args.tolerance,
+        {key: float(value) for key, value in parse_assignments(args.metric_tolerance).items()},
+    )
+    report = format_comparison(baseline, candidate, comparisons)
+    print(report)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(report)
+    if not comparisons:
+        print("\nNothing to compare: the runs share no service/level/metric values.")
+    sys.exit(1 if any(c["regression"] for c in comparisons) else 0)
+
+
+if __name__ == "__main__":
+    main()
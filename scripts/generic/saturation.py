@@ -0,0 +1,368 @@
+"""Saturation point, latency knee and SLO capacity of the generic load test.
+
+Reads the `stats_<svc>_<level>.json` files written by `loadgen.py` and, per
+service:
+
+* fits throughput vs offered concurrency with the Universal Scalability
+  Law, X(N) = lambda*N / (1 + sigma*(N-1) + kappa*N*(N-1)), which gives the
+  concurrency where throughput peaks (contention `sigma`, coherency
+  `kappa`). In rate mode (open loop) the saturation point is the highest
+  offered rate the service still kept up with instead.
+* locates the knee of the latency vs throughput curve as the maximum of
+  Kleinrock's power, throughput / mean latency: beyond it, extra load buys
+  less throughput than it costs in latency. Both the fitted and the
+  measured knee are reported.
+* reports the maximum sustainable RPS under the p95/p99 SLO, measured and
+  linearly interpolated up to where the latency crosses the SLO.
+
+`suggest` prints the levels worth measuring next (between the last level
+inside the SLO and the first outside it, and around the knee), so a
+follow-up run refines the grid instead of relying on a fixed one:
+
+    make loadtest-refine SLO_P95_MS=800
+
+Results go to `reports/generic/saturation.{json,md}` (plus a chart when
+matplotlib is available).
+
+Usage:
+    python scripts/generic/saturation.py analyze --slo-p95 1000 --slo-p99 2000
+    python scripts/generic/saturation.py suggest --slo-p95 1000 --count 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import itertools
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+PROJECT_DIR = Path(__file__).resolve().parents[2]
+TMP_DIR = PROJECT_DIR / "tmp" / "generic"
+REPORT_DIR = PROJECT_DIR / "reports" / "generic"
+SERVICES = {"bentoml": "BentoML", "fastapi": "FastAPI", "rayserve": "Ray Serve"}
+# Below this share of the offered rate, an open-loop level counts as saturated
+KEPT_UP_RATIO = 0.95
+
+
+def load_points(tmp_dir: Path, mode: str = "concurrency") -> Dict[str, List[dict]]:
+    """Measured levels per service, by ascending level, for one load mode."""
+    points: Dict[str, List[dict]] = {}
+    for path in sorted(Path(tmp_dir).glob("stats_*_*.json")):
+        service, _, level = path.stem[len("stats_"):].rpartition("_")
+        try:
+            data = json.loads(path.read_text())
+            point = {
+                "level": float(level),
+                **{key: float(data[key]) for key in ("rps", "avg", "p95", "p99", "success_rate")},
+            }
+        except (OSError, ValueError, KeyError):
+            continue
+        # Stats from before loadgen.py have no mode and were closed loop
+        if data.get("mode", "concurrency") == mode:
+            points.setdefault(service, []).append(point)
+    return {service: sorted(p, key=lambda p: p["level"]) for service, p in points.items()}
+
+
+def _solve3(a: List[List[float]], b: List[float]) -> Optional[List[float]]:
+    """Solve a 3x3 linear system by Gaussian elimination with partial pivoting."""
+    m = [row[:] + [v] for row, v in zip(a, b)]
+    for col in range(3):
+        pivot = max(range(col, 3), key=lambda r: abs(m[r][col]))
+        if abs(m[pivot][col]) < 1e-12:
+            return None
+        m[col], m[pivot] = m[pivot], m[col]
+        for row in range(col + 1, 3):
+            factor = m[row][col] / m[col][col]
+            m[row] = [x - factor * y for x, y in zip(m[row], m[col])]
+    solution = [0.0, 0.0, 0.0]
+    for row in (2, 1, 0):
+        solution[row] = (m[row][3] - sum(m[row][c] * solution[c] for c in range(row + 1, 3))) / m[row][row]
+    return solution
+
+
+def usl_throughput(model: dict, n: float) -> float:
+    return model["lambda"] * n / (1 + model["sigma"] * (n - 1) + model["kappa"] * n * (n - 1))
+
+
+def fit_usl(points: Sequence[dict]) -> Optional[dict]:
+    """Least-squares USL fit of rps vs concurrency, or None with too few points.
+
+    N/X(N) is quadratic in N, (1 - sigma + (sigma - kappa)*N + kappa*N^2) /
+    lambda, so an ordinary quadratic fit of N/X gives all three parameters.
+    """
+    usable = [p for p in points if p["rps"] > 0 and p["level"] > 0]
+    if len({p["level"] for p in usable}) < 3:
+        return None
+    sums = [sum(p["level"] ** k for p in usable) for k in range(5)]
+    targets = [sum(p["level"] ** k * p["level"] / p["rps"] for p in usable) for k in range(3)]
+    coefficients = _solve3([[sums[i + j] for j in range(3)] for i in range(3)], targets)
+    if coefficients is None:
+        return None
+    a, b, c = coefficients
+    if a + b + c <= 0:
+        return None
+    lam = 1 / (a + b + c)
+    kappa = max(c * lam, 0.0)
+    sigma = min(max(b * lam + kappa, 0.0), 1.0)
+    model = {"lambda": lam, "sigma": sigma, "kappa": kappa}
+
+    measured = [p["rps"] for p in usable]
+    mean = sum(measured) / len(measured)
+    residual = sum((p["rps"] - usl_throughput(model, p["level"])) ** 2 for p in usable)
+    total = sum((x - mean) ** 2 for x in measured)
+    model["r2"] = 1 - residual / total if total else 1.0
+
+    # Throughput peaks at sqrt((1 - sigma) / kappa); without coherency cost it only flattens out
+    if kappa > 0:
+        model["peak_level"] = ((1 - sigma) / kappa) ** 0.5
+        model["peak_rps"] = usl_throughput(model, model["peak_level"])
+    else:
+        model["peak_level"] = None
+        model["peak_rps"] = lam / sigma if sigma else None
+    return model
+
+
+def fitted_knee(model: dict, max_level: float) -> dict:
+    """Concurrency maximizing X(N)^2 / N, the power X/R with R = N/X (Little's law)."""
+    limit = max(max_level * 2, (model["peak_level"] or 0) * 1.5, 2)
+    best_level, best_power = 1.0, 0.0
+    steps = 2000
+    for i in range(steps + 1):
+        n = 1 + (limit - 1) * i / steps
+        power = usl_throughput(model, n) ** 2 / n
+        if power > best_power:
+            best_level, best_power = n, power
+    return {"level": best_level, "rps": usl_throughput(model, best_level)}
+
+
+def measured_knee(points: Sequence[dict]) -> Optional[dict]:
+    """Measured level with the highest throughput per ms of mean latency."""
+    usable = [p for p in points if p["rps"] > 0 and p["avg"] > 0]
+    if not usable:
+        return None
+    best = max(usable, key=lambda p: p["rps"] / p["avg"])
+    return {"level": best["level"], "rps": best["rps"], "avg": best["avg"]}
+
+
+def within_slo(point: dict, slo_p95: Optional[float], slo_p99: Optional[float], min_success_rate: float) -> bool:
+    return (
+        (slo_p95 is None or point["p95"] <= slo_p95)
+        and (slo_p99 is None or point["p99"] <= slo_p99)
+        and point["success_rate"] >= min_success_rate
+    )
+
+
+def slo_capacity(
+    points: Sequence[dict], slo_p95: Optional[float], slo_p99: Optional[float], min_success_rate: float = 99.0
+) -> dict:
+    """Highest throughput inside the SLO, measured and interpolated to the crossing."""
+    passing = [p for p in points if within_slo(p, slo_p95, slo_p99, min_success_rate)]
+    if not passing:
+        first = points[0]["level"] if points else None
+        return {"max_rps": 0.0, "level": None, "interpolated_rps": 0.0, "first_violation": first}
+    best = max(passing, key=lambda p: p["rps"])
+    result = {"max_rps": best["rps"], "level": best["level"], "interpolated_rps": best["rps"], "first_violation": None}
+
+    last_pass = max(passing, key=lambda p: p["level"])
+    above = [p for p in points if p["level"] > last_pass["level"]]
+    if not above:
+        return result
+    fail = above[0]
+    result["first_violation"] = fail["level"]
+    # Fraction of the way to `fail` where the tightest latency SLO is crossed
+    fractions = []
+    for key, slo in (("p95", slo_p95), ("p99", slo_p99)):
+        if slo is not None and fail[key] > slo and fail[key] > last_pass[key]:
+            fractions.append((slo - last_pass[key]) / (fail[key] - last_pass[key]))
+    if fractions and fail["success_rate"] >= min_success_rate:
+        fraction = min(max(min(fractions), 0.0), 1.0)
+        interpolated = last_pass["rps"] + fraction * (fail["rps"] - last_pass["rps"])
+        result["interpolated_rps"] = max(best["rps"], interpolated)
+    return result
+
+
+def rate_saturation(points: Sequence[dict]) -> Optional[dict]:
+    """Open loop: the highest offered rate still served at `KEPT_UP_RATIO` or better."""
+    kept_up = [p for p in points if p["rps"] >= KEPT_UP_RATIO * p["level"]]
+    if not kept_up:
+        return None
+    best = max(kept_up, key=lambda p: p["level"])
+    return {"level": best["level"], "rps": best["rps"]}
+
+
+def analyze(
+    points: Dict[str, List[dict]],
+    mode: str = "concurrency",
+    slo_p95: Optional[float] = None,
+    slo_p99: Optional[float] = None,
+    min_success_rate: float = 99.0,
+) -> Dict[str, dict]:
+    results = {}
+    for service, service_points in points.items():
+        result: Dict[str, object] = {
+            "points": service_points,
+            "slo": slo_capacity(service_points, slo_p95, slo_p99, min_success_rate),
+            "measured_knee": measured_knee(service_points),
+            "usl": None,
+            "fitted_knee": None,
+            "saturation": None,
+        }
+        if mode == "concurrency":
+            model = fit_usl(service_points)
+            if model is not None:
+                result["usl"] = model
+                result["fitted_knee"] = fitted_knee(model, max(p["level"] for p in service_points))
+                if model["peak_level"] is not None:
+                    result["saturation"] = {"level": model["peak_level"], "rps": model["peak_rps"]}
+        else:
+            result["saturation"] = rate_saturation(service_points)
+        results[service] = result
+    return results
+
+
+def suggest_levels(result: dict, count: int = 4) -> List[int]:
+    """New levels to measure, alternating across the SLO crossing and around the knee."""
+    measured = {int(round(p["level"])) for p in result["points"]}
+
+    crossing: List[int] = []
+    slo = result["slo"]
+    low = slo["level"] if slo["level"] is not None else 0
+    high = slo["first_violation"]
+    if high is not None and high - low > 1:
+        crossing = [int(round(low + (high - low) * i / (count + 1))) for i in range(1, count + 1)]
+        # Closest to the middle of the bracket first
+        crossing.sort(key=lambda level: abs(level - (low + high) / 2))
+
+    around_knee: List[int] = []
+    knee = result["fitted_knee"] or result["measured_knee"]
+    if knee is not None:
+        around_knee = [int(round(knee["level"] * factor)) for factor in (1.0, 0.75, 1.25, 0.5, 1.5)]
+
+    levels: List[int] = []
+    for pair in itertools.zip_longest(crossing, around_knee):
+        for level in pair:
+            if level is not None and level >= 1 and level not in measured and level not in levels:
+                levels.append(level)
+    return sorted(levels[:count])
+
+
+def _fmt(value: Optional[float], digits: int = 2) -> str:
+    return "n/a" if value is None else f"{value:.{digits}f}"
+
+
+def _fmt_point(point: Optional[dict]) -> str:
+    return "n/a" if point is None else f"{point['level']:.1f} ({point['rps']:.1f} rps)"
+
+
+def write_report(results: Dict[str, dict], args: argparse.Namespace) -> None:
+    REPORT_DIR.mkdir(parents=True, exist_ok=True)
+    slo = {"p95_ms": args.slo_p95, "p99_ms": args.slo_p99, "min_success_rate": args.min_success_rate}
+    with open(REPORT_DIR / "saturation.json", "w") as f:
+        json.dump({"mode": args.mode, "slo": slo, "services": results}, f, indent=2)
+
+    level_name = "Concurrency" if args.mode == "concurrency" else "Rate (req/s)"
+    lines = [
+        "# Saturation and Latency Knee",
+        "",
+        f"**Run Date:** {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+        f"- **Load mode:** {args.mode}",
+        f"- **SLO:** p95 <= {_fmt(args.slo_p95, 0)} ms, p99 <= {_fmt(args.slo_p99, 0)} ms, "
+        f">= {args.min_success_rate:g}% success",
+        "",
+        f"| Service | Max RPS in SLO | at {level_name} | Interpolated RPS | Knee (fitted) | Knee (measured) "
+        f"| Saturation | Next levels |",
+        "|---|---|---|---|---|---|---|---|",
+    ]
+    for service, r in results.items():
+        fitted, measured, saturation = r["fitted_knee"], r["measured_knee"], r["saturation"]
+        lines.append(
+            f"| {SERVICES.get(service, service)} | {r['slo']['max_rps']:.2f} | {_fmt(r['slo']['level'], 0)} | "
+            f"{r['slo']['interpolated_rps']:.2f} | "
+            f"{_fmt_point(fitted)} | {_fmt_point(measured)} | {_fmt_point(saturation)} | "
+            f"{' '.join(map(str, suggest_levels(r, args.count))) or '-'} |"
+        )
+    fits = [(s, r["usl"]) for s, r in results.items() if r["usl"]]
+    if fits:
+        lines += ["", "## Universal Scalability Law fit", "", "| Service | lambda (rps/client) | sigma | kappa | R^2 |",
+                  "|---|---|---|---|---|"]
+        for service, m in fits:
+            lines.append(f"| {SERVICES.get(service, service)} | {m['lambda']:.3f} | {m['sigma']:.4f} | "
+                         f"{m['kappa']:.5f} | {m['r2']:.3f} |")
+    lines += ["", "*Generated by scripts/generic/saturation.py*"]
+    with open(REPORT_DIR / "saturation.md", "w") as f:
+        f.write("\n".join(lines))
+
+    try:
+        import matplotlib.pyplot as plt
+    except ImportError:
+        return
+    fig, (ax_rps, ax_latency) = plt.subplots(1, 2, figsize=(14, 6))
+    for service, r in results.items():
+        points = r["points"]
+        name = SERVICES.get(service, service)
+        line = ax_rps.plot([p["level"] for p in points], [p["rps"] for p in points], "o", label=name)[0]
+        if r["usl"]:
+            top = max(p["level"] for p in points) * 1.5
+            grid = [1 + (top - 1) * i / 100 for i in range(101)]
+            ax_rps.plot(grid, [usl_throughput(r["usl"], n) for n in grid], "--", color=line.get_color())
+        ax_latency.plot([p["rps"] for p in points], [p["p95"] for p in points], marker="o", label=f"{name} p95")
+    if args.slo_p95 is not None:
+        ax_latency.axhline(args.slo_p95, color="grey", linestyle=":", label="p95 SLO")
+    ax_rps.set_xlabel(level_name)
+    ax_rps.set_ylabel("Requests per Second")
+    ax_rps.set_title("Throughput vs offered load (dashed: USL fit)")
+    ax_latency.set_xlabel("Requests per Second")
+    ax_latency.set_ylabel("p95 latency (ms)")
+    ax_latency.set_title("Latency vs throughput")
+    for ax in (ax_rps, ax_latency):
+        ax.grid(linestyle="--", alpha=0.7)
+        ax.legend()
+    fig.savefig(REPORT_DIR / "saturation.png")
+
+
+def _optional_float(value: str) -> Optional[float]:
+    return float(value) if value else None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", nargs="?", choices=("analyze", "suggest"), default="analyze")
+    parser.add_argument("--tmp-dir", type=Path, default=TMP_DIR, help="Directory with stats_<svc>_<level>.json")
+    parser.add_argument("--mode", choices=("concurrency", "rate"), default=os.getenv("LOAD_MODE") or "concurrency")
+    parser.add_argument("--slo-p95", type=_optional_float, default=_optional_float(os.getenv("SLO_P95_MS", "1000")),
+                        help="p95 latency SLO in ms (empty: none)")
+    parser.add_argument("--slo-p99", type=_optional_float, default=_optional_float(os.getenv("SLO_P99_MS", "2000")),
+                        help="p99 latency SLO in ms (empty: none)")
+    parser.add_argument("--min-success-rate", type=float, default=99.0)
+    parser.add_argument("--services", nargs="+", default=None)
+    parser.add_argument("--count", type=int, default=4, help="Levels to suggest per service")
+    args = parser.parse_args()
+
+    points = load_points(args.tmp_dir, args.mode)
+    if args.services:
+        points = {s: p for s, p in points.items() if s in args.services}
+    results = analyze(points, args.mode, args.slo_p95, args.slo_p99, args.min_success_rate)
+
+    if args.command == "suggest":
+        # One grid for the next run: the union of every service's suggestions
+        levels = sorted({level for r in results.values() for level in suggest_levels(r, args.count)})
+        print(" ".join(map(str, levels)))
+        return
+
+    if not results:
+        print(f"No {args.mode} stats found in {args.tmp_dir}.")
+        return
+    write_report(results, args)
+    for service, r in results.items():
+        knee = r["fitted_knee"] or r["measured_knee"]
+        print(f"  {SERVICES.get(service, service)}: {r['slo']['max_rps']:.2f} rps within SLO"
+              f" (interpolated {r['slo']['interpolated_rps']:.2f}), knee at level "
+              f"{_fmt(knee and knee['level'], 1)}")
+    print(f"📄 Saturation report saved to {REPORT_DIR / 'saturation.md'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Multi-worker FastAPI: one model per worker vs a shared inference process.
+
+Starts `fastapi/serve.py` in three modes and drives each with closed-loop
+`/predict` load at several concurrency levels:
+
+* `single`: one process that decodes, batches and infers (`WEB_CONCURRENCY=1`)
+* `prefork`: `--workers` forked workers, each with its own model and batcher
+* `shared`: `--workers` forked workers that only decode, feeding one
+  inference process through shared memory (`SHARED_INFERENCE=1`), so batches
+  form across all workers
+
+Besides throughput and latency, the mean inference batch size over each level
+is read from `/metrics` (`mobilenet_batch_size`), which shows how well each
+mode fills its batches.
+
+Results go to `reports/shared/shared_inference.json` (plus a Markdown table).
+
+Usage:
+    python scripts/generic/shared_inference_compare.py --workers 4 --concurrency 1 8 32 --duration 15
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Dict, Sequence, Tuple
+
+from batching_sweep import PROJECT_DIR, drive_load, generate_image, stop_service
+from worker_memory import wait_warm
+
+REPORT_DIR = PROJECT_DIR / "reports" / "shared"
+LOG_DIR = PROJECT_DIR / "tmp" / "shared"
+MODES = ("single", "prefork", "shared")
+
+
+def mode_env(mode: str, workers: int) -> Dict[str, str]:
+    if mode == "single":
+        return {"WEB_CONCURRENCY": "1", "SHARED_INFERENCE": "0"}
+    return {"WEB_CONCURRENCY": str(workers), "SHARED_INFERENCE": "1" if mode == "shared" else "0"}
+
+
+def models_loaded(mode: str, workers: int) -> int:
+    """How many processes load (and warm up) a model in `mode`."""
+    return workers if mode == "prefork" else 1
+
+
+def batch_size_totals(metrics_text: str) -> Tuple[float, float]:
+    """Sum and count of the `mobilenet_batch_size` histogram in a Prometheus text exposition."""
+    totals = {"sum": 0.0, "count": 0.0}
+    for line in metrics_text.splitlines():
+        for key in totals:
+            if line.startswith(f"mobilenet_batch_size_{key}{{"):
+                totals[key] += float(line.rsplit(" ", 1)[1])
+    return totals["sum"], totals["count"]
+
+
+def measure(mode: str, model: Path, workers: int, port: int, levels: Sequence[int], duration_s: float,
+            image: bytes, startup_timeout_s: float) -> Dict[str, Any]:
+    import requests
+
+    env = dict(
+        os.environ,
+        PYTHONPATH=str(PROJECT_DIR),
+        MODEL_PATH=str(model),
+        LABELS_PATH=os.getenv("LABELS_PATH", str(PROJECT_DIR / "model" / "imagenet_labels.txt")),
+        TF_CPP_MIN_LOG_LEVEL="2",
+        PORT=str(port),
+        **mode_env(mode, workers),
+    )
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
+    log_path = LOG_DIR / f"{mode}_{model.stem}_{workers}.log"
+    base_url = f"http://localhost:{port}"
+    points = []
+    with open(log_path, "w") as log:
+        process = subprocess.Popen(
+            [sys.executable, "fastapi/serve.py"], cwd=PROJECT_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+        try:
+            if not wait_warm(log_path, process, models_loaded(mode, workers), startup_timeout_s):
+                raise RuntimeError(f"{mode} did not finish its warmup, see {log_path}")
+            # Let every worker's connection pool and decode path warm up too
+            drive_load(base_url + "/predict", "file", image, max(levels), 2)
+            for concurrency in levels:
+                before = batch_size_totals(requests.get(base_url + "/metrics", timeout=10).text)
+                stats = drive_load(base_url + "/predict", "file", image, concurrency, duration_s)
+                after = batch_size_totals(requests.get(base_url + "/metrics", timeout=10).text)
+                batches = after[1] - before[1]
+                stats["mean_batch_size"] = (after[0] - before[0]) / batches if batches else 0.0
+                points.append(stats)
+                print(
+                    f"  {mode:<8} c={concurrency:<4} rps={stats['rps']:8.2f} p50={stats['p50']:8.2f}ms "
+                    f"p99={stats['p99']:8.2f}ms batch={stats['mean_batch_size']:5.2f} ok={stats['success_rate']:.1f}%"
+                )
+        finally:
+            stop_service(process)
+    return {"mode": mode, "model": model.name, "workers": 1 if mode == "single" else workers, "points": points}
+
+
+def write_report(result: Dict[str, Any], output: Path) -> None:
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2))
+    meta = result["meta"]
+    lines = [
+        "# 🔀 FastAPI Shared Inference Process",
+        "",
+        f"**Run Date:** {meta['run_date']}",
+        f"- **Commit:** {meta.get('git_commit') or 'unknown'}",
+        f"- **Model:** {meta['model']}",
+        f"- **Duration per level:** {meta['duration_s']:g}s",
+        "",
+        "| Mode | Workers | Concurrency | RPS | p50 (ms) | p95 (ms) | p99 (ms) | Mean batch | Success % |",
+        "|------|--------:|------------:|----:|---------:|---------:|---------:|-----------:|----------:|",
+    ]
+    best_rps = {}
+    for run in result["runs"]:
+        for p in run["points"]:
+            best_rps[p["concurrency"]] = max(best_rps.get(p["concurrency"], 0.0), p["rps"])
+    for run in result["runs"]:
+        for p in run["points"]:
+            star = " ⭐" if p["rps"] == best_rps[p["concurrency"]] else ""
+            lines.append(
+                f"| {run['mode']} | {run['workers']} | {p['concurrency']} | {p['rps']:.2f}{star} | {p['p50']:.2f} | "
+                f"{p['p95']:.2f} | {p['p99']:.2f} | {p['mean_batch_size']:.2f} | {p['success_rate']:.1f} |"
+            )
+    lines += ["", "⭐ highest throughput at that concurrency.", "",
+              "*Generated by scripts/generic/shared_inference_compare.py*"]
+    output.with_suffix(".md").write_text("\n".join(lines) + "\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--model", type=Path, default=PROJECT_DIR / "model" / "mobilenet_v2.keras")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per concurrency level")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--startup-timeout", type=float, default=300.0)
+    parser.add_argument("--output", type=Path, default=REPORT_DIR / "shared_inference.json")
+    args = parser.parse_args()
+
+    from results_store import environment, git_info
+
+    image = generate_image()
+    runs = []
+    for mode in args.modes:
+        print(f"\n== {mode} ==")
+        runs.append(measure(mode, args.model.resolve(), args.workers, args.port, args.concurrency, args.duration,
+                            image, args.startup_timeout))
+
+    result = {
+        "meta": {
+            "run_date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "model": args.model.name,
+            "workers": args.workers,
+            "duration_s": args.duration,
+            **git_info(),
+            "environment": environment(),
+        },
+        "runs": runs,
+    }
+    write_report(result, args.output)
+    print(f"Results written to {args.output} and {args.output.with_suffix('.md')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""Inference throughput across CPU thread settings.
+
+Runs `InferenceEngine.predict` of `--model` in a fresh process per setting,
+because TensorFlow and OpenMP size their pools once, when they load. A
+setting is a CPU count and an intra-/inter-op thread count pair:
+
+* `--cpus`: CPUs the worker may run on, applied with `sched_setaffinity`
+  (a stand-in for a pod's CPU limit; `all` keeps the current mask)
+* `--intra` / `--inter`: exported as `TF_NUM_INTRAOP_THREADS` /
+  `TF_NUM_INTEROP_THREADS` (and `OMP_NUM_THREADS`), or `auto` for what
+  `common.runtime.configure_threads` derives from the CPUs
+
+Every setting is measured at each `--batch-sizes` value with each
+`--concurrency` number of threads calling `predict` at once, the way
+concurrent requests share an engine in the services. Besides images/s and
+the median call latency, the worker reports CPU utilization and
+involuntary context switches per second: a thread pool larger than its CPUs
+shows up as more switches, and, under a CFS quota, throttling, without more
+images/s.
+
+Results go to `reports/threads/thread_sweep.json` (plus a Markdown table
+marking the fastest setting per CPU count, batch size and concurrency).
+
+Usage:
+    python scripts/generic/thread_sweep.py --cpus 1 2 all --intra auto 1 2 4 --inter 1 2
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+PROJECT_DIR = Path(__file__).resolve().parents[2]
+REPORT_DIR = PROJECT_DIR / "reports" / "threads"
+DEFAULT_MODEL = PROJECT_DIR / "model" / "mobilenet_v2.keras"
+sys.path.insert(0, str(PROJECT_DIR))
+
+
+def _cgroup_throttled() -> Optional[int]:
+    """Throttled CFS periods of this process's cgroup so far, if available."""
+    for path in ("/sys/fs/cgroup/cpu.stat", "/sys/fs/cgroup/cpu/cpu.stat", "/sys/fs/cgroup/cpu,cpuacct/cpu.stat"):
+        try:
+            with open(path) as f:
+                for line in f:
+                    key, _, value = line.partition(" ")
+                    if key == "nr_throttled":
+                        return int(value)
+        except OSError:
+            continue
+    return None
+
+
+def measure(engine: Any, batch: Any, concurrency: int, seconds: float) -> Dict[str, float]:
+    """Call `engine.predict(batch)` from `concurrency` threads for `seconds`."""
+    latencies: List[float] = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def caller() -> None:
+        own: List[float] = []
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            engine.predict(batch)
+            own.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(own)
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    throttled = _cgroup_throttled()
+    started = time.perf_counter()
+    threads = [threading.Thread(target=caller) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    after = resource.getrusage(resource.RUSAGE_SELF)
+    throttled_after = _cgroup_throttled()
+
+    cpu_s = (after.ru_utime - usage.ru_utime) + (after.ru_stime - usage.ru_stime)
+    return {
+        "images_per_s": len(latencies) * len(batch) / elapsed,
+        "calls": len(latencies),
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+        "cpu_utilization": cpu_s / elapsed,
+        "involuntary_switches_per_s": (after.ru_nivcsw - usage.ru_nivcsw) / elapsed,
+        "throttled_periods": None if throttled is None else throttled_after - throttled,
+    }
+
+
+def worker(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Measure one setting; runs in its own process before TensorFlow loads."""
+    if config["cpus"] != "all":
+        allowed = sorted(os.sched_getaffinity(0))[: int(config["cpus"])]
+        os.sched_setaffinity(0, allowed)
+    if config["intra"] != "auto":
+        for name in ("TF_NUM_INTRAOP_THREADS", "OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+            os.environ[name] = str(config["intra"])
+    if config["inter"] != "auto":
+        os.environ["TF_NUM_INTEROP_THREADS"] = str(config["inter"])
+
+    import numpy as np
+
+    from common.inference import load_engine, power_of_two_buckets
+    from common.preprocessing import preprocess_batch
+    from common.runtime import configure_threads
+
+    settings = configure_threads()
+    engine = load_engine(
+        config["model"], buckets=power_of_two_buckets(max(config["batch_sizes"])), num_threads=settings.intra_op
+    )
+    rng = np.random.default_rng(0)
+    rows = []
+    for batch_size in config["batch_sizes"]:
+        frames = list(rng.integers(0, 256, size=(batch_size, 224, 224, 3), dtype=np.uint8))
+        # A copy: preprocess_batch reuses its buffer on this thread
+        batch = preprocess_batch(frames).copy()
+        for _ in range(config["warmup"]):
+            engine.predict(batch)
+        for concurrency in config["concurrency"]:
+            stats = measure(engine, batch, concurrency, config["seconds"])
+            rows.append({"batch_size": batch_size, "concurrency": concurrency, **stats})
+    return {
+        "cpus": settings.cpus,
+        "intra_op": settings.intra_op,
+        "inter_op": settings.inter_op,
+        "backend": engine.backend,
+        "rows": rows,
+    }
+
+
+def run_setting(config: Dict[str, Any]) -> Dict[str, Any]:
+    env = {**os.environ, "TF_CPP_MIN_LOG_LEVEL": "2"}
+    # Explicit overrides of the parent would defeat `auto`
+    for name in ("TF_NUM_INTRAOP_THREADS", "TF_NUM_INTEROP_THREADS", "OMP_NUM_THREADS", "CPU_LIMIT"):
+        env.pop(name, None)
+    completed = subprocess.run(
+        [sys.executable, __file__, "--worker", json.dumps(config)],
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Worker for {config} failed:\n{completed.stderr[-2000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def best_settings(results: List[Dict[str, Any]]) -> set:
+    """(setting index, batch size, concurrency) of the fastest setting per CPU count, batch size and concurrency."""
+    best: Dict[tuple, tuple] = {}
+    for index, result in enumerate(results):
+        for row in result["rows"]:
+            key = (result["requested_cpus"], row["batch_size"], row["concurrency"])
+            if key not in best or row["images_per_s"] > best[key][0]:
+                best[key] = (row["images_per_s"], index)
+    return {(index, key[1], key[2]) for key, (_, index) in best.items()}
+
+
+def write_report(result: Dict[str, Any], output: Path) -> None:
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2))
+    meta = result["meta"]
+    env = meta["environment"]
+    lines = [
+        "# 🧵 Inference Throughput by Thread Setting",
+        "",
+        f"**Run Date:** {meta['run_date']}",
+        f"- **Commit:** {meta.get('git_commit') or 'unknown'}",
+        f"- **Machine:** {env['cpu_count']} CPUs, {env['platform']}",
+        f"- **Model:** `{Path(meta['model']).name}`, {meta['seconds']:g}s per measurement",
+        "",
+        "⭐ marks the fastest setting for each CPU count, batch size and concurrency.",
+        "",
+        "| CPUs | Intra | Inter | Batch | Concurrency | Images/s | p50 (ms) | CPU util | Inv. switches/s | Throttled |",
+        "|-----:|------:|------:|------:|------------:|---------:|---------:|---------:|----------------:|----------:|",
+    ]
+    best = best_settings(result["results"])
+    for index, setting in enumerate(result["results"]):
+        intra = f"{setting['intra_op']}" + (" (auto)" if setting["requested_intra"] == "auto" else "")
+        inter = f"{setting['inter_op']}" + (" (auto)" if setting["requested_inter"] == "auto" else "")
+        for row in setting["rows"]:
+            star = " ⭐" if (index, row["batch_size"], row["concurrency"]) in best else ""
+            throttled = "n/a" if row["throttled_periods"] is None else row["throttled_periods"]
+            lines.append(
+                f"| {setting['cpus']:g} | {intra} | {inter} | {row['batch_size']} | {row['concurrency']} | "
+                f"{row['images_per_s']:.1f}{star} | {row['p50_ms']:.1f} | {row['cpu_utilization']:.2f} | "
+                f"{row['involuntary_switches_per_s']:.0f} | {throttled} |"
+            )
+    output.with_suffix(".md").write_text("\n".join(lines) + "\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cpus", nargs="+", default=["all"], help="CPU counts to pin the worker to, or 'all'")
+    parser.add_argument("--intra", nargs="+", default=["auto", "1", "2", "4"], help="Intra-op threads, or 'auto'")
+    parser.add_argument("--inter", nargs="+", default=["auto"], help="Inter-op threads, or 'auto'")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 8])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 2])
+    parser.add_argument("--model", type=Path, default=Path(os.getenv("MODEL_PATH", DEFAULT_MODEL)))
+    parser.add_argument("--seconds", type=float, default=3.0, help="Measurement time per batch size and concurrency")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--output", type=Path, default=REPORT_DIR / "thread_sweep.json")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(worker(json.loads(args.worker))))
+        return
+
+    from results_store import environment, git_info
+
+    results = []
+    for cpus in args.cpus:
+        for intra in args.intra:
+            for inter in args.inter:
+                config = {
+                    "cpus": cpus,
+                    "intra": intra,
+                    "inter": inter,
+                    "model": str(args.model),
+                    "batch_sizes": args.batch_sizes,
+                    "concurrency": args.concurrency,
+                    "seconds": args.seconds,
+                    "warmup": args.warmup,
+                }
+                setting = run_setting(config)
+                setting.update(requested_cpus=cpus, requested_intra=intra, requested_inter=inter)
+                results.append(setting)
+                for row in setting["rows"]:
+                    print(f"cpus={setting['cpus']:g} intra={setting['intra_op']} inter={setting['inter_op']} "
+                          f"batch={row['batch_size']} concurrency={row['concurrency']}: "
+                          f"{row['images_per_s']:.1f} images/s, p50 {row['p50_ms']:.1f} ms")
+
+    result = {
+        "meta": {
+            "run_date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "model": str(args.model),
+            "seconds": args.seconds,
+            **git_info(),
+            "environment": environment(),
+        },
+        "results": results,
+    }
+    write_report(result, args.output)
+    print(f"Results written to {args.output} and {args.output.with_suffix('.md')}")
+
+
+if __name__ == "__main__":
+    main()
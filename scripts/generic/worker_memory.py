@@ -0,0 +1,228 @@
+"""Resident memory of multi-worker FastAPI: per-process loading vs pre-fork sharing.
+
+Starts the FastAPI service with `--workers` worker processes in two modes:
+
+* `spawn`: `uvicorn main:app --workers N`, today's behaviour; every worker
+  is a fresh interpreter that imports TensorFlow and loads its own model
+* `prefork`: `fastapi/serve.py` with `WEB_CONCURRENCY=N`, which imports the
+  app and the framework once and forks the workers (copy-on-write); `.tflite`
+  weights are memory-mapped and shared through the page cache
+
+Once every worker has finished its warmup and served a few `/predict`
+calls, `/proc/<pid>/smaps_rollup` is read for every process of the service.
+RSS counts shared pages in full in each process; PSS divides them among the
+processes sharing them, so the PSS total is the service's real footprint
+against the pod's memory limit.
+
+Results go to `reports/memory/worker_memory.json` (plus a Markdown table).
+Linux only.
+
+Usage:
+    python scripts/generic/worker_memory.py --workers 4 --models model/mobilenet_v2.keras model/mobilenet_v2.tflite
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from batching_sweep import PROJECT_DIR, generate_image, stop_service
+
+REPORT_DIR = PROJECT_DIR / "reports" / "memory"
+LOG_DIR = PROJECT_DIR / "tmp" / "memory"
+MODES = ("spawn", "prefork")
+SMAPS_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty", "Swap")
+
+
+def smaps_rollup(pid: int) -> Dict[str, int]:
+    """Memory totals of `pid` in bytes."""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in SMAPS_FIELDS:
+                values[key.lower()] = int(rest.split()[0]) * 1024
+    return values
+
+
+def descendants(pid: int) -> List[int]:
+    """Every process below `pid`, breadth first."""
+    parents: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces; the parent pid follows its closing parenthesis
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        parents.setdefault(ppid, []).append(int(entry))
+    found, queue = [], [pid]
+    while queue:
+        children = parents.get(queue.pop(0), [])
+        found += children
+        queue += children
+    return found
+
+
+def command(mode: str, port: int, workers: int) -> List[str]:
+    if mode == "spawn":
+        return [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", "fastapi", "--port", str(port),
+                "--workers", str(workers)]
+    return [sys.executable, "fastapi/serve.py"]
+
+
+def wait_warm(log_path: Path, process: subprocess.Popen, workers: int, timeout_s: float) -> bool:
+    """Wait until every worker logged the end of its warmup."""
+    deadline = time.time() + timeout_s
+    while time.time() < deadline:
+        if process.poll() is not None:
+            return False
+        if log_path.read_text(errors="replace").count("Warmup finished") >= workers:
+            return True
+        time.sleep(1)
+    return False
+
+
+def measure(mode: str, model: Path, workers: int, port: int, requests_per_worker: int,
+            startup_timeout_s: float) -> Dict[str, Any]:
+    import requests
+
+    env = dict(
+        os.environ,
+        PYTHONPATH=str(PROJECT_DIR),
+        MODEL_PATH=str(model),
+        LABELS_PATH=os.getenv("LABELS_PATH", str(PROJECT_DIR / "model" / "imagenet_labels.txt")),
+        TF_CPP_MIN_LOG_LEVEL="2",
+        WEB_CONCURRENCY=str(workers),
+        PORT=str(port),
+    )
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
+    log_path = LOG_DIR / f"{mode}_{model.stem}_{workers}.log"
+    with open(log_path, "w") as log:
+        process = subprocess.Popen(
+            command(mode, port, workers), cwd=PROJECT_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+        try:
+            if not wait_warm(log_path, process, workers, startup_timeout_s):
+                raise RuntimeError(f"{mode} workers did not finish their warmup, see {log_path}")
+            files = {"file": ("image.jpg", generate_image(), "image/jpeg")}
+            with requests.Session() as session:
+                for _ in range(requests_per_worker * workers):
+                    session.post(f"http://localhost:{port}/predict", files=files, timeout=30).raise_for_status()
+            time.sleep(1)
+            processes = []
+            for pid in [process.pid, *descendants(process.pid)]:
+                try:
+                    memory = smaps_rollup(pid)
+                    with open(f"/proc/{pid}/cmdline") as f:
+                        cmdline = f.read().replace("\0", " ").strip()
+                except OSError:
+                    continue
+                processes.append({"pid": pid, "cmdline": cmdline, **memory})
+        finally:
+            stop_service(process)
+
+    # Workers are the processes that logged a warmup; the rest supervise
+    worker_pids = {int(line.split("[")[1].split("]")[0]) for line in log_path.read_text().splitlines()
+                   if "Started server process [" in line}
+    for entry in processes:
+        entry["role"] = "worker" if entry["pid"] in worker_pids else "supervisor"
+    worker_rows = [entry for entry in processes if entry["role"] == "worker"]
+    return {
+        "mode": mode,
+        "model": model.name,
+        "workers": workers,
+        "processes": processes,
+        "total_rss": sum(entry["rss"] for entry in processes),
+        "total_pss": sum(entry["pss"] for entry in processes),
+        "worker_rss_mean": sum(entry["rss"] for entry in worker_rows) / max(len(worker_rows), 1),
+        "worker_pss_mean": sum(entry["pss"] for entry in worker_rows) / max(len(worker_rows), 1),
+        "worker_private_mean": sum(entry["private_clean"] + entry["private_dirty"] for entry in worker_rows)
+        / max(len(worker_rows), 1),
+    }
+
+
+def _mib(value: float) -> str:
+    return f"{value / 2**20:,.0f}"
+
+
+def write_report(result: Dict[str, Any], output: Path) -> None:
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2))
+    meta = result["meta"]
+    lines = [
+        "# 🧠 FastAPI Worker Memory",
+        "",
+        f"**Run Date:** {meta['run_date']}",
+        f"- **Commit:** {meta.get('git_commit') or 'unknown'}",
+        f"- **Workers:** {meta['workers']}",
+        "",
+        "PSS splits shared pages among the processes sharing them; the PSS total is what the pod actually uses.",
+        "",
+        "| Model | Mode | Worker RSS (MiB) | Worker PSS (MiB) | Worker private (MiB) | Total RSS (MiB) | Total PSS (MiB) |",
+        "|-------|------|-----------------:|-----------------:|---------------------:|----------------:|----------------:|",
+    ]
+    for run in result["runs"]:
+        lines.append(
+            f"| {run['model']} | {run['mode']} | {_mib(run['worker_rss_mean'])} | {_mib(run['worker_pss_mean'])} | "
+            f"{_mib(run['worker_private_mean'])} | {_mib(run['total_rss'])} | {_mib(run['total_pss'])} |"
+        )
+    lines += ["", "## Savings", "", "| Model | Total PSS spawn (MiB) | Total PSS prefork (MiB) | Saved |",
+              "|-------|----------------------:|------------------------:|------:|"]
+    by_model: Dict[str, Dict[str, Any]] = {}
+    for run in result["runs"]:
+        by_model.setdefault(run["model"], {})[run["mode"]] = run
+    for model, runs in by_model.items():
+        if set(runs) == set(MODES):
+            spawn, prefork = runs["spawn"]["total_pss"], runs["prefork"]["total_pss"]
+            lines.append(f"| {model} | {_mib(spawn)} | {_mib(prefork)} | {100 * (spawn - prefork) / spawn:.0f}% |")
+    output.with_suffix(".md").write_text("\n".join(lines) + "\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--models", nargs="+", type=Path,
+                        default=[PROJECT_DIR / "model" / "mobilenet_v2.keras", PROJECT_DIR / "model" / "mobilenet_v2.tflite"])
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--requests", type=int, default=4, help="/predict calls per worker before measuring")
+    parser.add_argument("--startup-timeout", type=float, default=300.0)
+    parser.add_argument("--output", type=Path, default=REPORT_DIR / "worker_memory.json")
+    args = parser.parse_args()
+
+    from results_store import environment, git_info
+
+    runs = []
+    for model in args.models:
+        for mode in args.modes:
+            run = measure(mode, model.resolve(), args.workers, args.port, args.requests, args.startup_timeout)
+            runs.append(run)
+            print(f"{model.name:<28} {mode:<8} worker RSS {_mib(run['worker_rss_mean'])} MiB, "
+                  f"PSS {_mib(run['worker_pss_mean'])} MiB; total PSS {_mib(run['total_pss'])} MiB")
+
+    result = {
+        "meta": {
+            "run_date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "workers": args.workers,
+            **git_info(),
+            "environment": environment(),
+        },
+        "runs": runs,
+    }
+    write_report(result, args.output)
+    print(f"Results written to {args.output} and {args.output.with_suffix('.md')}")
+
+
+if __name__ == "__main__":
+    main()
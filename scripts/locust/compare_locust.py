@@ -104,6 +104,30 @@ def generate_markdown(results, output_path):
     with open(output_path, 'w') as f:
         f.write("\n".join(lines))
 
+def record_results(results):
+    """Keep the run in the persistent results store (scripts/generic/results_store.py)."""
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'generic'))
+    try:
+        from results_store import record_run
+    except ImportError as e:  # the report must not depend on the store
+        print(f"Could not record results: {e}")
+        return
+
+    users = float(os.environ.get('LOCUST_USERS', 0) or 0)
+    config = {key.lower(): os.environ[key] for key in ('LOCUST_USERS', 'LOCUST_DURATION', 'LOCUST_SPAWN_RATE', 'REPLICAS') if key in os.environ}
+    rows = []
+    for svc, res in results.items():
+        metrics = dict(res)
+        if res['requests']:
+            metrics['success_rate'] = 100 * (1 - res['failures'] / res['requests'])
+        rows.append((svc.lower(), users, metrics))
+    try:
+        run_id = record_run('locust', rows, config)
+    except Exception as e:  # the report must not depend on the store
+        print(f"Could not record results: {e}")
+        return
+    print(f"Recorded locust run {run_id} in the results store")
+
 def main(data_dir, report_dir):
     results = {}
     for svc in ['BentoML', 'FastAPI', 'RayServe']:
@@ -116,6 +140,7 @@ def main(data_dir, report_dir):
         report_path = os.path.join(report_dir, "locust_comparison.md")
         generate_markdown(results, report_path)
         print(f"Unified Locust report with charts generated: {report_path}")
+        record_results(results)
     else:
         print(f"No Locust stats found in {data_dir} to compare.")
 
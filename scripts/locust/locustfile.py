@@ -1,9 +1,19 @@
 import os
 import io
+import sys
 import numpy as np
 from PIL import Image
 from locust import HttpUser, task, between
 
+# Optional image corpus built by scripts/generic/corpus.py, shared by all users
+CORPUS_PATH = os.getenv("CORPUS_PATH")
+CORPUS = None
+if CORPUS_PATH:
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "generic"))
+    from corpus import CorpusPack
+
+    CORPUS = CorpusPack(CORPUS_PATH)
+
 class MLServiceUser(HttpUser):
     wait_time = between(0.1, 0.5)
     
@@ -15,6 +25,13 @@ class MLServiceUser(HttpUser):
         img.save(img_byte_arr, format='JPEG')
         self.image_content = img_byte_arr.getvalue()
 
+    def next_file(self):
+        if CORPUS is None:
+            return ('test_image.jpg', self.image_content, 'image/jpeg')
+        # Sampled from the memory map: no disk read or re-encoding per request
+        entry = CORPUS.sample()
+        return (entry.name, bytes(entry.data), entry.content_type)
+
     @task
     def predict(self):
         # Determine field name based on host (port 8000 is FastAPI in our setup)
@@ -23,7 +40,7 @@ class MLServiceUser(HttpUser):
             field_name = "file"
             
         files = {
-            field_name: ('test_image.jpg', self.image_content, 'image/jpeg')
+            field_name: self.next_file()
         }
         self.client.post("/predict", files=files)
 
@@ -104,6 +104,7 @@ echo "  Duration:   $DURATION"
 echo "  Users:      $USERS"
 echo "  Spawn Rate: $SPAWN_RATE"
 echo "  Replicas:   $REPLICAS"
+echo "  Corpus:     ${CORPUS_PATH:-random 224x224 JPEG}"
 
 # Clear old results
 rm -f "$DATA_DIR"/*_stats*
@@ -113,8 +114,9 @@ run_test_cycle "bentoml" "BentoML" "3000" "3000" "/healthz"
 run_test_cycle "fastapi" "FastAPI" "8000" "8000" "/health"
 run_test_cycle "rayserve" "RayServe" "31800" "8000" "/health"
 
-# Run data processing
-"$SCRIPT_DIR/process-locust-results.sh"
+# Run data processing (the settings are recorded with the run in the results store)
+LOCUST_DURATION="$DURATION" LOCUST_USERS="$USERS" LOCUST_SPAWN_RATE="$SPAWN_RATE" REPLICAS="$REPLICAS" \
+    "$SCRIPT_DIR/process-locust-results.sh"
 
 echo ""
 echo "✅ All Locust tests complete."
\ No newline at end of file
@@ -36,6 +36,14 @@ if [ "$ACTION" == "up" ]; then
     echo "Applying Kubernetes manifests..."
     kubectl apply -f kubernetes/namespace.yaml
 
+    # Admin token (/admin/profile): a Secret only while ADMIN_TOKEN is set, so the endpoint stays disabled otherwise
+    if [ -n "${ADMIN_TOKEN:-}" ]; then
+        kubectl create secret generic admin-token -n ml-benchmark --from-literal=token="$ADMIN_TOKEN" \
+            --dry-run=client -o yaml | kubectl apply -f -
+    else
+        kubectl delete secret admin-token -n ml-benchmark --ignore-not-found
+    fi
+
     # Apply service-specific resources
     if [ "$SERVICE" == "rayserve" ]; then
         kubectl apply -f kubernetes/rayserve-configmap.yaml
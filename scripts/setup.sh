@@ -28,7 +28,7 @@ echo "=========================================="
 echo ""
 echo "Step 1: Downloading MobileNetV2 model (uvx python3.11)..."
 if [ ! -f "model/mobilenet_v2.keras" ]; then
-    uvx --python 3.11 --with tensorflow==2.16.1 --with "numpy>=1.24.0,<2.0.0" python model/download_model.py
+    uvx --python 3.11 --with tensorflow==2.16.1 --with "numpy>=1.24.0,<2.0.0" --with pillow --with tf2onnx==1.16.1 python model/download_model.py
 else
     echo "Model already exists, skipping download"
 fi
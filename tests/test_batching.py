@@ -0,0 +1,80 @@
+from common.batching import AdaptiveBatchController
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_controller(**kwargs):
+    clock = FakeClock()
+    applied = []
+    controller = AdaptiveBatchController(
+        target_p95_s=0.1,
+        interval_s=1.0,
+        min_samples=5,
+        apply=lambda size, wait: applied.append((size, wait)),
+        clock=clock,
+        **kwargs,
+    )
+    return controller, clock, applied
+
+
+def feed(controller, clock, latency_s, batch_size, inference_s, samples=10):
+    for _ in range(samples):
+        controller.record_latency(latency_s)
+        controller.record_batch(batch_size, inference_s)
+    clock.now += 1.0
+
+
+def test_controller_waits_for_interval_and_samples():
+    controller, clock, applied = make_controller()
+    controller.record_latency(1.0)
+    assert controller.maybe_adjust(queue_depth=0) is None
+
+    clock.now += 1.0
+    assert controller.maybe_adjust(queue_depth=0) is None  # too few samples
+    assert applied == []
+
+
+def test_controller_grows_batch_size_under_backlog():
+    controller, clock, applied = make_controller(batch_size=8, wait_s=0.01)
+    feed(controller, clock, latency_s=0.05, batch_size=8, inference_s=0.04)
+
+    decision = controller.maybe_adjust(queue_depth=20)
+
+    assert decision["batch_size"] == 16
+    assert applied == [(16, 0.01)]
+    assert controller.snapshot()["decisions"] == [decision]
+
+
+def test_controller_does_not_grow_past_latency_budget():
+    controller, clock, applied = make_controller(batch_size=8, wait_s=0.01)
+    # 10 ms per image: 16 images would take 160 ms, over the 100 ms target
+    feed(controller, clock, latency_s=0.09, batch_size=8, inference_s=0.08)
+
+    assert controller.maybe_adjust(queue_depth=20) is None
+    assert applied == []
+
+
+def test_controller_shrinks_wait_then_batch_size_when_over_target():
+    controller, clock, applied = make_controller(batch_size=8, wait_s=0.001, min_wait_s=0.0005)
+    feed(controller, clock, latency_s=0.2, batch_size=8, inference_s=0.15)
+    controller.maybe_adjust(queue_depth=0)
+    feed(controller, clock, latency_s=0.2, batch_size=8, inference_s=0.15)
+    controller.maybe_adjust(queue_depth=0)
+
+    assert applied == [(8, 0.0005), (4, 0.0005)]
+
+
+def test_controller_shortens_wait_for_underfilled_batches():
+    controller, clock, applied = make_controller(batch_size=8, wait_s=0.01)
+    feed(controller, clock, latency_s=0.02, batch_size=1, inference_s=0.005)
+
+    decision = controller.maybe_adjust(queue_depth=0)
+
+    assert decision["wait_s"] == 0.005
+    assert "underfilled" in decision["reason"]
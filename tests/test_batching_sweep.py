@@ -0,0 +1,70 @@
+import importlib.util
+import pathlib
+import sys
+
+
+def load_sweep_module():
+    module_path = pathlib.Path(__file__).resolve().parents[1] / "scripts" / "generic" / "batching_sweep.py"
+    spec = importlib.util.spec_from_file_location("batching_sweep", module_path)
+    assert spec and spec.loader, "Failed to load batching_sweep.py"
+    mod = importlib.util.module_from_spec(spec)
+    # Dataclasses resolve their module through sys.modules
+    sys.modules[spec.name] = mod
+    spec.loader.exec_module(mod)  # type: ignore[arg-type]
+    return mod
+
+
+def test_pareto_frontier_keeps_only_non_dominated_points():
+    mod = load_sweep_module()
+    points = [
+        {"name": "a", "rps": 10, "p95": 20},
+        {"name": "b", "rps": 30, "p95": 50},
+        {"name": "c", "rps": 25, "p95": 60},  # dominated by b
+        {"name": "d", "rps": 40, "p95": 90},
+        {"name": "e", "rps": 10, "p95": 25},  # dominated by a
+    ]
+
+    frontier = mod.pareto_frontier(points, "p95")
+
+    assert [p["name"] for p in frontier] == ["a", "b", "d"]
+
+
+def test_pareto_frontier_skips_points_that_shed_load():
+    mod = load_sweep_module()
+    points = [
+        {"name": "a", "rps": 10, "p95": 20, "success_rate": 100.0},
+        {"name": "b", "rps": 50, "p95": 10, "success_rate": 40.0},
+    ]
+
+    assert [p["name"] for p in mod.pareto_frontier(points, "p95", min_success_rate=99)] == ["a"]
+
+
+def test_services_map_batching_knobs_to_env():
+    mod = load_sweep_module()
+
+    assert mod.SERVICES["bentoml"].batching_env(16, 500) == {
+        "BENTOML_MAX_BATCH_SIZE": "16",
+        "BENTOML_MAX_LATENCY_MS": "500",
+    }
+    assert mod.SERVICES["rayserve"].batching_env(4, 5) == {
+        "RAY_MAX_BATCH_SIZE": "4",
+        "RAY_BATCH_WAIT_TIMEOUT_S": "0.005",
+    }
+
+
+def test_run_closed_loop_counts_successes_and_failures():
+    mod = load_sweep_module()
+    calls = []
+
+    def make_request():
+        def send():
+            calls.append(1)
+            return len(calls) % 2 == 0
+
+        return send
+
+    stats = mod.run_closed_loop(make_request, concurrency=2, duration_s=0.05)
+
+    assert stats["success"] + stats["failed"] == len(calls)
+    assert stats["success"] > 0 and stats["failed"] > 0
+    assert stats["concurrency"] == 2
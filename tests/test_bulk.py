@@ -0,0 +1,121 @@
+import asyncio
+import base64
+import io
+import json
+import tarfile
+
+from common.bulk import (
+    NdjsonStreamParser,
+    TarStreamParser,
+    bulk_format,
+    iter_bulk_items,
+    stream_predictions,
+)
+
+
+def make_tar(members, fmt=tarfile.USTAR_FORMAT):
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w", format=fmt) as tar:
+        directory = tarfile.TarInfo("images")
+        directory.type = tarfile.DIRTYPE
+        tar.addfile(directory)  # non-file entries are skipped
+        for name, data in members:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return buf.getvalue()
+
+
+async def chunked(data, size):
+    for start in range(0, len(data), size):
+        yield data[start : start + size]
+
+
+def collect(async_iter):
+    async def run():
+        return [item async for item in async_iter]
+
+    return asyncio.run(run())
+
+
+def test_tar_parser_yields_members_across_arbitrary_chunks():
+    long_name = "nested/" + "x" * 120 + ".jpg"
+    members = [("a.jpg", b"A" * 700), ("empty.png", b""), (long_name, b"B" * 513)]
+    archive = make_tar(members, fmt=tarfile.GNU_FORMAT)
+
+    parser = TarStreamParser()
+    seen = []
+    for start in range(0, len(archive), 97):
+        seen.extend(parser.feed(archive[start : start + 97]))
+
+    assert seen == members
+    assert parser.finished
+
+
+def test_tar_parser_reads_pax_long_names():
+    name = "p" * 150 + ".jpg"
+    archive = make_tar([(name, b"data")], fmt=tarfile.PAX_FORMAT)
+    assert TarStreamParser().feed(archive) == [(name, b"data")]
+
+
+def test_ndjson_parser_keeps_ids_and_reports_bad_lines():
+    lines = (
+        json.dumps({"id": "cat", "image": base64.b64encode(b"img").decode()}) + "\n"
+        + "not json\n"
+        + json.dumps({"image": base64.b64encode(b"two").decode()})
+    ).encode()
+
+    parser = NdjsonStreamParser()
+    items = parser.feed(lines[:10]) + parser.feed(lines[10:]) + parser.feed(b"", final=True)
+
+    assert items[0] == ("cat", b"img")
+    assert items[1][0] == "1" and isinstance(items[1][1], ValueError)
+    assert items[2] == ("2", b"two")
+
+
+def test_ndjson_parser_reassembles_a_long_line_from_small_chunks():
+    image = bytes(range(256)) * 12_000
+    line = (json.dumps({"id": "big", "image": base64.b64encode(image).decode()}) + "\n").encode()
+    body = line + line.replace(b'"big"', b'"next"')
+
+    parser = NdjsonStreamParser()
+    items = []
+    for start in range(0, len(body), 65536):
+        items += parser.feed(body[start : start + 65536])
+    items += parser.feed(b"", final=True)
+
+    assert items == [("big", image), ("next", image)]
+
+
+def test_bulk_format_and_sniffing():
+    assert bulk_format("application/x-ndjson; charset=utf-8") == "ndjson"
+    assert bulk_format("application/x-tar") == "tar"
+    assert bulk_format(filename="batch.jsonl") == "ndjson"
+
+    body = b'{"id": "a", "image": "aW1n"}\n'
+    assert collect(iter_bulk_items(chunked(body, 4))) == [("a", b"img")]
+    archive = make_tar([("a.jpg", b"img")])
+    assert collect(iter_bulk_items(chunked(archive, 300))) == [("a.jpg", b"img")]
+
+
+def test_stream_predictions_keeps_input_order_in_full_batches():
+    batch_sizes = []
+
+    async def predict(images):
+        batch_sizes.append(len(images))
+        # Earlier batches finish last
+        await asyncio.sleep(0.01 * (3 - len(batch_sizes)))
+        return [b'{"n":%s}' % image for image in images]
+
+    async def items():
+        for i in range(7):
+            yield str(i), (ValueError("bad") if i == 3 else str(i).encode())
+
+    lines = b"".join(collect(stream_predictions(items(), predict, batch_size=3))).splitlines()
+    records = [json.loads(line) for line in lines]
+
+    assert [record["id"] for record in records] == [str(i) for i in range(7)]
+    assert records[3] == {"id": "3", "error": "bad"}
+    assert records[6]["result"] == {"n": 6}
+    # The bad item does not take a batch slot
+    assert batch_sizes == [3, 2, 1]
@@ -0,0 +1,68 @@
+import io
+import time
+
+from PIL import Image
+
+from common.cache import PredictionCache, content_key, encoded_bytes
+from tests.smoke_utils import generate_image_bytes
+
+
+def test_cache_counts_hits_and_misses():
+    cache = PredictionCache(max_entries=4)
+    key = content_key(b"image")
+
+    assert cache.get(key) is None
+    cache.put(key, b'{"top_prediction": "cat"}')
+    assert cache.get(key) == b'{"top_prediction": "cat"}'
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+    assert stats["hit_rate"] == 0.5
+
+
+def test_cache_evicts_least_recently_used_within_budgets():
+    cache = PredictionCache(max_entries=2, max_bytes=9)
+    cache.put("a", b"1111")
+    cache.put("b", b"2222")
+    cache.get("a")  # "b" is now least recently used
+    cache.put("c", b"3333")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1111" and cache.get("c") == b"3333"
+
+    # Byte budget: a 6-byte value pushes out both 4-byte entries
+    cache.put("d", b"444444")
+    assert len(cache) == 1
+    assert cache.stats()["bytes"] == 6
+    assert cache.stats()["evictions"] == 3
+
+    cache.put("huge", b"x" * 10)
+    assert cache.get("huge") is None
+
+
+def test_cache_expires_entries_after_ttl():
+    cache = PredictionCache(max_entries=2, ttl_s=0.01)
+    cache.put("a", b"1")
+    time.sleep(0.02)
+
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_disabled_cache_stores_nothing():
+    cache = PredictionCache(max_entries=0)
+    cache.put("a", b"1")
+
+    assert not cache.enabled
+    assert cache.get("a") is None
+    assert cache.stats()["misses"] == 0
+
+
+def test_encoded_bytes_reads_lazily_opened_image():
+    image_bytes = generate_image_bytes()
+    image = Image.open(io.BytesIO(image_bytes))
+
+    assert encoded_bytes(image) == image_bytes
+    # The decoder still works after the upload was read for keying
+    assert image.convert("RGB").size == (224, 224)
+    assert encoded_bytes(image_bytes) == image_bytes
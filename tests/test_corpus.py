@@ -0,0 +1,50 @@
+import importlib.util
+import io
+import pathlib
+import random
+import sys
+
+from PIL import Image
+
+
+def load_corpus_module():
+    module_path = pathlib.Path(__file__).resolve().parents[1] / "scripts" / "generic" / "corpus.py"
+    spec = importlib.util.spec_from_file_location("corpus", module_path)
+    assert spec and spec.loader, "Failed to load corpus.py"
+    mod = importlib.util.module_from_spec(spec)
+    # Dataclasses resolve their module through sys.modules
+    sys.modules[spec.name] = mod
+    spec.loader.exec_module(mod)  # type: ignore[arg-type]
+    return mod
+
+
+def test_plan_respects_duplicate_ratio_and_seed():
+    mod = load_corpus_module()
+    sizes, formats = {320: 1, 3840: 1}, {"jpeg": 1, "png": 1, "webp": 1}
+
+    specs, sequence = mod.plan_corpus(100, sizes, formats, duplicates=0.25, seed=7)
+
+    assert len(specs) == 75 and len(sequence) == 100
+    assert set(sequence) == set(range(75))  # every unique image is used
+    assert {max(s["width"], s["height"]) for s in specs} <= {320, 3840}
+    assert mod.plan_corpus(100, sizes, formats, duplicates=0.25, seed=7) == (specs, sequence)
+    assert mod.plan_corpus(100, sizes, formats, duplicates=0.25, seed=8) != (specs, sequence)
+
+
+def test_pack_round_trip_is_deterministic(tmp_path):
+    mod = load_corpus_module()
+    options = dict(count=6, sizes={320: 1, 400: 1}, formats={"jpeg": 1, "png": 1, "webp": 1}, duplicates=0.5, seed=3)
+    mod.build_corpus(tmp_path / "a.pack", **options)
+    mod.build_corpus(tmp_path / "b.pack", **options)
+    assert (tmp_path / "a.pack").read_bytes() == (tmp_path / "b.pack").read_bytes()
+
+    with mod.CorpusPack(tmp_path / "a.pack") as pack:
+        assert len(pack) == 6 and len(pack.blobs) == 3
+        for position in range(len(pack)):
+            entry = pack.entry(position)
+            image = Image.open(io.BytesIO(entry.data))
+            assert image.size == (entry.width, entry.height)
+            assert Image.MIME[image.format] == entry.content_type
+        assert pack.sample(random.Random(0)).data.nbytes > 0
+        # Blobs start on a page boundary after the index
+        assert min(blob["offset"] for blob in pack.blobs) % mod.ALIGNMENT == 0
@@ -0,0 +1,105 @@
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+tf = pytest.importorskip("tensorflow")
+
+from common.inference import KerasEngine, load_engine, power_of_two_buckets
+from common.preprocessing import preprocess_batch
+from model.benchmark_variants import agreement
+from model.download_model import QUANTIZED_VARIANTS, export_onnx, export_tflite
+from tests.smoke_utils import generate_image_bytes
+
+
+def build_tiny_model():
+    inputs = tf.keras.Input(shape=(8, 8, 3))
+    x = tf.keras.layers.GlobalAveragePooling2D()(inputs)
+    outputs = tf.keras.layers.Dense(5, activation="softmax")(x)
+    return tf.keras.Model(inputs, outputs)
+
+
+def test_power_of_two_buckets():
+    assert power_of_two_buckets(1) == (1,)
+    assert power_of_two_buckets(8) == (1, 2, 4, 8)
+    assert power_of_two_buckets(10) == (1, 2, 4, 8, 16)
+
+
+def test_engine_matches_keras_predict_and_reuses_traces():
+    model = build_tiny_model()
+    engine = KerasEngine(model, buckets=(1, 2, 4), input_shape=(8, 8, 3))
+    batch = np.random.rand(11, 8, 8, 3).astype(np.float32)
+
+    for n in (1, 3, 4, 11):
+        np.testing.assert_allclose(engine.predict(batch[:n]), model.predict(batch[:n], verbose=0), rtol=1e-5, atol=1e-6)
+
+    assert engine.bucket_size(3) == 4
+    assert engine.bucket_size(20) == 4
+    # At most one concrete function per bucket, however many shapes were requested
+    assert sorted(engine._concrete) == [1, 4]
+
+
+@pytest.mark.skipif(not os.path.exists("model/mobilenet_v2.keras"), reason="Model not downloaded")
+def test_engine_accepts_padded_preprocessed_batch():
+    model = tf.keras.models.load_model("model/mobilenet_v2.keras")
+    engine = KerasEngine(model)
+    images = [generate_image_bytes() for _ in range(3)]
+
+    batch = preprocess_batch(images, pad_to=engine.bucket_size(len(images)))
+    preds = engine.predict(batch, len(images))
+
+    assert batch.shape[0] == 4
+    assert preds.shape[0] == 3
+    np.testing.assert_allclose(preds, model.predict(batch[:3], verbose=0), rtol=1e-4, atol=1e-5)
+
+
+def test_load_engine_rejects_unknown_format():
+    with pytest.raises(ValueError):
+        load_engine("model.pt")
+
+
+def test_tflite_engine_matches_keras(tmp_path):
+    model = build_tiny_model()
+    model_path = export_tflite(model, str(tmp_path / "tiny.tflite"))
+
+    engine = load_engine(str(model_path), buckets=(1, 2, 4))
+    batch = np.random.rand(6, 8, 8, 3).astype(np.float32)
+
+    assert engine.backend == "tflite"
+    assert engine.input_shape == (8, 8, 3)
+    np.testing.assert_allclose(engine.predict(batch), model.predict(batch, verbose=0), rtol=1e-4, atol=1e-5)
+
+
+def test_onnx_engine_matches_keras(tmp_path):
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("tf2onnx")
+    model = build_tiny_model()
+    model_path = export_onnx(model, str(tmp_path / "tiny.onnx"))
+
+    engine = load_engine(str(model_path), buckets=(1, 2, 4))
+    batch = np.random.rand(3, 8, 8, 3).astype(np.float32)
+
+    assert engine.backend == "onnx"
+    np.testing.assert_allclose(engine.predict(batch), model.predict(batch, verbose=0), rtol=1e-4, atol=1e-5)
+
+
+@pytest.mark.parametrize("quantization", QUANTIZED_VARIANTS)
+def test_quantized_tflite_variants_load(tmp_path, quantization):
+    model = build_tiny_model()
+    calibration_images = [np.random.rand(8, 8, 3).astype(np.float32) for _ in range(4)]
+    model_path = export_tflite(
+        model, str(tmp_path / f"tiny_{quantization}.tflite"), quantization=quantization, calibration_images=calibration_images
+    )
+
+    engine = load_engine(model_path, buckets=(1, 2))
+    preds = engine.predict(np.random.rand(3, 8, 8, 3).astype(np.float32))
+
+    assert preds.shape == (3, 5)
+    assert preds.dtype == np.float32
+
+
+def test_variant_agreement():
+    reference = [[1, 2, 3, 4, 5], [6, 7, 8, 9, 10]]
+    variant = [[1, 9, 9, 9, 9], [7, 6, 9, 9, 9]]
+
+    assert agreement(reference, variant) == (0.5, 1.0)
@@ -0,0 +1,80 @@
+import asyncio
+import importlib.util
+import pathlib
+
+
+def load_loadgen_module():
+    module_path = pathlib.Path(__file__).resolve().parents[1] / "scripts" / "generic" / "loadgen.py"
+    spec = importlib.util.spec_from_file_location("loadgen", module_path)
+    assert spec and spec.loader, "Failed to load loadgen.py"
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)  # type: ignore[arg-type]
+    return mod
+
+
+def test_histogram_percentiles_stay_within_three_significant_digits():
+    mod = load_loadgen_module()
+    hist = mod.HdrHistogram()
+    for value in range(1, 1001):
+        hist.record(value * 1000)  # 1..1000 ms
+
+    assert hist.total == 1000
+    assert hist.min() == 1000
+    assert abs(hist.percentile(50) - 500_000) / 500_000 < 0.001
+    assert abs(hist.percentile(99) - 990_000) / 990_000 < 0.001
+    assert abs(hist.max() - 1_000_000) / 1_000_000 < 0.001
+    # Every recorded value lands in a bucket that contains it
+    for value in (0, 2047, 2048, 4097, 123_456_789):
+        low, high = hist._range(hist._index(value))
+        assert low <= value <= high
+
+
+def test_corrected_histogram_backfills_stalled_requests():
+    mod = load_loadgen_module()
+    hist = mod.HdrHistogram()
+    for _ in range(99):
+        hist.record(1000)
+    hist.record(100_000)  # one 100 ms stall at a 1 ms expected interval
+
+    corrected = hist.corrected(1000)
+
+    # 99 samples that a non-stalled client would have sent during the stall
+    assert corrected.total == 100 + 99
+    assert hist.percentile(90) == 1000
+    assert corrected.percentile(90) > 50_000
+
+
+def test_load_generator_records_against_keep_alive_server():
+    mod = load_loadgen_module()
+    requests_seen = []
+
+    async def handle(reader, writer):
+        while not reader.at_eof():
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+            except asyncio.IncompleteReadError:
+                break
+            length = next(
+                int(line.split(b":")[1]) for line in head.split(b"\r\n") if line.lower().startswith(b"content-length")
+            )
+            requests_seen.append(await reader.readexactly(length))
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\n{}")
+            await writer.drain()
+
+    async def scenario():
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        host, port, payload = mod.build_request(f"http://127.0.0.1:{port}/predict", "file", b"img")
+        generator = mod.LoadGenerator(host, port, [payload], connections=2, timeout_s=2)
+        try:
+            await generator.run_rate(50, 0.2)
+        finally:
+            generator.close()
+            server.close()
+        return generator
+
+    generator = asyncio.run(scenario())
+
+    assert generator.success == 10 and generator.failed == 0
+    assert generator.histogram.total == generator.service_histogram.total == 10
+    assert all(b'name="file"' in body and b"img" in body for body in requests_seen)
@@ -0,0 +1,52 @@
+import pytest
+
+prometheus_client = pytest.importorskip("prometheus_client")
+
+from common.metrics import ServiceMetrics
+
+
+def test_stage_timings_batches_and_in_flight_are_recorded():
+    registry = prometheus_client.CollectorRegistry()
+    metrics = ServiceMetrics("svc", registry=registry)
+
+    with metrics.in_flight("predict"):
+        assert registry.get_sample_value("mobilenet_requests_in_flight", {"service": "svc", "endpoint": "predict"}) == 1
+        with metrics.time("decode"):
+            pass
+        metrics.observe("inference", 0.003)
+        metrics.observe_batch(6)
+
+    def sample(name, **labels):
+        return registry.get_sample_value(name, {"service": "svc", **labels})
+
+    assert sample("mobilenet_requests_in_flight", endpoint="predict") == 0
+    assert sample("mobilenet_stage_duration_seconds_count", stage="decode") == 1
+    assert sample("mobilenet_stage_duration_seconds_bucket", stage="inference", le="0.0025") == 0
+    assert sample("mobilenet_stage_duration_seconds_bucket", stage="inference", le="0.005") == 1
+    assert sample("mobilenet_batch_size_bucket", le="4.0") == 0
+    assert sample("mobilenet_batch_size_bucket", le="8.0") == 1
+    # Every stage is exported from the start, so dashboards see zeros rather than gaps
+    assert sample("mobilenet_stage_duration_seconds_count", stage="serialize") == 0
+
+
+def test_streamed_requests_stay_in_flight_until_the_stream_ends():
+    import asyncio
+
+    registry = prometheus_client.CollectorRegistry()
+    metrics = ServiceMetrics("svc", registry=registry)
+
+    def in_flight():
+        return registry.get_sample_value("mobilenet_requests_in_flight", {"service": "svc", "endpoint": "predict_bulk"})
+
+    async def lines():
+        yield b"a"
+        yield b"b"
+
+    async def consume():
+        seen = []
+        async for line in metrics.in_flight_stream("predict_bulk", lines()):
+            seen.append((line, in_flight()))
+        return seen
+
+    assert asyncio.run(consume()) == [(b"a", 1), (b"b", 1)]
+    assert in_flight() == 0
@@ -0,0 +1,52 @@
+import argparse
+import importlib.util
+import json
+import pathlib
+import sys
+
+SCRIPTS_DIR = pathlib.Path(__file__).resolve().parents[1] / "scripts" / "generic"
+
+
+def load_microbench_module(monkeypatch):
+    # Sibling scripts (corpus, results_store) are imported as top-level modules
+    monkeypatch.syspath_prepend(str(SCRIPTS_DIR))
+    spec = importlib.util.spec_from_file_location("microbench", SCRIPTS_DIR / "microbench.py")
+    assert spec and spec.loader, "Failed to load microbench.py"
+    mod = importlib.util.module_from_spec(spec)
+    # Dataclasses resolve their module through sys.modules
+    monkeypatch.setitem(sys.modules, spec.name, mod)
+    spec.loader.exec_module(mod)  # type: ignore[arg-type]
+    return mod
+
+
+def test_filtered_run_writes_machine_readable_results(monkeypatch, tmp_path):
+    mod = load_microbench_module(monkeypatch)
+    monkeypatch.setenv("MODEL_PATH", str(mod.DEFAULT_MODEL))
+    monkeypatch.setenv("LABELS_PATH", str(mod.LABELS_PATH))
+    args = argparse.Namespace(groups=["preprocess", "postprocess"], batch_sizes=[1, 4], filter=r"frames|to_json",
+                              model=mod.DEFAULT_MODEL, min_time=0.01, min_rounds=3, max_rounds=50, warmup=1)
+
+    result = mod.run(args)
+    mod.write_report(result, tmp_path / "mb.json")
+
+    names = [bench["name"] for bench in result["benchmarks"]]
+    assert names == ["preprocess_batch_frames[1]", "preprocess_batch_frames[4]", "to_json[1]", "to_json[4]"]
+    stored = json.loads((tmp_path / "mb.json").read_text())
+    stats = stored["benchmarks"][1]["stats"]
+    assert stored["benchmarks"][1]["params"] == {"batch_size": 4}
+    assert 3 <= stats["rounds"] <= 50 and stats["min_ms"] <= stats["median_ms"] <= stats["max_ms"]
+    assert abs(stats["items_per_s"] - 4 / (stats["median_ms"] / 1000)) < 1e-6
+    assert "cpu_count" in stored["meta"]["environment"]
+    assert "| to_json[4] |" in (tmp_path / "mb.md").read_text()
+
+
+def test_compare_flags_median_slowdowns_beyond_tolerance(monkeypatch):
+    mod = load_microbench_module(monkeypatch)
+
+    def run(**medians):
+        return {"benchmarks": [{"name": name, "stats": {"median_ms": ms}} for name, ms in medians.items()]}
+
+    rows = mod.compare(run(a=10.0, b=10.0, gone=1.0), run(a=10.5, b=12.0, new=1.0), tolerance_pct=10)
+
+    assert [(row["name"], row["regression"]) for row in rows] == [("a", False), ("b", True)]
+    assert round(rows[1]["change_pct"]) == 20
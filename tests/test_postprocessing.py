@@ -0,0 +1,44 @@
+import json
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from common.postprocessing import Postprocessor, json_array
+
+
+def reference_postprocess(pred, labels):
+    """The per-image loop the services used before batch-level postprocessing."""
+    top_indices = np.argsort(pred)[-5:][::-1]
+    results = [
+        {
+            "class_id": int(idx),
+            "class_name": labels[idx] if idx < len(labels) else f"class_{idx}",
+            "confidence": float(pred[idx]),
+        }
+        for idx in top_indices
+    ]
+    return {"predictions": results, "top_prediction": results[0]["class_name"], "confidence": results[0]["confidence"]}
+
+
+@pytest.fixture
+def preds():
+    rng = np.random.default_rng(0)
+    return rng.random((8, 1001)).astype(np.float32)
+
+
+def test_to_dicts_matches_reference(preds):
+    labels = [f"label {i}" for i in range(1000)]
+    postprocessor = Postprocessor(labels)
+
+    assert postprocessor.to_dicts(preds) == [reference_postprocess(pred, labels) for pred in preds]
+
+
+def test_to_json_matches_reference(preds):
+    labels = ['quoted "label"', "café"] + [f"label {i}" for i in range(2, 1001)]
+    preds[0, :2] = 2.0
+    postprocessor = Postprocessor(labels)
+
+    decoded = json.loads(json_array(postprocessor.to_json(preds)))
+
+    assert decoded == [reference_postprocess(pred, labels) for pred in preds]
@@ -0,0 +1,83 @@
+import io
+
+import pytest
+
+np = pytest.importorskip("numpy")
+from PIL import Image
+
+from common.preprocessing import BatchBuffer, decode_tensor, load_image, parse_shape, preprocess_batch, preprocess_image
+from tests.smoke_utils import generate_image_bytes, generate_image_obj
+
+
+def test_preprocess_image_matches_reference():
+    image_bytes = generate_image_bytes()
+    reference = np.array(Image.open(io.BytesIO(image_bytes)).convert("RGB"), dtype=np.float32) / 255.0
+
+    tensor = preprocess_image(image_bytes)
+
+    assert tensor.shape == (1, 224, 224, 3)
+    assert tensor.dtype == np.float32
+    np.testing.assert_allclose(tensor[0], reference, rtol=0, atol=1e-7)
+
+
+def test_load_image_downscales_large_jpeg():
+    image = load_image(generate_image_bytes(width=1920, height=1080))
+
+    assert image.shape == (224, 224, 3)
+    assert image.dtype == np.uint8
+
+
+def test_batch_buffer_is_reused_and_grows():
+    buffer = BatchBuffer(capacity=2)
+    first = buffer.fill([generate_image_obj(), generate_image_obj()])
+    second = buffer.fill([generate_image_bytes()])
+    assert second.base is first.base
+
+    grown = buffer.fill([generate_image_bytes() for _ in range(5)])
+    assert grown.shape == (5, 224, 224, 3)
+    assert buffer.capacity == 8
+
+
+def test_preprocess_batch_accepts_mixed_inputs():
+    decoded = load_image(generate_image_bytes())
+    batch = preprocess_batch([decoded, generate_image_bytes(), generate_image_obj(width=300, height=200)])
+
+    assert batch.shape == (3, 224, 224, 3)
+    np.testing.assert_allclose(batch[0], decoded / np.float32(255.0))
+
+
+def test_load_image_rejects_invalid_data():
+    with pytest.raises(ValueError):
+        load_image(b"not an image")
+
+
+def test_decode_tensor_wraps_raw_and_npy_payloads_without_copying():
+    frames = np.random.randint(0, 256, (3, 224, 224, 3), dtype=np.uint8)
+    raw = frames.tobytes()
+    buffer = io.BytesIO()
+    np.save(buffer, frames)
+
+    from_raw = decode_tensor(raw)
+    from_shape = decode_tensor(raw, parse_shape("3,224,224,3"))
+    from_npy = decode_tensor(buffer.getvalue())
+
+    for tensor in (from_raw, from_shape, from_npy):
+        assert tensor.shape == (3, 224, 224, 3)
+        np.testing.assert_array_equal(tensor, frames)
+    assert not from_raw.flags.owndata
+    assert decode_tensor(frames[0].tobytes()).shape == (1, 224, 224, 3)
+
+
+def test_decode_tensor_rejects_mismatched_payloads():
+    frames = np.zeros((2, 224, 224, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    np.save(buffer, frames.astype(np.float32))
+
+    with pytest.raises(ValueError):
+        decode_tensor(frames.tobytes(), (3, 224, 224, 3))
+    with pytest.raises(ValueError):
+        decode_tensor(frames.tobytes()[:-1])
+    with pytest.raises(ValueError):
+        decode_tensor(buffer.getvalue())
+    with pytest.raises(ValueError):
+        parse_shape("2,x,224,3")
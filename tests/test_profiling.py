@@ -0,0 +1,47 @@
+import asyncio
+import threading
+
+import pytest
+
+from common import profiling
+
+
+def spin(stop):
+    while not stop.is_set():
+        sum(i * i for i in range(1000))
+
+
+def test_capture_finds_the_busy_function_and_renders_flame_graph_formats():
+    stop = threading.Event()
+    worker = threading.Thread(target=spin, args=(stop,))
+    worker.start()
+    try:
+        profile = asyncio.run(profiling.capture_profile(0.3, "test", top=5, interval_s=0.002))
+    finally:
+        stop.set()
+        worker.join()
+
+    assert profile["samples"] > 10
+    assert any(entry["function"] == "spin" and entry["total_pct"] > 50 for entry in profile["top"])
+    # Only this test's threads were busy; the profiler's own thread never shows up
+    assert "spin (test_profiling.py:" in profile["folded"]
+    assert "_run (profiling.py" not in profile["folded"]
+    speedscope = profile["speedscope"]["profiles"][0]
+    frames = profile["speedscope"]["shared"]["frames"]
+    assert len(speedscope["samples"]) == len(speedscope["weights"]) == len(profile["folded"].splitlines())
+    assert all(0 <= index < len(frames) for stack in speedscope["samples"] for index in stack)
+
+    with pytest.raises(ValueError):
+        asyncio.run(profiling.capture_profile(0, "test"))
+
+
+def test_admin_token_is_required(monkeypatch):
+    monkeypatch.delenv("ADMIN_TOKEN", raising=False)
+    with pytest.raises(PermissionError, match="disabled"):
+        profiling.check_admin("anything")
+
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    profiling.check_admin("secret")
+    for token in (None, "", "wrong"):
+        with pytest.raises(PermissionError, match="invalid"):
+            profiling.check_admin(token)
@@ -0,0 +1,72 @@
+import importlib.util
+import json
+import pathlib
+
+import pytest
+
+
+def load_store_module():
+    module_path = pathlib.Path(__file__).resolve().parents[1] / "scripts" / "generic" / "results_store.py"
+    spec = importlib.util.spec_from_file_location("results_store", module_path)
+    assert spec and spec.loader, "Failed to load results_store.py"
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)  # type: ignore[arg-type]
+    return mod
+
+
+def write_stats(directory, service, level, **stats):
+    path = directory / f"stats_{service}_{level}.json"
+    path.write_text(json.dumps({key: f"{value:.2f}" for key, value in stats.items()} | {"mode": "rate"}))
+
+
+def test_generic_runs_are_recorded_with_commit_and_config(tmp_path):
+    mod = load_store_module()
+    write_stats(tmp_path, "fastapi", 10, rps=20, p95=200)
+    write_stats(tmp_path, "fastapi", 20, rps=35, p95=400)
+    db = tmp_path / "results.sqlite"
+
+    run_id = mod.record_run("generic", mod.generic_rows(tmp_path, ["10"]), {"duration_s": 10}, db_path=db)
+
+    conn = mod.connect(db)
+    run = mod.resolve_run(conn, "latest", source="generic")
+    assert run["id"] == run_id
+    assert json.loads(run["config"]) == {"duration_s": 10}
+    assert "cpu_count" in json.loads(run["environment"])
+    assert run["git_commit"] is None or len(run["git_commit"]) == 40
+    # Only the requested level; the non-numeric `mode` is not a metric
+    assert mod.run_values(conn, run_id) == {("fastapi", 10.0, "rps"): 20.0, ("fastapi", 10.0, "p95"): 200.0}
+
+
+def test_compare_flags_only_changes_beyond_tolerance():
+    mod = load_store_module()
+    baseline = {("bentoml", 10.0, "rps"): 100.0, ("bentoml", 10.0, "p95"): 200.0, ("bentoml", 10.0, "p99"): 300.0,
+                ("bentoml", 10.0, "success"): 10.0}
+    candidate = {("bentoml", 10.0, "rps"): 90.0, ("bentoml", 10.0, "p95"): 190.0, ("bentoml", 10.0, "p99"): 330.0,
+                 ("bentoml", 10.0, "success"): 1.0}
+
+    results = {c["metric"]: c for c in mod.compare_values(baseline, candidate, 5, {"p99": 15})}
+
+    assert set(results) == {"rps", "p95", "p99"}  # counters are not compared
+    assert results["rps"]["regression"] and round(results["rps"]["change_pct"]) == -10
+    assert not results["p95"]["regression"]  # faster is never a regression
+    assert not results["p99"]["regression"]  # +10% is within its own tolerance
+
+
+def test_latest_baseline_is_the_run_before_the_candidate(tmp_path):
+    mod = load_store_module()
+    db = tmp_path / "results.sqlite"
+    rows = [("fastapi", 10.0, {"rps": 20.0})]
+    first = mod.record_run("generic", rows, {}, db_path=db)
+    mod.record_run("locust", rows, {}, db_path=db)
+    second = mod.record_run("generic", rows, {}, db_path=db)
+    conn = mod.connect(db)
+
+    baseline, candidate = mod.resolve_comparison(conn, "latest", str(second))
+    assert (baseline["id"], candidate["id"]) == (first, second)
+    baseline, candidate = mod.resolve_comparison(conn, str(first), "latest")
+    assert (baseline["id"], candidate["id"]) == (first, second)
+    # The defaults never compare the newest run with itself
+    with pytest.raises(SystemExit, match="both run"):
+        mod.resolve_comparison(conn, str(second), "latest")
+    with pytest.raises(SystemExit, match="before run"):
+        mod.resolve_comparison(conn, "latest", str(first))
@@ -0,0 +1,62 @@
+import os
+import sys
+
+import pytest
+
+from common.runtime import cgroup_cpu_limit, configure_threads, thread_settings
+
+THREAD_VARIABLES = (
+    "CPU_LIMIT", "TF_NUM_INTRAOP_THREADS", "TF_NUM_INTEROP_THREADS", "OMP_NUM_THREADS", "MKL_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS", "DECODE_THREADS",
+)
+
+
+@pytest.fixture
+def environ(monkeypatch):
+    # configure_threads exports variables; keep them out of the real environment
+    env = {name: value for name, value in os.environ.items() if name not in THREAD_VARIABLES}
+    monkeypatch.setattr(os, "environ", env)
+    monkeypatch.setattr(os, "sched_getaffinity", lambda pid: set(range(8)), raising=False)
+    # Nor resize the pools of a TensorFlow loaded by other tests
+    monkeypatch.delitem(sys.modules, "tensorflow", raising=False)
+    return env
+
+
+def test_cgroup_quota_is_read_from_v1_and_v2(tmp_path):
+    v2 = tmp_path / "v2"
+    v2.mkdir()
+    (v2 / "cpu.max").write_text("150000 100000\n")
+    assert cgroup_cpu_limit(str(v2)) == 1.5
+    (v2 / "cpu.max").write_text("max 100000\n")
+    assert cgroup_cpu_limit(str(v2)) is None
+
+    v1 = tmp_path / "v1" / "cpu,cpuacct"
+    v1.mkdir(parents=True)
+    (v1 / "cpu.cfs_quota_us").write_text("200000\n")
+    (v1 / "cpu.cfs_period_us").write_text("100000\n")
+    assert cgroup_cpu_limit(str(tmp_path / "v1")) == 2.0
+    (v1 / "cpu.cfs_quota_us").write_text("-1\n")
+    assert cgroup_cpu_limit(str(tmp_path / "v1")) is None
+    assert cgroup_cpu_limit(str(tmp_path / "missing")) is None
+
+
+def test_threads_follow_the_quota_and_explicit_variables_win(environ, tmp_path):
+    (tmp_path / "cpu.max").write_text("250000 100000\n")
+    settings = thread_settings(root=str(tmp_path))
+    assert (settings.cpus, settings.source) == (2.5, "cgroup quota")
+    assert (settings.intra_op, settings.inter_op, settings.omp, settings.decode) == (2, 1, 2, 2)
+
+    # A fractional share (Ray's num_cpus) still gets one thread
+    settings = thread_settings(cpus=0.5, root=str(tmp_path))
+    assert (settings.source, settings.intra_op) == ("requested share", 1)
+
+    environ.update(CPU_LIMIT="6", TF_NUM_INTEROP_THREADS="1", DECODE_THREADS="3")
+    settings = thread_settings(root=str(tmp_path))
+    assert (settings.cpus, settings.intra_op, settings.inter_op, settings.decode) == (6.0, 6, 1, 3)
+
+    environ.update(OMP_NUM_THREADS="4")
+    settings = configure_threads()
+    assert environ["TF_NUM_INTRAOP_THREADS"] == "6"
+    assert environ["MKL_NUM_THREADS"] == "4"
+    assert environ["OMP_NUM_THREADS"] == "4"
+    assert settings.omp == 4
@@ -0,0 +1,59 @@
+import importlib.util
+import json
+import pathlib
+
+
+def load_saturation_module():
+    module_path = pathlib.Path(__file__).resolve().parents[1] / "scripts" / "generic" / "saturation.py"
+    spec = importlib.util.spec_from_file_location("saturation", module_path)
+    assert spec and spec.loader, "Failed to load saturation.py"
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)  # type: ignore[arg-type]
+    return mod
+
+
+def usl_points(levels, lam=5.0, sigma=0.05, kappa=0.002):
+    points = []
+    for n in levels:
+        rps = lam * n / (1 + sigma * (n - 1) + kappa * n * (n - 1))
+        latency = n / rps * 1000  # Little's law, ms
+        points.append({"level": float(n), "rps": rps, "avg": latency, "p95": 1.5 * latency,
+                       "p99": 2 * latency, "success_rate": 100.0})
+    return points
+
+
+def test_usl_fit_recovers_peak_and_knee():
+    mod = load_saturation_module()
+    model = mod.fit_usl(usl_points([1, 10, 20, 40, 80]))
+
+    assert abs(model["sigma"] - 0.05) < 1e-6 and abs(model["kappa"] - 0.002) < 1e-6
+    assert abs(model["peak_level"] - (0.95 / 0.002) ** 0.5) < 1e-6
+    # Power X^2/N peaks where 3*kappa*N^2 + (sigma - kappa)*N - (1 - sigma) = 0
+    assert abs(mod.fitted_knee(model, 80)["level"] - 9.19) < 0.1
+
+
+def test_slo_capacity_interpolates_to_the_crossing_and_suggests_levels(tmp_path):
+    mod = load_saturation_module()
+    points = [
+        {"level": 10.0, "rps": 20.0, "avg": 500.0, "p95": 600.0, "p99": 700.0, "success_rate": 100.0},
+        {"level": 20.0, "rps": 30.0, "avg": 650.0, "p95": 800.0, "p99": 900.0, "success_rate": 100.0},
+        {"level": 40.0, "rps": 34.0, "avg": 1200.0, "p95": 1200.0, "p99": 1500.0, "success_rate": 100.0},
+    ]
+
+    capacity = mod.slo_capacity(points, slo_p95=1000, slo_p99=None)
+
+    assert capacity["max_rps"] == 30.0 and capacity["level"] == 20.0
+    assert capacity["first_violation"] == 40.0
+    assert abs(capacity["interpolated_rps"] - 32.0) < 1e-9  # halfway from 800 to 1200 ms
+
+    result = mod.analyze({"fastapi": points}, slo_p95=1000)["fastapi"]
+    levels = mod.suggest_levels(result, count=4)
+    assert len(levels) == 4 and not {10, 20, 40} & set(levels)
+    assert any(20 < level < 40 for level in levels)
+
+    # Open-loop stats are analyzed separately from closed-loop ones
+    (tmp_path / "stats_fastapi_10.json").write_text(json.dumps({**{k: str(v) for k, v in points[0].items()}}))
+    (tmp_path / "stats_fastapi_50.json").write_text(json.dumps({**{k: str(v) for k, v in points[1].items()},
+                                                                "mode": "rate"}))
+    assert [p["level"] for p in mod.load_points(tmp_path)["fastapi"]] == [10.0]
+    assert [p["level"] for p in mod.load_points(tmp_path, "rate")["fastapi"]] == [50.0]
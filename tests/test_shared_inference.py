@@ -0,0 +1,157 @@
+import asyncio
+import importlib.util
+import os
+import pathlib
+import threading
+import time
+
+import numpy as np
+import pytest
+
+
+def load_shared_inference_module():
+    module_path = pathlib.Path(__file__).resolve().parents[1] / "fastapi" / "shared_inference.py"
+    spec = importlib.util.spec_from_file_location("shared_inference", module_path)
+    assert spec and spec.loader, "Failed to load fastapi/shared_inference.py"
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)  # type: ignore[arg-type]
+    return mod
+
+
+def mean_of_frames(frames):
+    now = time.perf_counter()
+    return [(str(int(frame.mean())).encode(), now, now) for frame in frames]
+
+
+def test_frames_of_all_workers_share_one_batch():
+    mod = load_shared_inference_module()
+    slots = mod.SharedSlots(workers=2, slots_per_worker=2)
+    server = mod.InferenceServer(slots, max_batch_size=4, batch_wait_timeout_s=1.0)
+    batches = []
+
+    def handle_batch(frames):
+        batches.append(len(frames))
+        return mean_of_frames(frames)
+
+    async def run():
+        clients = [mod.InferenceClient(slots, worker) for worker in (0, 1)]
+        for client in clients:
+            client.start()
+        thread = threading.Thread(target=server.serve_batch, args=(handle_batch, 5.0))
+        thread.start()
+        try:
+            return await asyncio.gather(
+                *(clients[value % 2].submit(np.full((224, 224, 3), value, np.uint8)) for value in range(4))
+            )
+        finally:
+            thread.join()
+            for client in clients:
+                client.stop()
+
+    results = asyncio.run(run())
+
+    assert batches == [4]
+    assert [payload for payload, _, _ in results] == [b"0", b"1", b"2", b"3"]
+    slots.publish_status({"ready": True, "warmup_s": 0.5})
+    assert slots.status() == {"ready": True, "warmup_s": 0.5}
+
+
+def test_failures_full_slots_and_stale_answers():
+    mod = load_shared_inference_module()
+    slots = mod.SharedSlots(workers=1, slots_per_worker=1)
+    server = mod.InferenceServer(slots, max_batch_size=4, batch_wait_timeout_s=0.0)
+    assert slots.status() == {"ready": False}
+
+    def fail(frames):
+        raise MemoryError("out of memory")
+
+    async def run():
+        client = mod.InferenceClient(slots, 0)
+        client.start()
+        try:
+            # An answer for a slot nobody waits on is ignored
+            os.write(slots.responses[0][1], mod.RECORD.pack(0, 99))
+            first = asyncio.ensure_future(client.submit(np.zeros((224, 224, 3), np.uint8)))
+            await asyncio.sleep(0)
+            assert client.free_slots == 0
+            with pytest.raises(RuntimeError, match="slots are in use"):
+                await client.submit(np.zeros((224, 224, 3), np.uint8))
+            await asyncio.get_running_loop().run_in_executor(None, server.serve_batch, fail, 5.0)
+            with pytest.raises(RuntimeError, match="out of memory"):
+                await first
+            assert client.free_slots == 1
+        finally:
+            client.stop()
+
+    asyncio.run(run())
+
+
+def test_restarted_worker_ignores_answers_for_its_predecessor():
+    mod = load_shared_inference_module()
+    slots = mod.SharedSlots(workers=1, slots_per_worker=1)
+    server = mod.InferenceServer(slots, max_batch_size=1, batch_wait_timeout_s=0.0)
+    # Sequences are seeded per worker, not restarted from the same value
+    assert mod.InferenceClient(slots, 0)._sequence != mod.InferenceClient(slots, 0)._sequence
+
+    # A dead worker's answer for the slot and sequence the new worker is about to use
+    client = mod.InferenceClient(slots, 0)
+    now = time.perf_counter()
+    slots.write_result(0, b"stale", now, now)
+    os.write(slots.responses[0][1], mod.RECORD.pack(0, (client._sequence + 1) % 2**32))
+
+    async def run():
+        client.start()
+        try:
+            request = asyncio.ensure_future(client.submit(np.full((224, 224, 3), 7, np.uint8)))
+            await asyncio.sleep(0)
+            await asyncio.get_running_loop().run_in_executor(None, server.serve_batch, mean_of_frames, 5.0)
+            return await request
+        finally:
+            client.stop()
+
+    assert asyncio.run(run())[0] == b"7"
+
+
+def test_launcher_backs_off_and_gives_up_on_a_crash_loop():
+    module_path = pathlib.Path(__file__).resolve().parents[1] / "fastapi" / "serve.py"
+    spec = importlib.util.spec_from_file_location("fastapi_serve", module_path)
+    assert spec and spec.loader, "Failed to load fastapi/serve.py"
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)  # type: ignore[arg-type]
+    policy = mod.RestartPolicy(max_restarts=3, window_s=60.0, backoff_s=1.0, max_backoff_s=3.0)
+
+    assert [policy.record_exit(0, now) for now in (0.0, 1.0, 3.0)] == [1.0, 2.0, 3.0]
+    # Budgets are per child
+    assert policy.record_exit(1, 4.0) == 1.0
+    assert policy.record_exit(0, 6.0) is None
+    # Exits older than the window no longer count
+    assert policy.record_exit(0, 100.0) == 1.0
+
+
+def test_compare_reads_batch_sizes_and_reports(monkeypatch, tmp_path):
+    scripts_dir = pathlib.Path(__file__).resolve().parents[1] / "scripts" / "generic"
+    monkeypatch.syspath_prepend(str(scripts_dir))
+    spec = importlib.util.spec_from_file_location("shared_inference_compare", scripts_dir / "shared_inference_compare.py")
+    assert spec and spec.loader, "Failed to load shared_inference_compare.py"
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)  # type: ignore[arg-type]
+
+    # Multiprocess exposition: one sample per label set, summed
+    metrics = "\n".join([
+        "# HELP mobilenet_batch_size Images per inference call",
+        'mobilenet_batch_size_bucket{le="8.0",service="fastapi"} 3.0',
+        'mobilenet_batch_size_sum{service="fastapi"} 20.0',
+        'mobilenet_batch_size_count{service="fastapi"} 3.0',
+    ])
+    assert mod.batch_size_totals(metrics) == (20.0, 3.0)
+    assert mod.mode_env("shared", 4) == {"WEB_CONCURRENCY": "4", "SHARED_INFERENCE": "1"}
+    assert mod.models_loaded("prefork", 4) == 4 and mod.models_loaded("shared", 4) == 1
+
+    point = {"concurrency": 8, "p50": 10.0, "p95": 20.0, "p99": 30.0, "mean_batch_size": 4.0, "success_rate": 100.0}
+    result = {
+        "meta": {"run_date": "2026-01-01T00:00:00", "model": "m.tflite", "duration_s": 5},
+        "runs": [{"mode": "prefork", "workers": 2, "points": [{**point, "rps": 40.0}]},
+                 {"mode": "shared", "workers": 2, "points": [{**point, "rps": 50.0, "mean_batch_size": 8.0}]}],
+    }
+    mod.write_report(result, tmp_path / "shared.json")
+    assert "| shared | 2 | 8 | 50.00 ⭐ | 10.00 | 20.00 | 30.00 | 8.00 | 100.0 |" in (tmp_path / "shared.md").read_text()
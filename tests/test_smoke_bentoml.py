@@ -1,4 +1,6 @@
 import os
+import sys
+import time
 
 import pathlib
 import importlib.util
@@ -8,18 +10,24 @@ import pytest
 bentoml = pytest.importorskip("bentoml")
 tf = pytest.importorskip("tensorflow")
 
-from tests.smoke_utils import assert_prediction_body, generate_image_obj
+from tests.smoke_utils import assert_prediction_body, generate_image_bytes, generate_image_obj
 
 
-@pytest.mark.skipif(os.getenv("SKIP_BENTOML", "0") == "1", reason="BentoML skipped")
-def test_bentoml_smoke_local():
+def load_bentoml_module():
     # Model bundled next to service.py; no env override needed
     module_path = pathlib.Path(__file__).resolve().parents[1] / "bentoml_service" / "service.py"
     spec = importlib.util.spec_from_file_location("bentoml_service", module_path)
     assert spec and spec.loader, "Failed to load bentoml_service/service.py"
-    svc_mod = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(svc_mod)  # type: ignore[arg-type]
-    svc = svc_mod.MobileNetV2Classifier()
+    mod = importlib.util.module_from_spec(spec)
+    # Registered so BentoML can resolve the service's string annotations
+    sys.modules[spec.name] = mod
+    spec.loader.exec_module(mod)  # type: ignore[arg-type]
+    return mod
+
+
+@pytest.mark.skipif(os.getenv("SKIP_BENTOML", "0") == "1", reason="BentoML skipped")
+def test_bentoml_smoke_local():
+    svc = load_bentoml_module().MobileNetV2Classifier()
 
     image = generate_image_obj()
     # Predict expects a list of images (batch)
@@ -28,3 +36,72 @@ def test_bentoml_smoke_local():
     assert isinstance(results, list)
     assert len(results) == 1
     assert_prediction_body(results[0])
+
+    # /readyz follows the background warmup over every bucket size
+    deadline = time.monotonic() + 120
+    while not svc.__is_ready__() and time.monotonic() < deadline:
+        time.sleep(0.2)
+    status = svc.ready()
+    assert status["ready"] is True
+    assert status["batch_sizes"] == list(svc.engine.buckets)
+
+
+@pytest.mark.skipif(os.getenv("SKIP_BENTOML", "0") == "1", reason="BentoML skipped")
+def test_bentoml_predict_tensor_local(tmp_path):
+    import numpy as np
+
+    svc = load_bentoml_module().MobileNetV2Classifier()
+
+    frames = np.random.randint(0, 256, (2, 224, 224, 3), dtype=np.uint8)
+    raw_path = tmp_path / "frames.bin"
+    raw_path.write_bytes(frames.tobytes())
+    npy_path = tmp_path / "frame.npy"
+    np.save(npy_path, frames[:1])
+
+    results = svc.predict_tensor([raw_path, npy_path])
+
+    assert [len(group) for group in results] == [2, 1]
+    assert results[1] == results[0][:1]
+    assert_prediction_body(results[0][1])
+
+
+@pytest.mark.skipif(os.getenv("SKIP_BENTOML", "0") == "1", reason="BentoML skipped")
+def test_bentoml_predict_bulk_local(tmp_path):
+    import asyncio
+    import base64
+    import json
+
+    svc = load_bentoml_module().MobileNetV2Classifier()
+
+    archive = tmp_path / "upload"
+    archive.write_text(
+        "".join(json.dumps({"id": f"img{i}", "image": base64.b64encode(generate_image_bytes()).decode()}) + "\n" for i in range(3))
+    )
+
+    async def collect():
+        return [line async for line in svc.predict_bulk(archive)]
+
+    records = [json.loads(line) for chunk in asyncio.run(collect()) for line in chunk.splitlines()]
+
+    assert [record["id"] for record in records] == ["img0", "img1", "img2"]
+    for record in records:
+        assert_prediction_body(record["result"])
+
+    # In a server the decoded frames go through the batchable `predict` via the self-proxy
+    sent = []
+
+    class SelfProxy:
+        async def predict(self, files):
+            sent.append([image.size for image in files])
+            return svc.predict(files)
+
+    svc.to_async = SelfProxy()
+    archive.write_text(
+        json.dumps({"id": "ok", "image": base64.b64encode(generate_image_bytes()).decode()}) + "\n"
+        + json.dumps({"id": "broken", "image": base64.b64encode(b"not an image").decode()}) + "\n"
+    )
+    records = [json.loads(line) for chunk in asyncio.run(collect()) for line in chunk.splitlines()]
+
+    assert sent == [[(224, 224)]]
+    assert_prediction_body(records[0]["result"])
+    assert records[1]["id"] == "broken" and "Invalid image data" in records[1]["error"]
@@ -1,4 +1,6 @@
+import asyncio
 import os
+import time
 
 import importlib.util
 import pathlib
@@ -12,8 +14,7 @@ from fastapi.testclient import TestClient
 from tests.smoke_utils import assert_prediction_body, generate_image_bytes
 
 
-@pytest.mark.skipif(os.getenv("SKIP_FASTAPI", "0") == "1", reason="FastAPI skipped")
-def test_fastapi_smoke_local():
+def load_fastapi_module():
     # Ensure model files resolve locally
     os.environ.setdefault("MODEL_PATH", "model/mobilenet_v2.keras")
     os.environ.setdefault("LABELS_PATH", "model/imagenet_labels.txt")
@@ -24,6 +25,12 @@ def test_fastapi_smoke_local():
     assert spec and spec.loader, "Failed to load fastapi/main.py"
     mod = importlib.util.module_from_spec(spec)
     spec.loader.exec_module(mod)  # type: ignore[arg-type]
+    return mod
+
+
+@pytest.mark.skipif(os.getenv("SKIP_FASTAPI", "0") == "1", reason="FastAPI skipped")
+def test_fastapi_smoke_local():
+    mod = load_fastapi_module()
 
     with TestClient(mod.app) as client:
         # Trigger startup and health
@@ -36,8 +43,216 @@ def test_fastapi_smoke_local():
         
         resp = client.post("/predict", files=files)
         assert resp.status_code == 200, resp.text
+        assert "compute;dur=" in resp.headers["server-timing"]
         
         results = resp.json()
         assert isinstance(results, list)
         assert len(results) == 1
         assert_prediction_body(results[0])
+
+        metrics = client.get("/metrics")
+        assert metrics.status_code == 200
+        assert 'mobilenet_stage_duration_seconds_count{service="fastapi",stage="inference"}' in metrics.text
+        assert 'mobilenet_batch_size_count{service="fastapi"}' in metrics.text
+
+        # Readiness follows the background warmup over every bucket size
+        deadline = time.monotonic() + 120
+        ready = client.get("/ready")
+        while ready.status_code == 503 and time.monotonic() < deadline:
+            time.sleep(0.2)
+            ready = client.get("/ready")
+        assert ready.status_code == 200, ready.text
+        assert ready.json()["batch_sizes"] == list(mod.app.state.engine.buckets)
+        assert ready.json()["warmup_s"] > 0
+
+
+@pytest.mark.skipif(os.getenv("SKIP_FASTAPI", "0") == "1", reason="FastAPI skipped")
+def test_fastapi_reports_unhealthy_without_a_model(monkeypatch):
+    mod = load_fastapi_module()
+    monkeypatch.setattr(mod, "MODEL_PATH", "model/missing.keras")
+
+    with TestClient(mod.app) as client:
+        health = client.get("/health")
+        ready = client.get("/ready")
+
+    assert health.status_code == 503
+    assert "Model not loaded" in health.json()["detail"]
+    assert ready.status_code == 503
+    assert ready.json()["ready"] is False
+
+
+@pytest.mark.skipif(os.getenv("SKIP_FASTAPI", "0") == "1", reason="FastAPI skipped")
+def test_fastapi_predict_tensor_accepts_raw_and_npy():
+    import io
+
+    import numpy as np
+
+    mod = load_fastapi_module()
+    frames = np.random.randint(0, 256, (3, 224, 224, 3), dtype=np.uint8)
+    npy = io.BytesIO()
+    np.save(npy, frames)
+
+    with TestClient(mod.app) as client:
+        raw = client.post(
+            "/predict_tensor",
+            content=frames.tobytes(),
+            headers={"Content-Type": "application/octet-stream", "X-Tensor-Shape": "3,224,224,3"},
+        )
+        from_npy = client.post("/predict_tensor", content=npy.getvalue())
+        bad = client.post("/predict_tensor", content=b"\x00" * 10)
+
+    assert raw.status_code == 200, raw.text
+    assert len(raw.json()) == 3
+    for body in raw.json():
+        assert_prediction_body(body)
+    assert from_npy.json() == raw.json()
+    assert bad.status_code == 400
+
+
+@pytest.mark.skipif(os.getenv("SKIP_FASTAPI", "0") == "1", reason="FastAPI skipped")
+def test_fastapi_predict_tensor_larger_than_the_queue(monkeypatch):
+    import numpy as np
+
+    mod = load_fastapi_module()
+    monkeypatch.setattr(mod, "INFERENCE_QUEUE_DEPTH", 4)
+    frames = np.random.randint(0, 256, (10, 224, 224, 3), dtype=np.uint8)
+
+    with TestClient(mod.app) as client:
+        response = client.post("/predict_tensor", content=frames.tobytes(), headers={"X-Tensor-Shape": "10,224,224,3"})
+
+    assert response.status_code == 200, response.text
+    assert len(response.json()) == 10
+
+
+@pytest.mark.skipif(os.getenv("SKIP_FASTAPI", "0") == "1", reason="FastAPI skipped")
+def test_fastapi_predict_bulk_streams_ndjson_in_order():
+    import io
+    import json
+    import tarfile
+
+    mod = load_fastapi_module()
+    archive = io.BytesIO()
+    with tarfile.open(fileobj=archive, mode="w") as tar:
+        for name, data in [("a.jpg", generate_image_bytes()), ("bad.jpg", b"nope"), ("c.jpg", generate_image_bytes())]:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+
+    with TestClient(mod.app) as client:
+        response = client.post("/predict_bulk", content=archive.getvalue(), headers={"Content-Type": "application/x-tar"})
+
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"] == "application/x-ndjson"
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert [record["id"] for record in records] == ["a.jpg", "bad.jpg", "c.jpg"]
+    assert "error" in records[1]
+    assert_prediction_body(records[0]["result"])
+    assert_prediction_body(records[2]["result"])
+
+
+@pytest.mark.skipif(os.getenv("SKIP_FASTAPI", "0") == "1", reason="FastAPI skipped")
+def test_fastapi_prediction_cache_skips_inference(monkeypatch):
+    mod = load_fastapi_module()
+    monkeypatch.setattr(mod, "PREDICTION_CACHE", mod.PredictionCache(max_entries=8))
+
+    with TestClient(mod.app) as client:
+        files = {'file': ('test.jpg', generate_image_bytes(), 'image/jpeg')}
+        first = client.post("/predict", files=files)
+        second = client.post("/predict", files=files)
+
+        assert first.status_code == second.status_code == 200
+        assert second.headers["server-timing"] == "cache;desc=hit"
+        assert second.json() == first.json()
+
+        stats = client.get("/cache_stats").json()
+        assert (stats["hits"], stats["misses"]) == (1, 1)
+
+
+@pytest.mark.skipif(os.getenv("SKIP_FASTAPI", "0") == "1", reason="FastAPI skipped")
+def test_fastapi_micro_batcher_groups_concurrent_requests():
+    mod = load_fastapi_module()
+    batch_sizes = []
+
+    def handler(items):
+        batch_sizes.append(len(items))
+        return [item * 2 for item in items]
+
+    async def run():
+        batcher = mod.MicroBatcher(handler, max_batch_size=4, batch_wait_timeout_s=0.05)
+        batcher.start()
+        try:
+            return await asyncio.gather(*(batcher.submit(i) for i in range(10)))
+        finally:
+            await batcher.stop()
+
+    results = asyncio.run(run())
+
+    assert results == [i * 2 for i in range(10)]
+    assert batch_sizes == [4, 4, 2]
+
+
+@pytest.mark.skipif(os.getenv("SKIP_FASTAPI", "0") == "1", reason="FastAPI skipped")
+def test_fastapi_micro_batcher_rejects_when_queue_full():
+    mod = load_fastapi_module()
+
+    async def slow_handler(items):
+        await asyncio.sleep(0.05)
+        return items
+
+    async def run():
+        batcher = mod.MicroBatcher(slow_handler, max_batch_size=1, batch_wait_timeout_s=0, max_queue_size=2)
+        batcher.start()
+        try:
+            return await asyncio.gather(*(batcher.submit(i) for i in range(6)), return_exceptions=True)
+        finally:
+            await batcher.stop()
+
+    results = asyncio.run(run())
+
+    rejected = [r for r in results if isinstance(r, mod.QueueFullError)]
+    assert rejected, results
+    assert [r for r in results if not isinstance(r, Exception)] == [0, 1]
+
+
+@pytest.mark.skipif(os.getenv("SKIP_FASTAPI", "0") == "1", reason="FastAPI skipped")
+def test_fastapi_micro_batcher_skips_cancelled_items():
+    mod = load_fastapi_module()
+    batches = []
+
+    def handler(items):
+        batches.append(list(items))
+        return items
+
+    async def run():
+        batcher = mod.MicroBatcher(handler, max_batch_size=4, batch_wait_timeout_s=0.05)
+        batcher.start()
+        try:
+            submitted = [asyncio.ensure_future(batcher.submit(i)) for i in range(3)]
+            await asyncio.sleep(0)
+            # A caller that gave up while queued takes no batch slot
+            submitted[1].cancel()
+            return await asyncio.gather(*submitted, return_exceptions=True)
+        finally:
+            await batcher.stop()
+
+    results = asyncio.run(run())
+
+    assert results[0] == 0 and results[2] == 2
+    assert isinstance(results[1], asyncio.CancelledError)
+    assert batches == [[0, 2]]
+
+
+@pytest.mark.skipif(os.getenv("SKIP_FASTAPI", "0") == "1", reason="FastAPI skipped")
+def test_fastapi_admin_profile_requires_token(monkeypatch):
+    mod = load_fastapi_module()
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+
+    with TestClient(mod.app) as client:
+        denied = client.post("/admin/profile", json={"seconds": 0.1})
+        profile = client.post("/admin/profile", json={"seconds": 0.2, "top": 3}, headers={"X-Admin-Token": "secret"})
+
+    assert denied.status_code == 403
+    assert profile.status_code == 200, profile.text
+    body = profile.json()
+    assert body["name"] == "fastapi" and body["samples"] > 0 and len(body["top"]) <= 3
+    assert body["speedscope"]["profiles"][0]["type"] == "sampled"
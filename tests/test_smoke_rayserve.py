@@ -2,11 +2,59 @@ import os
 
 import pytest
 
+np = pytest.importorskip("numpy")
 tf = pytest.importorskip("tensorflow")
 
 from tests.smoke_utils import assert_prediction_body, generate_image_bytes
 
 
+def local_deployment(monkeypatch):
+    """The model deployment built outside a cluster, with `@serve.batch` usable in one event loop."""
+    import importlib
+    import types
+
+    from ray import serve
+
+    os.environ.setdefault("MODEL_PATH", "model/mobilenet_v2.keras")
+    os.environ.setdefault("LABELS_PATH", "model/imagenet_labels.txt")
+    monkeypatch.setenv("WARMUP_ROUNDS", "0")
+    # Batch queues look up the replica's config when they are created
+    replica = types.SimpleNamespace(_deployment_config=types.SimpleNamespace(max_ongoing_requests=100))
+    monkeypatch.setattr(serve, "get_replica_context", lambda: replica)
+    app_mod = importlib.import_module("rayserve.app")
+    # The class under `@serve.ingress`, whose wrapper cannot be deleted outside a replica
+    deployment_class = app_mod.MobileNetV2Deployment.func_or_class.__bases__[0]
+    # Batch settings live on the decorated method, shared by every test
+    batching = deployment_class._batched_predict._get_max_batch_size.__self__
+    monkeypatch.setattr(batching, "max_batch_size", batching.max_batch_size)
+    monkeypatch.setattr(batching, "batch_wait_timeout_s", batching.batch_wait_timeout_s)
+    return app_mod, deployment_class(None)
+
+
+def run_batched(deployment, coro):
+    """Run `coro` in a fresh event loop and shut the batch queue it started down inside that loop.
+
+    Ray creates one queue per decorated method on first use, bound to the loop
+    it was created in; later tests need a new one.
+    """
+    import asyncio
+    import gc
+
+    batching = type(deployment)._batched_predict._get_max_batch_size.__self__
+
+    async def main():
+        try:
+            return await coro
+        finally:
+            if batching._queue is not None:
+                batching._queue._handle_batch_task.cancel()
+                await asyncio.sleep(0)
+                batching._queue = None
+                gc.collect()
+
+    return asyncio.run(main())
+
+
 @pytest.mark.skipif(os.getenv("SKIP_RAY", "0") == "1", reason="Ray Serve skipped")
 def test_rayserve_smoke_local():
     # Use the same preprocessing and labels as the Ray Serve app, but run locally without Serve.
@@ -39,3 +87,137 @@ def test_rayserve_smoke_local():
 
     body = {"predictions": results, "top_prediction": results[0]["class_name"], "confidence": results[0]["confidence"]}
     assert_prediction_body(body)
+
+
+@pytest.mark.skipif(os.getenv("SKIP_RAY", "0") == "1", reason="Ray Serve skipped")
+def test_rayserve_preprocessor_returns_uint8_batch():
+    import importlib
+    app_mod = importlib.import_module("rayserve.app")
+
+    # The deployment decorator keeps the original class reachable for local use
+    preprocessor = app_mod.ImagePreprocessor.func_or_class()
+    tensor = preprocessor.preprocess([generate_image_bytes(), generate_image_bytes(640, 480)])
+
+    assert tensor.shape == (2, 224, 224, 3)
+    assert tensor.dtype == np.uint8
+    with pytest.raises(ValueError):
+        preprocessor.preprocess([b"not an image"])
+
+
+@pytest.mark.skipif(os.getenv("SKIP_RAY", "0") == "1", reason="Ray Serve skipped")
+def test_rayserve_grpc_results_match_json_responses():
+    import importlib
+    import json
+
+    app_mod = importlib.import_module("rayserve.app")
+    from common.mobilenet_pb2 import PredictResponse
+
+    preds = np.random.rand(2, 1001).astype(np.float32)
+    encoded = app_mod.POSTPROCESSOR.to_json(preds)
+    response = PredictResponse(results=[app_mod._image_result(r) for r in encoded + [ValueError("bad image")]])
+    decoded = PredictResponse.FromString(response.SerializeToString())
+
+    for result, body in zip(decoded.results, encoded):
+        expected = json.loads(body)
+        assert result.top_prediction == expected["top_prediction"]
+        assert [p.class_id for p in result.predictions] == [p["class_id"] for p in expected["predictions"]]
+        assert result.confidence == pytest.approx(expected["confidence"])
+    assert decoded.results[2].error == "bad image"
+
+
+@pytest.mark.skipif(os.getenv("SKIP_RAY", "0") == "1", reason="Ray Serve skipped")
+def test_rayserve_predict_tensor_splits_frames_beyond_max_batch_size(monkeypatch):
+    import json
+
+    from starlette.requests import Request
+
+    app_mod, deployment = local_deployment(monkeypatch)
+    frames = np.random.randint(0, 256, (app_mod.MAX_BATCH_SIZE + 4, 224, 224, 3), dtype=np.uint8)
+
+    async def receive():
+        return {"type": "http.request", "body": frames.tobytes(), "more_body": False}
+
+    shape = ",".join(map(str, frames.shape)).encode()
+    request = Request({"type": "http", "method": "POST", "headers": [(b"x-tensor-shape", shape)]}, receive)
+    response = run_batched(deployment, deployment.predict_tensor(request))
+
+    bodies = json.loads(response.body)
+    assert len(bodies) == len(frames)
+    for body in bodies:
+        assert_prediction_body(body)
+
+
+@pytest.mark.skipif(os.getenv("SKIP_RAY", "0") == "1", reason="Ray Serve skipped")
+def test_rayserve_grpc_predict_accepts_more_images_than_max_batch_size(monkeypatch):
+    import types
+
+    from common.mobilenet_pb2 import PredictRequest
+
+    app_mod, deployment = local_deployment(monkeypatch)
+    preprocessor = app_mod.ImagePreprocessor.func_or_class()
+
+    async def preprocess(images):
+        return preprocessor.preprocess(images)
+
+    deployment.preprocessor = types.SimpleNamespace(preprocess=types.SimpleNamespace(remote=preprocess))
+
+    class Context:
+        code = details = None
+
+        def set_code(self, code):
+            self.code = code
+
+        def set_details(self, details):
+            self.details = details
+
+    images = [generate_image_bytes() for _ in range(app_mod.MAX_BATCH_SIZE + 3)]
+    context = Context()
+    response = run_batched(deployment, deployment.Predict(PredictRequest(images=images), context))
+
+    assert context.code is None
+    assert len(response.results) == len(images)
+    assert all(result.top_prediction and not result.error for result in response.results)
+
+
+@pytest.mark.skipif(os.getenv("SKIP_RAY", "0") == "1", reason="Ray Serve skipped")
+def test_rayserve_requests_survive_an_adaptive_batch_size_shrink(monkeypatch):
+    import asyncio
+
+    from common.batching import AdaptiveBatchController
+
+    app_mod, deployment = local_deployment(monkeypatch)
+    deployment.batch_controller = AdaptiveBatchController(
+        target_p95_s=0.1, batch_size=8, min_batch_size=2, max_batch_size=8, apply=deployment._apply_batching
+    )
+    frames = np.random.randint(0, 256, (8, 224, 224, 3), dtype=np.uint8)
+
+    async def shrink_while_queued():
+        request = asyncio.ensure_future(deployment._predict_tensor(frames))
+        # The request has chunked its frames but not reached the batch queue yet
+        await asyncio.sleep(0)
+        deployment._apply_batching(2, 0.001)
+        return await request
+
+    assert len(run_batched(deployment, shrink_while_queued())) == len(frames)
+
+
+def test_rayserve_adaptive_batching_keeps_a_request_in_one_batch(monkeypatch):
+    from common.batching import AdaptiveBatchController
+
+    app_mod, deployment = local_deployment(monkeypatch)
+    deployment.batch_controller = AdaptiveBatchController(
+        target_p95_s=0.1, batch_size=8, min_batch_size=1, max_batch_size=8, apply=deployment._apply_batching
+    )
+    predict_chunk = deployment._predict_chunk
+    items = []
+
+    async def count_items(tensor):
+        items.append(len(tensor))
+        return await predict_chunk(tensor)
+
+    monkeypatch.setattr(deployment, "_predict_chunk", count_items)
+    frames = np.random.randint(0, 256, (8, 224, 224, 3), dtype=np.uint8)
+
+    assert len(run_batched(deployment, deployment._predict_tensor(frames))) == len(frames)
+    # One batch item of the current max batch size, not one per frame at the controller's floor
+    assert items == [8]
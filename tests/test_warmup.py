@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from common.inference import InferenceEngine
+from common.warmup import Warmup
+
+
+class RecordingEngine(InferenceEngine):
+    def __init__(self, buckets, fail_at=None):
+        super().__init__(buckets)
+        self.shapes = []
+        self.fail_at = fail_at
+
+    def _infer(self, batch):
+        if batch.shape[0] == self.fail_at:
+            raise MemoryError("out of memory")
+        self.shapes.append(batch.shape)
+        return np.zeros((batch.shape[0], 1001), dtype=np.float32)
+
+
+def test_warmup_runs_every_bucket_before_reporting_ready():
+    engine = RecordingEngine((1, 2, 4, 8))
+    postprocessed = []
+    warmup = Warmup(rounds=2)
+    assert warmup.status()["ready"] is False
+
+    warmup.run(engine, postprocessed.append)
+
+    assert [shape[0] for shape in engine.shapes] == [1, 1, 2, 2, 4, 4, 8, 8]
+    assert all(shape[1:] == (224, 224, 3) for shape in engine.shapes)
+    assert [len(preds) for preds in postprocessed] == [1, 1, 2, 2, 4, 4, 8, 8]
+    status = warmup.status()
+    assert status["ready"] is True
+    assert status["batch_sizes"] == [1, 2, 4, 8]
+    assert status["warmup_s"] >= 0
+    assert set(status["first_call_ms"]) == {"1", "2", "4", "8"}
+
+
+def test_failed_warmup_never_reports_ready():
+    warmup = Warmup(rounds=1)
+    with pytest.raises(MemoryError):
+        warmup.run(RecordingEngine((1, 2, 4), fail_at=4))
+    assert warmup.status()["ready"] is False
+    assert warmup.status()["error"] == "MemoryError: out of memory"
+
+    # WARMUP_ROUNDS=0 skips the warmup
+    skipped = Warmup(rounds=0).run(RecordingEngine((1, 2)))
+    assert skipped.ready and skipped.timings_ms == {}
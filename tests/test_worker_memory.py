@@ -0,0 +1,42 @@
+import importlib.util
+import os
+import pathlib
+import subprocess
+import sys
+
+import pytest
+
+SCRIPTS_DIR = pathlib.Path(__file__).resolve().parents[1] / "scripts" / "generic"
+
+pytestmark = pytest.mark.skipif(not os.path.exists("/proc/self/smaps_rollup"), reason="needs Linux /proc")
+
+
+def load_worker_memory_module(monkeypatch):
+    # batching_sweep is imported as a top-level module
+    monkeypatch.syspath_prepend(str(SCRIPTS_DIR))
+    spec = importlib.util.spec_from_file_location("worker_memory", SCRIPTS_DIR / "worker_memory.py")
+    assert spec and spec.loader, "Failed to load worker_memory.py"
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)  # type: ignore[arg-type]
+    return mod
+
+
+def test_process_tree_memory_and_report(monkeypatch, tmp_path):
+    mod = load_worker_memory_module(monkeypatch)
+    child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    try:
+        assert child.pid in mod.descendants(os.getpid())
+        memory = mod.smaps_rollup(child.pid)
+        assert 0 < memory["pss"] <= memory["rss"]
+    finally:
+        child.kill()
+        child.wait()
+
+    run = {"model": "m.tflite", "workers": 2, "total_rss": 4 * 2**20, "worker_rss_mean": 2**20,
+           "worker_pss_mean": 2**20, "worker_private_mean": 2**20}
+    result = {
+        "meta": {"run_date": "2026-01-01T00:00:00", "workers": 2},
+        "runs": [{**run, "mode": "spawn", "total_pss": 400 * 2**20}, {**run, "mode": "prefork", "total_pss": 300 * 2**20}],
+    }
+    mod.write_report(result, tmp_path / "memory.json")
+    assert "| m.tflite | 400 | 300 | 25% |" in (tmp_path / "memory.md").read_text()